@@ -0,0 +1,262 @@
+import bisect
+import copy
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from stock_picker.panel import year_label
+
+LOG = logging.getLogger('FundamentalsHistory')
+
+STATEMENTS = ('income_statement', 'balance_sheet', 'cash_flow_statement', 'price')
+
+# version of a stock: {'statements': {statement: {year: {field: value}}}, 'info': {field: value}}
+Version = Dict[str, Dict]
+
+
+def stock_data_to_version(stock_data: Dict, statements: Sequence[str], tracked_info: Sequence[str]) -> Version:
+    """cells of the statements of a stock by year and field, and its tracked info
+
+    :param stock_data: stock data as scrapped
+    :param statements: statements tracked
+    :param tracked_info: info fields tracked, e.g. `market_cap`
+    :return:
+    """
+    version = {'statements': {}, 'info': {field: stock_data.get(field) for field in tracked_info}}
+    for statement in statements:
+        if statement not in stock_data:
+            continue
+        statement_data = stock_data[statement]
+        fields = [field for field in statement_data if field != 'years']
+        cells = {}
+        for idx, year in enumerate(statement_data['years']):
+            cells[year_label(year)] = {field: statement_data[field][idx] for field in fields
+                                       if idx < len(statement_data[field])}
+        version['statements'][statement] = cells
+    return version
+
+
+def version_to_stock_data(version: Version) -> Dict:
+    """stock data in the scrapped format of a version, years as labels latest year first"""
+    stock_data = dict(version['info'])
+    for statement, cells in version['statements'].items():
+        years = sorted(cells, reverse=True)
+        fields = list(dict.fromkeys(field for year in years for field in cells[year]))
+        values = {field: [cells[year].get(field) for year in years] for field in fields}
+        stock_data[statement] = {'years': years, **values}
+    return stock_data
+
+
+def version_delta(previous: Version, current: Version) -> Dict:
+    """cells and info of current that are new or changed since previous, and the cells it no longer has"""
+    changed, removed = {}, {}
+    for statement in set(previous['statements']) | set(current['statements']):
+        previous_cells = previous['statements'].get(statement, {})
+        current_cells = current['statements'].get(statement, {})
+        for year, fields in current_cells.items():
+            previous_fields = previous_cells.get(year, {})
+            changed_fields = {field: val for field, val in fields.items()
+                              if field not in previous_fields or previous_fields[field] != val}
+            if changed_fields:
+                changed.setdefault(statement, {})[year] = changed_fields
+        for year, previous_fields in previous_cells.items():
+            removed_fields = [field for field in previous_fields if field not in current_cells.get(year, {})]
+            if removed_fields:
+                removed.setdefault(statement, {})[year] = removed_fields
+    info = {field: val for field, val in current['info'].items() if previous['info'].get(field) != val}
+    return {'statements': changed, 'removed': removed, 'info': info}
+
+
+def apply_delta(version: Version, delta: Dict):
+    """patch a version in place with a delta of `version_delta`"""
+    for statement, years in delta['removed'].items():
+        cells = version['statements'][statement]
+        for year, fields in years.items():
+            for field in fields:
+                del cells[year][field]
+            if not cells[year]:
+                del cells[year]
+        if not cells:
+            del version['statements'][statement]
+    for statement, years in delta['statements'].items():
+        cells = version['statements'].setdefault(statement, {})
+        for year, fields in years.items():
+            cells.setdefault(year, {}).update(fields)
+    version['info'].update(delta['info'])
+
+
+class FundamentalsHistory:
+    """Append-only history of the scrapped fundamentals of each ticker
+
+    Each ticker has a json lines file of its versions. A scrape that changes the statements or the tracked info of a
+    ticker appends a delta of the changed cells, so restated figures and market cap changes are kept without storing a
+    full copy per scrape. Every `checkpoint_interval` versions a full version is written instead, so rebuilding a
+    version applies at most that many deltas. The scrape time and file offset of each full version are indexed in
+    `<ticker>.checkpoints.jsonl`, so recording and rebuilding a version only read the history from the nearest one.
+    """
+    def __init__(
+            self,
+            history_folder: Path,
+            statements: Sequence[str] = STATEMENTS,
+            tracked_info: Sequence[str] = ('market_cap',),
+            checkpoint_interval: int = 10
+    ):
+        """
+        :param history_folder: folder of the `<ticker>.jsonl` history files, created if not exists
+        :param statements: statements tracked
+        :param tracked_info: info fields tracked
+        :param checkpoint_interval: number of versions between full versions
+        """
+        self.history_folder = history_folder
+        self.statements = tuple(statements)
+        self.tracked_info = tuple(tracked_info)
+        self.checkpoint_interval = checkpoint_interval
+        history_folder.mkdir(parents=True, exist_ok=True)
+
+    def history_path(self, ticker: str) -> Path:
+        return self.history_folder / f'{ticker}.jsonl'
+
+    def checkpoints_path(self, ticker: str) -> Path:
+        return self.history_folder / f'{ticker}.checkpoints.jsonl'
+
+    @staticmethod
+    def _read_lines(path: Path, offset: int = 0) -> Iterator[Tuple[int, Dict]]:
+        """(offset, entry) of the json lines of a file from an offset"""
+        if not path.exists():
+            return
+        with path.open('rb') as f:
+            f.seek(offset)
+            for line in f:
+                try:
+                    yield offset, json.loads(line)
+                except ValueError:
+                    # last line of a killed run may be partially written
+                    LOG.warning(f'skipped invalid line at byte {offset} of {path}')
+                offset += len(line)
+
+    def _read_entries(self, ticker: str) -> List[Dict]:
+        return [entry for _, entry in self._read_lines(self.history_path(ticker))]
+
+    def _checkpoints(self, ticker: str) -> List[Tuple[float, int]]:
+        """(scrape time, offset) of the full versions of a ticker, indexed from its history if not yet"""
+        checkpoints_path = self.checkpoints_path(ticker)
+        if checkpoints_path.exists() or not self.history_path(ticker).exists():
+            return [(checkpoint['scraped_at'], checkpoint['offset'])
+                    for _, checkpoint in self._read_lines(checkpoints_path)]
+        checkpoints = [(entry['scraped_at'], offset)
+                       for offset, entry in self._read_lines(self.history_path(ticker)) if entry['checkpoint']]
+        with checkpoints_path.open('w') as f:
+            f.writelines(json.dumps({'scraped_at': scraped_at, 'offset': offset}) + '\n'
+                         for scraped_at, offset in checkpoints)
+        return checkpoints
+
+    def _read_entries_since_checkpoint(self, ticker: str, at: float = None) -> List[Dict]:
+        """entries of a ticker from its last full version scrapped at or before a time, up to that time"""
+        checkpoints = self._checkpoints(ticker)
+        if at is not None:
+            checkpoints = checkpoints[:bisect.bisect_right([scraped_at for scraped_at, _ in checkpoints], at)]
+        entries = []
+        for _, entry in self._read_lines(self.history_path(ticker), checkpoints[-1][1] if checkpoints else 0):
+            if at is not None and entry['scraped_at'] > at:
+                break
+            entries.append(entry)
+        return entries
+
+    @staticmethod
+    def _last_checkpoint(entries: List[Dict]) -> Optional[int]:
+        return next((idx for idx in range(len(entries) - 1, -1, -1) if entries[idx]['checkpoint']), None)
+
+    def _rebuild(self, entries: List[Dict]) -> Optional[Version]:
+        """version of the last entry, from the checkpoint before it and the deltas since"""
+        checkpoint = self._last_checkpoint(entries)
+        if checkpoint is None:
+            return None
+        version = copy.deepcopy(entries[checkpoint]['version'])
+        for entry in entries[checkpoint + 1:]:
+            apply_delta(version, entry['delta'])
+        return version
+
+    def versions(self, ticker: str) -> List[float]:
+        """scrape times of the recorded versions of a ticker"""
+        return [entry['scraped_at'] for entry in self._read_entries(ticker)]
+
+    def record(self, ticker: str, stock_data: Dict, scraped_at: float = None) -> bool:
+        """append the version of a scrapped stock if it changed since the last recorded version
+
+        :param ticker: stock ticker
+        :param stock_data: stock data as scrapped
+        :param scraped_at: scrape timestamp, now if not specified
+        :return: whether a version was appended
+        """
+        scraped_at = time.time() if scraped_at is None else scraped_at
+        current = stock_data_to_version(stock_data, self.statements, self.tracked_info)
+        entries = self._read_entries_since_checkpoint(ticker)
+        if entries and scraped_at < entries[-1]['scraped_at']:
+            raise ValueError(f'{ticker} has a version scrapped after {scraped_at}')
+        previous = self._rebuild(entries)
+        entry = {'scraped_at': scraped_at, 'checkpoint': True, 'version': current}
+        if previous is not None:
+            delta = version_delta(previous, current)
+            if not any(delta.values()):
+                LOG.debug(f'{ticker} has not changed since its last version')
+                return False
+            if len(entries) - self._last_checkpoint(entries) < self.checkpoint_interval:
+                entry = {'scraped_at': scraped_at, 'checkpoint': False, 'delta': delta}
+        offset = self._append(self.history_path(ticker), entry)
+        if entry['checkpoint']:
+            self._append(self.checkpoints_path(ticker), {'scraped_at': scraped_at, 'offset': offset})
+        return True
+
+    @staticmethod
+    def _append(path: Path, entry: Dict) -> int:
+        """append an entry as a json line
+
+        :return: offset of the entry line
+        """
+        with path.open('a+b') as f:
+            prefix = b''
+            if f.tell():
+                # end the partially written line of a killed run
+                f.seek(-1, os.SEEK_END)
+                prefix = b'' if f.read(1) == b'\n' else b'\n'
+            offset = f.tell() + len(prefix)
+            f.write(prefix + json.dumps(entry).encode() + b'\n')
+        return offset
+
+    def as_of(self, ticker: str, at: float = None) -> Optional[Dict]:
+        """stock data of a ticker as of its latest version scrapped at or before a time
+
+        :param ticker: stock ticker
+        :param at: timestamp, latest version if not specified
+        :return: stock data in the scrapped format with years as labels, see `version_to_stock_data`, None if no
+            version was scrapped by then
+        """
+        version = self._rebuild(self._read_entries_since_checkpoint(ticker, at))
+        return None if version is None else version_to_stock_data(version)
+
+    def field_history(self, ticker: str, statement: str, year, field: str) -> List[Tuple[float, object]]:
+        """values of a statement field for a year across versions, only when it changed, e.g. restatements
+
+        :param ticker: stock ticker
+        :param statement: statement name
+        :param year: statement year
+        :param field: field name
+        :return: list of (scrape time, value), value is None when the version did not have it
+        """
+        year = year_label(year)
+        history = []
+        version = None
+        for entry in self._read_entries(ticker):
+            if entry['checkpoint']:
+                version = copy.deepcopy(entry['version'])
+            elif version is not None:
+                apply_delta(version, entry['delta'])
+            else:
+                continue
+            value = version['statements'].get(statement, {}).get(year, {}).get(field)
+            if not history or history[-1][1] != value:
+                history.append((entry['scraped_at'], value))
+        return history
@@ -0,0 +1,91 @@
+import warnings
+from collections import OrderedDict
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+
+def group_codes(tickers: Sequence[str], groups: Dict[str, List[str]]) -> Tuple[np.ndarray, List[str]]:
+    """integer code of the group of each ticker
+
+    :param tickers: list of tickers
+    :param groups: group name and its tickers, e.g. stocks by sectors
+    :return: (code of each ticker, -1 if in no group, group names by code)
+    """
+    ticker_codes = {tkr: code for code, group in enumerate(groups) for tkr in groups[group]}
+    return np.array([ticker_codes.get(tkr, -1) for tkr in tickers], dtype=np.int64), list(groups)
+
+
+class GroupStats:
+    """NaN-aware mean, std, count and optionally median of every field of every group
+
+    All statistics are computed in one grouped reduction over the rows sorted by group code. Each statistic is an
+    array of shape (groups, fields).
+    """
+    def __init__(self, values: np.ndarray, codes: np.ndarray, groups: List[str], fields: List[str],
+                 median: bool = False):
+        """
+        :param values: (rows, fields) array, NaN for missing values
+        :param codes: group code of each row, -1 for rows in no group
+        :param groups: group names by code
+        :param fields: field names by column
+        :param median: also compute median
+        """
+        self.groups = groups
+        self.fields = fields
+        self._group_index = {group: code for code, group in enumerate(groups)}
+        self._field_index = {field: col for col, field in enumerate(fields)}
+        n_groups, n_fields = len(groups), len(fields)
+
+        in_group = codes >= 0
+        order = np.argsort(codes[in_group], kind='stable')
+        sorted_codes = codes[in_group][order]
+        sorted_values = values[in_group][order]
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]) if len(sorted_codes) else []
+        present_codes = sorted_codes[starts]
+
+        valid = ~np.isnan(sorted_values)
+        self.count = np.zeros((n_groups, n_fields), dtype=np.int64)
+        sums = np.zeros((n_groups, n_fields))
+        sum_squares = np.zeros((n_groups, n_fields))
+        if len(starts):
+            self.count[present_codes] = np.add.reduceat(valid, starts, axis=0)
+            sums[present_codes] = np.add.reduceat(np.where(valid, sorted_values, 0), starts, axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.mean = np.where(self.count > 0, sums / self.count, np.nan)
+            if len(starts):
+                deviations = np.where(valid, sorted_values - self.mean[sorted_codes], 0)
+                sum_squares[present_codes] = np.add.reduceat(deviations ** 2, starts, axis=0)
+            self.std = np.where(self.count > 0, np.sqrt(sum_squares / self.count), np.nan)
+
+        self.median = None
+        if median:
+            self.median = np.full((n_groups, n_fields), np.nan)
+            ends = np.r_[starts[1:], len(sorted_codes)] if len(starts) else []
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                for code, start, end in zip(present_codes, starts, ends):
+                    self.median[code] = np.nanmedian(sorted_values[start:end], axis=0)
+
+    def statistic(self, name: str) -> np.ndarray:
+        return getattr(self, name)
+
+    def report(self, group: str, name: str = 'mean') -> Dict:
+        """statistic of a group as a report of field and value, None for NaN"""
+        row = self.statistic(name)[self._group_index[group]]
+        return {field: None if np.isnan(row[col]) else row[col] for field, col in self._field_index.items()}
+
+    def by_row(self, codes: np.ndarray, name: str = 'mean') -> Dict[str, np.ndarray]:
+        """statistic of the group of each row by field, NaN for rows in no group"""
+        stat = np.vstack([self.statistic(name), np.full(len(self.fields), np.nan)])
+        rows = stat[np.where(codes >= 0, codes, len(self.groups))]
+        return {field: rows[:, col] for field, col in self._field_index.items()}
+
+    def to_reports(self, group_field: str = 'group') -> List[OrderedDict]:
+        """one report per group and statistic, e.g. to write to csv"""
+        names = ['count', 'mean', 'std'] + (['median'] if self.median is not None else [])
+        reports = []
+        for group in self.groups:
+            for name in names:
+                reports.append(OrderedDict(**{group_field: group, 'statistic': name}, **self.report(group, name)))
+        return reports
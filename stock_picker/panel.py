@@ -0,0 +1,313 @@
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+LOG = logging.getLogger('StockPanel')
+
+PANEL_FILE_MAGIC = b'STKPANEL'
+PANEL_FILE_ALIGNMENT = 64
+
+# (years, fields, values) of a statement, values has shape (years, fields)
+StatementArrays = Tuple[List[str], List[str], np.ndarray]
+
+
+def year_label(year) -> str:
+    """label of a statement year, e.g. '2019-12-31' for statements and '2020' for the price table"""
+    if isinstance(year, float) and year.is_integer():
+        return str(int(year))
+    return str(year)
+
+
+def to_float_array(values: Sequence) -> np.ndarray:
+    """convert a list of values to float64, None and non-numeric values become NaN"""
+    try:
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        array = np.full(len(values), np.nan)
+        for idx, val in enumerate(values):
+            try:
+                array[idx] = float(val)
+            except (TypeError, ValueError):
+                continue
+        return array
+
+
+def sort_statement(statement_data: Dict) -> StatementArrays:
+    """sort a statement by year, latest year first, and convert its fields to a float64 matrix
+
+    :param statement_data: Dictionary of `years` and fields, each a list of values by year
+    :return: (years, fields, values of shape (years, fields))
+    """
+    fields = [field for field in statement_data if field != 'years']
+    years = statement_data['years']
+    # fields are cut to the shortest one, as zipping them does
+    n_years = min(len(statement_data[field]) for field in ['years'] + fields)
+    order = sorted(range(n_years), key=years.__getitem__, reverse=True)
+    values = np.full((n_years, len(fields)), np.nan)
+    for col, field in enumerate(fields):
+        values[:, col] = to_float_array(statement_data[field][:n_years])[order]
+    return [year_label(years[idx]) for idx in order], fields, values
+
+
+def prepare_stock_data(
+        stock_ticker: str, stock_data: Dict, required_info: Iterable[str]
+) -> Tuple[Dict, Dict[str, StatementArrays]]:
+    """Validate stock data and split it into profile info and sorted statement arrays
+
+    :param stock_ticker: stock ticker
+    :param stock_data: stock data as scrapped
+    :param required_info: statements required in stock data
+    :return: (info, statements arrays)
+    """
+    statements = {}
+    for req_field in required_info:
+        if req_field not in stock_data:
+            raise ValueError(f'{req_field} not in {stock_ticker} data')
+        req_field_data = stock_data[req_field]
+        if len(req_field_data['years']) < 10:
+            raise ValueError(f'{req_field} has less than 5 data points')
+        try:
+            statements[req_field] = sort_statement(req_field_data)
+        except Exception as e:
+            raise ValueError(f'fail to sort {req_field} data by year: {e}')
+    info = {field: stock_data[field] for field in stock_data if field not in statements}
+    return info, statements
+
+
+def statement_view(statement_arrays: StatementArrays) -> Dict[str, np.ndarray]:
+    """Dictionary of `years` and the fields of sorted statement arrays, each a view of its column"""
+    years, fields, values = statement_arrays
+    view = {'years': np.array(years)}
+    for col, field in enumerate(fields):
+        view[field] = values[:, col]
+    return view
+
+
+def view_statement_arrays(view: Dict[str, np.ndarray]) -> StatementArrays:
+    """sorted statement arrays of a statement view, the reverse of `statement_view`"""
+    view = dict(view)
+    years = view.pop('years')
+    values = np.column_stack(list(view.values())) if view else np.full((len(years), 0), np.nan)
+    return [str(year) for year in years], list(view.keys()), values
+
+
+def statement_views_digest(views: Iterable[Dict[str, np.ndarray]]) -> str:
+    """digest of the years, fields and values of statement views"""
+    digest = hashlib.sha256()
+    for view in views:
+        view = dict(view)
+        years = view.pop('years')
+        digest.update(json.dumps([years.tolist(), list(view.keys())]).encode())
+        for array in view.values():
+            digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+class StockPanel:
+    """Columnar store of the statements of many stocks
+
+    Each statement is held as one float64 array of shape (tickers, years, fields) with NaN for missing values.
+    The year axis is relative to each ticker: index 0 is the latest year it reported, so `values[:, 0:4]` is the
+    last 4 years of every ticker. Added stocks are staged and merged into the arrays on the next read.
+    """
+    def __init__(self, statements: Sequence[str]):
+        self.statements = tuple(statements)
+        self._tickers = {}
+        self._fields = {st: {} for st in self.statements}
+        self._values = {st: np.full((0, 0, 0), np.nan) for st in self.statements}
+        self._present = {st: np.zeros((0, 0), dtype=bool) for st in self.statements}
+        self._years = {st: np.zeros((0, 0), dtype='<U1') for st in self.statements}
+        self._n_years = {st: np.zeros(0, dtype=np.int64) for st in self.statements}
+        self._pending = {}
+
+    def __len__(self):
+        return len(self._tickers)
+
+    def __contains__(self, ticker):
+        return ticker in self._tickers
+
+    @property
+    def tickers(self) -> List[str]:
+        return list(self._tickers.keys())
+
+    @property
+    def ticker_index(self) -> Dict[str, int]:
+        return self._tickers
+
+    def field_index(self, statement: str) -> Dict[str, int]:
+        self._consolidate()
+        return self._fields[statement]
+
+    def values(self, statement: str) -> np.ndarray:
+        """(tickers, years, fields) array of a statement"""
+        self._consolidate()
+        return self._values[statement]
+
+    def years(self, statement: str) -> np.ndarray:
+        """(tickers, years) array of year labels of a statement, empty string past a ticker's history"""
+        self._consolidate()
+        return self._years[statement]
+
+    def n_years(self, statement: str) -> np.ndarray:
+        """number of years reported by each ticker in a statement"""
+        self._consolidate()
+        return self._n_years[statement]
+
+    def rows(self, tickers: Iterable[str]) -> np.ndarray:
+        return np.array([self._tickers[tkr] for tkr in tickers], dtype=np.int64)
+
+    def add(self, ticker: str, statements: Dict[str, StatementArrays]):
+        """stage sorted statements arrays of a ticker, replacing its previous data"""
+        if ticker not in self._tickers:
+            self._tickers[ticker] = len(self._tickers)
+        self._pending[ticker] = statements
+
+    def add_many(self, stocks_statements: Iterable[Tuple[str, Dict[str, StatementArrays]]]):
+        for ticker, statements in stocks_statements:
+            self.add(ticker, statements)
+        self._consolidate()
+
+    def statement_view(self, ticker: str, statement: str) -> Dict[str, np.ndarray]:
+        """Dictionary of `years` and the fields reported by a ticker, each a view of its row latest year first"""
+        self._consolidate()
+        row = self._tickers[ticker]
+        n_years = self._n_years[statement][row]
+        values = self._values[statement][row, :n_years]
+        present = self._present[statement][row]
+        view = {'years': self._years[statement][row, :n_years]}
+        for field, col in self._fields[statement].items():
+            if present[col]:
+                view[field] = values[:, col]
+        return view
+
+    def ticker_digest(self, ticker: str) -> str:
+        """digest of the years and fields reported by a ticker, independent of the other tickers"""
+        return statement_views_digest(self.statement_view(ticker, statement) for statement in self.statements)
+
+    def save(self, file_path: Path, extra: Dict = None):
+        """write the panel to a binary file
+
+        The file holds a JSON header of the index maps, array layouts and `extra`, followed by the raw arrays each
+        aligned to 64 bytes. It is replaced atomically.
+        :param file_path: output file
+        :param extra: JSON serializable data stored in the header
+        :return:
+        """
+        self._consolidate()
+        arrays = {}
+        for st in self.statements:
+            arrays.update({f'{st}/values': self._values[st], f'{st}/present': self._present[st],
+                           f'{st}/years': self._years[st], f'{st}/n_years': self._n_years[st]})
+        header = {
+            'statements': self.statements,
+            'tickers': self.tickers,
+            'fields': {st: list(self._fields[st].keys()) for st in self.statements},
+            'arrays': {},
+            'extra': extra or {}
+        }
+        offset = 0
+        for name, array in arrays.items():
+            header['arrays'][name] = {'dtype': array.dtype.str, 'shape': array.shape, 'offset': offset}
+            offset += -(-array.nbytes // PANEL_FILE_ALIGNMENT) * PANEL_FILE_ALIGNMENT
+        header_bytes = json.dumps(header).encode()
+        data_start = -(-(len(PANEL_FILE_MAGIC) + 8 + len(header_bytes)) // PANEL_FILE_ALIGNMENT) * PANEL_FILE_ALIGNMENT
+        # written aside then moved over the file, so a killed run does not leave a truncated panel
+        temp_file = file_path.parent / f'{file_path.name}.tmp'
+        with temp_file.open('wb') as f:
+            f.write(PANEL_FILE_MAGIC)
+            f.write(data_start.to_bytes(8, 'little'))
+            f.write(header_bytes)
+            for name, array in arrays.items():
+                f.seek(data_start + header['arrays'][name]['offset'])
+                f.write(np.ascontiguousarray(array).tobytes())
+            f.truncate(data_start + offset)
+        temp_file.replace(file_path)
+        LOG.debug(f'saved panel of {len(self)} stocks to {file_path}')
+
+    @staticmethod
+    def read_header(f) -> Dict:
+        """read the header of a panel file opened in binary mode, `data_start` is the offset of the arrays"""
+        if f.read(len(PANEL_FILE_MAGIC)) != PANEL_FILE_MAGIC:
+            raise ValueError(f'{f.name} is not a panel file')
+        data_start = int.from_bytes(f.read(8), 'little')
+        header = json.loads(f.read(data_start - len(PANEL_FILE_MAGIC) - 8).rstrip(b'\0'))
+        header['data_start'] = data_start
+        return header
+
+    @classmethod
+    def load(cls, file_path: Path, mmap: bool = False) -> Tuple['StockPanel', Dict]:
+        """read a panel written by `save`
+
+        :param file_path: panel file
+        :param mmap: map the arrays read-only from the file instead of reading them, processes mapping the same file
+            share its pages. Stocks added to the panel are merged into new arrays in memory
+        :return: (panel, extra)
+        """
+        with file_path.open('rb') as f:
+            header = cls.read_header(f)
+            arrays = {}
+            buffer = np.memmap(file_path, dtype=np.uint8, mode='r') if mmap else None
+            for name, layout in header['arrays'].items():
+                dtype, offset = np.dtype(layout['dtype']), header['data_start'] + layout['offset']
+                if mmap:
+                    arrays[name] = np.ndarray(layout['shape'], dtype=dtype, buffer=buffer, offset=offset)
+                    continue
+                f.seek(offset)
+                count = int(np.prod(layout['shape']))
+                arrays[name] = np.fromfile(f, dtype=dtype, count=count).reshape(layout['shape'])
+        panel = cls(header['statements'])
+        panel._tickers = {ticker: row for row, ticker in enumerate(header['tickers'])}
+        for st in panel.statements:
+            panel._fields[st] = {field: col for col, field in enumerate(header['fields'][st])}
+            panel._values[st], panel._present[st], panel._years[st], panel._n_years[st] = (
+                arrays[f'{st}/{name}'] for name in ('values', 'present', 'years', 'n_years'))
+        LOG.debug(f"{'mapped' if mmap else 'loaded'} panel of {len(panel)} stocks from {file_path}")
+        return panel, header['extra']
+
+    def _consolidate(self):
+        """merge staged stocks into the statement arrays"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        n_tickers = len(self._tickers)
+        for st in self.statements:
+            field_idx = self._fields[st]
+            old_values = self._values[st]
+            max_years, max_label = old_values.shape[1], self._years[st].dtype.itemsize // 4
+            for statements in pending.values():
+                years, fields, _ = statements[st]
+                for field in fields:
+                    field_idx.setdefault(field, len(field_idx))
+                max_years = max(max_years, len(years))
+                max_label = max([max_label] + [len(yr) for yr in years])
+
+            values = np.full((n_tickers, max_years, len(field_idx)), np.nan)
+            values[:old_values.shape[0], :old_values.shape[1], :old_values.shape[2]] = old_values
+            present = np.zeros((n_tickers, len(field_idx)), dtype=bool)
+            old_present = self._present[st]
+            present[:old_present.shape[0], :old_present.shape[1]] = old_present
+            years_labels = np.zeros((n_tickers, max_years), dtype=f'<U{max_label}')
+            old_years = self._years[st]
+            years_labels[:old_years.shape[0], :old_years.shape[1]] = old_years
+            n_years = np.zeros(n_tickers, dtype=np.int64)
+            n_years[:len(self._n_years[st])] = self._n_years[st]
+
+            for ticker, statements in pending.items():
+                row = self._tickers[ticker]
+                years, fields, matrix = statements[st]
+                cols = [field_idx[field] for field in fields]
+                values[row] = np.nan
+                values[row, :len(years)][:, cols] = matrix
+                present[row] = False
+                present[row, cols] = True
+                years_labels[row] = ''
+                years_labels[row, :len(years)] = years
+                n_years[row] = len(years)
+
+            self._values[st], self._present[st], self._years[st], self._n_years[st] = \
+                values, present, years_labels, n_years
+        LOG.debug(f'merged {len(pending)} stocks into panel of {n_tickers} stocks')
@@ -1,15 +1,83 @@
 from pathlib import Path
+import hashlib
 import json
 import logging
 from typing import Dict, List, Tuple, Iterable, Optional
 import numpy as np
 from collections import OrderedDict
-import csv
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+import warnings
+
+from stock_picker.group_stats import GroupStats, group_codes
+from stock_picker.panel import (
+    StockPanel, prepare_stock_data, statement_view, statement_views_digest, view_statement_arrays
+)
+from stock_picker.report_cache import ReportCache
+from stock_picker.report_writer import get_report_writer
+from stock_picker.screening import (
+    DEFAULT_FILTERING_COUNTRIES, DEFAULT_FILTER_WARNING_RULES, OUTLIER_LOWER_BOUND_FIELDS, OUTLIER_UPPER_BOUND_FIELDS,
+    default_filter_masks, log_screening, outlier_filter_masks, reports_to_columns, screen
+)
+from stock_picker.stock_db import StockDatabase
+from stock_picker.utils.file_utils import folder_manifest_digest
 
 LOG = logging.getLogger('Picker')
 
+# bump when the reports generated from the same data and schema change, to invalidate cached reports
+REPORT_VERSION = 2
+# stock info that no report reads, e.g. the page refresh times of the scrapper, left out of the stock data digest
+UNREPORTED_INFO_FIELDS = ('refreshed_at',)
+
+# profile fields of a stock kept in the index of a lazy picker
+STOCK_INDEX_FIELDS = ('sector', 'industry', 'country', 'market_cap')
+
+# NaN-aware counterparts of the functions used in report by period schema
+NAN_FUNCTIONS = {
+    np.average: np.nanmean,
+    np.mean: np.nanmean,
+    np.median: np.nanmedian,
+    np.std: np.nanstd,
+    np.var: np.nanvar,
+}
+
+# section of the period report holding each `corr_coef_*` field of `create_batch_trend_report`
+TREND_REPORT_SECTIONS = OrderedDict([
+    ('corr_coef_revenue_last_5y', 'income_statement'),
+    ('corr_coef_eps_last_5y', 'income_statement'),
+    ('corr_coef_shares_outstanding_last_5y', 'income_statement'),
+    ('corr_coef_op_expenses_margin_last_5y', 'income_statement'),
+    ('corr_coef_gross_profit_margin_last_5y', 'income_statement'),
+    ('corr_coef_net_income_margin_last_5y', 'income_statement'),
+    ('corr_coef_pre_tax_net_income_margin_last_5y', 'income_statement'),
+    ('corr_coef_current_assets_liabilities_last_5y', 'balance_sheet'),
+    ('corr_coef_total_assets_liabilities_last_5y', 'balance_sheet'),
+    ('corr_coef_debt_issuance_last_5y', 'cash_flow_statement'),
+    ('corr_coef_equity_issued_last_5y', 'cash_flow_statement'),
+    ('corr_coef_net_income_per_op_cash_flow', 'cash_flow_statement'),
+    ('corr_coef_ROA_last_5y', 'price'),
+    ('corr_coef_ROE_last_5y', 'price'),
+    ('corr_coef_ROEC_last_5y', 'price'),
+    ('corr_coef_solvency_ratio_last_5y', 'other'),
+    ('corr_coef_cash_flow_margin_last_5y', 'other'),
+])
+
+
+def is_null(item) -> bool:
+    return item is None or (isinstance(item, float) and np.isnan(item))
+
+
+def first_value(array):
+    """latest value of a field, None if missing"""
+    if not len(array) or is_null(array[0]):
+        return None
+    return array[0]
+
 
 def apply_f_excl_none(func, array):
+    if isinstance(array, np.ndarray):
+        array_excl_none = array[~np.isnan(array)]
+        return func(array_excl_none) if array_excl_none.size else None
     array_excl_none = [item for item in array if item is not None and not np.isnan(item)]
     if not array_excl_none:
         return None
@@ -18,7 +86,7 @@ def apply_f_excl_none(func, array):
 
 
 def div(item1, item2):
-    if item1 is None or item2 is None:
+    if is_null(item1) or is_null(item2):
         return None
     if item2 == 0 or (item1 < 0 and item2 < 0):
         return None
@@ -26,6 +94,8 @@ def div(item1, item2):
 
 
 def sub(item1, item2):
+    if is_null(item1) or is_null(item2):
+        return None
     try:
         return item1 - item2
     except Exception:
@@ -33,6 +103,8 @@ def sub(item1, item2):
 
 
 def add(item1, item2):
+    if is_null(item1) or is_null(item2):
+        return None
     try:
         return item1 + item2
     except Exception:
@@ -40,7 +112,7 @@ def add(item1, item2):
 
 
 def reverse_sign(number):
-    if number is not None:
+    if not is_null(number):
         return -number
     else:
         return None
@@ -58,7 +130,7 @@ def coef_var(arr):
 
 
 def change_rate(item1, item2):
-    if item2 == 0:
+    if is_null(item1) or is_null(item2) or item2 == 0:
         return None
     try:
         return (item1 - item2)/item2
@@ -78,20 +150,106 @@ def check_lte(num1, num2):
     return False
 
 
+def nan_reduce(func, matrix: np.ndarray) -> np.ndarray:
+    """apply func to each row of a matrix excluding NaN, NaN for rows without any value"""
+    if func in NAN_FUNCTIONS:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            return NAN_FUNCTIONS[func](matrix, axis=1)
+    reduced = [apply_f_excl_none(func, row) for row in matrix]
+    return np.array([np.nan if val is None else val for val in reduced], dtype=np.float64)
+
+
+def report_field_name(field, function, period):
+    return f'{function.__name__}_{field}_prev_{period[0]}_{period[1]}_y'
+
+
+def div_arrays(array1: np.ndarray, array2: np.ndarray) -> np.ndarray:
+    """element-wise `div`, NaN where `div` returns None"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        quotient = array1 / array2
+    quotient[(array2 == 0) | ((array1 < 0) & (array2 < 0))] = np.nan
+    return quotient
+
+
+@lru_cache(maxsize=None)
+def time_index_moments(n_data_points: int) -> Tuple[np.ndarray, float]:
+    """centered time index of flipped points, latest point at the last time index, and its sum of squares"""
+    centered = np.arange(n_data_points - 1, -1, -1) - (n_data_points - 1) / 2
+    return centered, n_data_points * (n_data_points ** 2 - 1) / 12
+
+
+def batch_flipped_linear_corrcoef(matrix: np.ndarray, n_data_points: int) -> np.ndarray:
+    """`flipped_linear_corrcoef` of every row of a (series, years) matrix in one pass
+
+    The correlation is taken over the first n non-null points of each row against time, in closed form from the
+    precomputed moments of the time index.
+    :param matrix: series by row, latest year first, NaN for missing values
+    :param n_data_points: number of points to correlate
+    :return: correlation coefficient of each row, NaN if the row has less than n non-null points
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    valid = ~np.isnan(matrix)
+    corr = np.full(matrix.shape[0], np.nan)
+    enough_points = valid.sum(axis=1) >= n_data_points
+    if n_data_points < 2 or not enough_points.any():
+        return corr
+    matrix, valid = matrix[enough_points], valid[enough_points]
+    # stable sort moves the non-null points of each row to the front keeping their order
+    first_valid = np.argsort(~valid, axis=1, kind='stable')[:, :n_data_points]
+    points = np.take_along_axis(matrix, first_valid, axis=1)
+    time_centered, time_sum_squares = time_index_moments(n_data_points)
+    points_centered = points - points.mean(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr[enough_points] = np.clip(
+            points_centered @ time_centered / np.sqrt((points_centered ** 2).sum(axis=1) * time_sum_squares), -1, 1)
+    return corr
+
+
 def flipped_linear_corrcoef(arr, n_data_points):
-    arr_excl_none = [item for item in arr if item is not None]
-    if len(arr_excl_none) < n_data_points:
+    """`batch_flipped_linear_corrcoef` of a single series, None if it has less than n non-null points or no variance"""
+    points = [item for item in arr if not is_null(item)][:n_data_points]
+    if len(points) < n_data_points or n_data_points < 2:
+        return None
+    time_centered, time_sum_squares = time_index_moments(n_data_points)
+    points_centered = np.array(points, dtype=np.float64)
+    points_centered -= points_centered.mean()
+    points_sum_squares = points_centered @ points_centered
+    if not points_sum_squares:
         return None
-    flipped_arr = np.flip(arr_excl_none[:n_data_points])
-    return np.corrcoef(flipped_arr, list(range(len(flipped_arr))))[0, 1]
+    return np.clip(points_centered @ time_centered / np.sqrt(points_sum_squares * time_sum_squares), -1, 1)
+
+
+def load_stock_file(file: Path, required_info: Iterable[str]) -> Tuple[Dict, Dict]:
+    """parse and validate a stock data file, the file stem is the ticker
+
+    :return: (info, statements arrays)
+    """
+    with file.open() as f:
+        return prepare_stock_data(file.stem, json.load(f), required_info)
+
+
+def index_stock_file(file: Path, required_info: Iterable[str]) -> Dict:
+    """parse and validate a stock data file and keep its index entry, see `STOCK_INDEX_FIELDS`"""
+    info, _ = load_stock_file(file, required_info)
+    return {field: info.get(field) for field in STOCK_INDEX_FIELDS}
 
 
 class Picker:
-    def __init__(self):
-        self._all_stocks_data = {}
+    def __init__(self, lazy_cache_size: int = 256):
+        """
+        :param lazy_cache_size: max number of stocks data loaded on demand kept in memory by a lazy picker, see
+            `index_stocks_data_from_folder`
+        """
+        self._stocks_info = {}
+        self._stocks_index = {}
+        self._stocks_folder = None
+        self._lazy_cache = OrderedDict()
+        self.lazy_cache_size = lazy_cache_size
         self._stocks_by_industries = {}
         self._stocks_by_sectors = {}
         self.required_info = ('cash_flow_statement', 'income_statement', 'balance_sheet', 'price')
+        self._panel = StockPanel(self.required_info)
 
         self.default_period = (0, 4)
         self.default_function = np.average
@@ -155,7 +313,20 @@ class Picker:
 
     @property
     def all_stocks_data(self) -> Dict:
-        return self._all_stocks_data
+        return {ticker: self.get_stock_data(ticker) for ticker in self.tickers}
+
+    @property
+    def panel(self) -> StockPanel:
+        return self._panel
+
+    @property
+    def tickers(self) -> List:
+        return self._panel.tickers + [ticker for ticker in self._stocks_index if ticker not in self._panel]
+
+    @property
+    def lazy(self) -> bool:
+        """whether stocks are indexed and loaded on demand, see `index_stocks_data_from_folder`"""
+        return bool(self._stocks_index)
 
     @property
     def industries(self) -> List:
@@ -183,8 +354,80 @@ class Picker:
     def get_sector_tickers(self, sector) -> List:
         return self._stocks_by_sectors[sector]
 
+    def group_codes(self, tickers: List, by: Optional[str] = 'sector') -> Tuple[np.ndarray, List]:
+        """integer code of the sector or industry of each ticker, -1 if unknown
+
+        :param tickers: list of tickers
+        :param by: `sector` or `industry`, or None for a single group `all` of every ticker
+        :return: (code of each ticker, group names by code)
+        """
+        if by is None:
+            return np.zeros(len(tickers), dtype=np.int64), ['all']
+        groups = {'sector': self._stocks_by_sectors, 'industry': self._stocks_by_industries}[by]
+        return group_codes(tickers, groups)
+
     def get_stock_data(self, ticker) -> Dict:
-        return self._all_stocks_data[ticker]
+        """stock info and its statements as views over the panel, each field latest year first"""
+        if ticker not in self._panel and ticker in self._stocks_index:
+            return dict(self._load_indexed_stock(ticker))
+        stock_data = dict(self._stocks_info[ticker])
+        for statement in self.required_info:
+            stock_data[statement] = self._panel.statement_view(ticker, statement)
+        return stock_data
+
+    def stock_data_digest(self, ticker) -> str:
+        """digest of a stock info, except `UNREPORTED_INFO_FIELDS`, and statements"""
+        if ticker not in self._panel and ticker in self._stocks_index:
+            stock_data = self._load_indexed_stock(ticker)
+            info = {field: val for field, val in stock_data.items() if field not in self.required_info}
+            statements_digest = statement_views_digest(stock_data[statement] for statement in self.required_info)
+        else:
+            info = self._stocks_info[ticker]
+            statements_digest = self._panel.ticker_digest(ticker)
+        info = {field: val for field, val in info.items() if field not in UNREPORTED_INFO_FIELDS}
+        digest = hashlib.sha256(json.dumps(info, sort_keys=True, default=str).encode())
+        digest.update(statements_digest.encode())
+        return digest.hexdigest()
+
+    def _load_indexed_stock(self, ticker) -> Dict:
+        """stock data of an indexed ticker from the cache of recently used stocks, loaded from its file if missing"""
+        stock_data = self._lazy_cache.get(ticker)
+        if stock_data is not None:
+            self._lazy_cache.move_to_end(ticker)
+            return stock_data
+        info, statements = load_stock_file(
+            self._stocks_folder / self._stocks_index[ticker]['file'], self.required_info)
+        stock_data = dict(info)
+        for statement in self.required_info:
+            stock_data[statement] = statement_view(statements[statement])
+        self._lazy_cache[ticker] = stock_data
+        if len(self._lazy_cache) > self.lazy_cache_size:
+            self._lazy_cache.popitem(last=False)
+        return stock_data
+
+    def _report_panel(self, tickers: List) -> StockPanel:
+        """panel of the reported tickers
+
+        If some tickers are only indexed, a temporary panel of the reported tickers is built from the panel and the
+        cache of recently used stocks, and dropped with the report, so that a lazy picker stays bounded in memory.
+        """
+        if all(ticker in self._panel for ticker in tickers):
+            return self._panel
+        panel = StockPanel(self.required_info)
+        for ticker in tickers:
+            stock_data = self.get_stock_data(ticker)
+            panel.add(ticker, {statement: view_statement_arrays(stock_data[statement])
+                               for statement in self.required_info})
+        return panel
+
+    def report_schema_digest(self) -> str:
+        """digest of report by period schema, its defaults and the report version"""
+        return hashlib.sha256(json.dumps({
+            'version': REPORT_VERSION,
+            'default_period': self.default_period,
+            'default_function': self.default_function.__name__,
+            'schema': self.report_by_period_schema
+        }, default=lambda obj: getattr(obj, '__name__', str(obj))).encode()).hexdigest()
 
     def add_stock_data(self, stock_ticker, stock_data):
         """ Add stock data
@@ -193,89 +436,333 @@ class Picker:
         :param stock_data:
         :return:
         """
-        for req_field in self.required_info:
-            if req_field not in stock_data:
-                raise ValueError(f'{req_field} not in {stock_ticker} data')
-            req_field_data = stock_data[req_field]
-            if len(req_field_data['years']) < 10:
-                raise ValueError(f'{req_field} has less than 5 data points')
-            try:
-                ordered_fields = ('years',) + tuple(field for field in req_field_data if field != 'years')
-                zipped = zip(*[req_field_data[field] for field in ordered_fields])
-                for idx, sorted_data in enumerate(zip(*sorted(zipped, reverse=True))):
-                    req_field_data[ordered_fields[idx]] = sorted_data
-            except Exception as e:
-                raise ValueError(f'fail to sort {req_field} data by year: {e}')
-
-        self._all_stocks_data[stock_ticker] = stock_data
-        if 'sector' in stock_data:
-            self.add_ticker_to_sector(stock_data['sector'], stock_ticker)
+        info, statements = prepare_stock_data(stock_ticker, stock_data, self.required_info)
+        self._panel.add(stock_ticker, statements)
+        self.add_stock_info(stock_ticker, info)
+
+    def add_stock_info(self, stock_ticker, info: Dict):
+        self._stocks_info[stock_ticker] = info
+        if 'sector' in info:
+            self.add_ticker_to_sector(info['sector'], stock_ticker)
         else:
             LOG.warning(f'sector not found in {stock_ticker} data')
-        if 'industry' in stock_data:
-            self.add_ticker_to_industry(stock_data['industry'], stock_ticker)
+        if 'industry' in info:
+            self.add_ticker_to_industry(info['industry'], stock_ticker)
         else:
             LOG.warning(f'industry not found in {stock_ticker} data')
 
-    def discover_stocks_data_from_folder(self, stocks_folder_path: Path):
-        loaded, file_count = 0, 0
-        for file in stocks_folder_path.glob('*.json'):
-            file_count += 1
+    def save_snapshot(self, snapshot_path: Path, manifest: str = None):
+        """save the loaded stocks, their info and the sector and industry indexes to a binary snapshot
+
+        :param snapshot_path: snapshot file
+        :param manifest: digest of the source of the loaded stocks
+        :return:
+        """
+        self._panel.save(snapshot_path, extra={
+            'manifest': manifest,
+            'stocks_info': self._stocks_info,
+            'stocks_by_sectors': self._stocks_by_sectors,
+            'stocks_by_industries': self._stocks_by_industries
+        })
+        LOG.info(f'saved snapshot of {len(self._panel)} stocks to {snapshot_path}')
+
+    def load_snapshot(self, snapshot_path: Path, mmap: bool = False) -> Optional[str]:
+        """replace the loaded stocks with a snapshot saved by `save_snapshot`
+
+        :param snapshot_path: snapshot file
+        :param mmap: map the statements arrays read-only from the snapshot, shared by the processes mapping it
+        :return: digest of the source of the snapshot stocks
+        """
+        self._panel, extra = StockPanel.load(snapshot_path, mmap=mmap)
+        self._stocks_info = extra['stocks_info']
+        self._stocks_by_sectors = extra['stocks_by_sectors']
+        self._stocks_by_industries = extra['stocks_by_industries']
+        LOG.info(f'loaded snapshot of {len(self._panel)} stocks from {snapshot_path}')
+        return extra['manifest']
+
+    @classmethod
+    def from_snapshot(cls, snapshot_path: Path, mmap: bool = True) -> 'Picker':
+        """picker of the stocks of a snapshot, its statements mapped read-only from the snapshot by default"""
+        picker = cls()
+        picker.load_snapshot(snapshot_path, mmap=mmap)
+        return picker
+
+    def discover_stocks_data_from_folder(
+            self, stocks_folder_path: Path, workers: Optional[int] = None, use_processes: bool = False,
+            snapshot_path: Path = None):
+        """load all stock data files in a folder
+
+        Files are parsed and validated concurrently then merged into the panel at once.
+        :param stocks_folder_path: folder of `<ticker>.json` files
+        :param workers: number of workers of the pool, executor default if not specified
+        :param use_processes: parse files in a process pool instead of a thread pool
+        :param snapshot_path: restore from this snapshot if the folder files have not changed since it was saved,
+            else load the files and save the snapshot
+        :return:
+        """
+        if snapshot_path:
+            manifest = folder_manifest_digest(stocks_folder_path, '*.json')
+            if snapshot_path.exists():
+                try:
+                    with snapshot_path.open('rb') as f:
+                        snapshot_manifest = StockPanel.read_header(f)['extra']['manifest']
+                except Exception as e:
+                    LOG.exception(f'fail to read snapshot {snapshot_path}: {e}')
+                    snapshot_manifest = None
+                if snapshot_manifest == manifest:
+                    try:
+                        self.load_snapshot(snapshot_path)
+                        return
+                    except Exception as e:
+                        LOG.exception(f'fail to load snapshot {snapshot_path}, reloading files: {e}')
+                        self._panel = StockPanel(self.required_info)
+                else:
+                    LOG.info(f'snapshot {snapshot_path} is outdated')
+        files = list(stocks_folder_path.glob('*.json'))
+        executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        loaded = []
+        with executor_class(max_workers=workers) as executor:
+            futures = [executor.submit(load_stock_file, file, self.required_info) for file in files]
+            for file, future in zip(files, futures):
+                try:
+                    loaded.append((file.stem, future.result()))
+                except Exception as e:
+                    LOG.exception(f'fail to parse file {file}: {e}')
+        self._panel.add_many((ticker, statements) for ticker, (_, statements) in loaded)
+        for ticker, (info, _) in loaded:
+            self.add_stock_info(ticker, info)
+        LOG.info(f'loaded {len(loaded)}/{len(files)} stock data file in {stocks_folder_path}')
+        if snapshot_path:
+            self.save_snapshot(snapshot_path, manifest)
+
+    def index_stocks_data_from_folder(
+            self, stocks_folder_path: Path, index_path: Path = None, workers: Optional[int] = None,
+            use_processes: bool = False):
+        """index the stock data files in a folder, their data is loaded on demand
+
+        Only the sector, industry, country and market cap of each stock are kept, see `STOCK_INDEX_FIELDS`.
+        `get_stock_data` loads a stock from its file and keeps the `lazy_cache_size` most recently used stocks,
+        batch reports load their stocks into the panel.
+        :param stocks_folder_path: folder of `<ticker>.json` files
+        :param index_path: restore from this index if the folder files have not changed since it was saved, else
+            index the files and save the index
+        :param workers: number of workers of the pool, executor default if not specified
+        :param use_processes: parse files in a process pool instead of a thread pool
+        :return:
+        """
+        self._stocks_folder = stocks_folder_path
+        manifest = folder_manifest_digest(stocks_folder_path, '*.json')
+        stocks_index = None
+        if index_path and index_path.exists():
+            try:
+                with index_path.open() as f:
+                    saved_index = json.load(f)
+                if saved_index['manifest'] == manifest:
+                    stocks_index = saved_index['stocks']
+                    LOG.info(f'loaded index of {len(stocks_index)} stocks from {index_path}')
+                else:
+                    LOG.info(f'index {index_path} is outdated')
+            except Exception as e:
+                LOG.exception(f'fail to read index {index_path}: {e}')
+        if stocks_index is None:
+            files = list(stocks_folder_path.glob('*.json'))
+            executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+            stocks_index = {}
+            with executor_class(max_workers=workers) as executor:
+                futures = [executor.submit(index_stock_file, file, self.required_info) for file in files]
+                for file, future in zip(files, futures):
+                    try:
+                        stocks_index[file.stem] = {**future.result(), 'file': file.name}
+                    except Exception as e:
+                        LOG.exception(f'fail to parse file {file}: {e}')
+            LOG.info(f'indexed {len(stocks_index)}/{len(files)} stock data file in {stocks_folder_path}')
+            if index_path:
+                temp_path = index_path.parent / f'{index_path.name}.tmp'
+                with temp_path.open('w') as f:
+                    json.dump({'manifest': manifest, 'stocks': stocks_index}, f)
+                temp_path.replace(index_path)
+        self._lazy_cache.clear()
+        for ticker, entry in stocks_index.items():
+            self._stocks_index[ticker] = entry
+            if entry['sector'] is not None:
+                self.add_ticker_to_sector(entry['sector'], ticker)
+            if entry['industry'] is not None:
+                self.add_ticker_to_industry(entry['industry'], ticker)
+
+    def discover_stocks_data_from_database(self, database: StockDatabase, **selection):
+        """load the selected stocks of a stock database, only their rows are read
+
+        :param database: stock database
+        :param selection: `sectors`, `industries`, `countries`, `min_market_cap` and `max_market_cap` of the loaded
+            stocks, see `StockDatabase.iter_stocks_data`, all stocks if not specified
+        :return:
+        """
+        loaded = []
+        n_stocks = 0
+        for ticker, stock_data in database.iter_stocks_data(self.required_info, **selection):
+            n_stocks += 1
             try:
-                with file.open() as f:
-                    self.add_stock_data(file.stem, json.load(f))
-                loaded += 1
+                loaded.append((ticker, prepare_stock_data(ticker, stock_data, self.required_info)))
             except Exception as e:
-                LOG.exception(f'fail to parse file {file}: {e}')
-        LOG.info(f'loaded {loaded}/{file_count} stock data file in {stocks_folder_path}')
+                LOG.exception(f'fail to parse {ticker} data: {e}')
+        self._panel.add_many((ticker, statements) for ticker, (_, statements) in loaded)
+        for ticker, (info, _) in loaded:
+            self.add_stock_info(ticker, info)
+        LOG.info(f'loaded {len(loaded)}/{n_stocks} stocks data from {database.db_path}')
+
+    def field_schema_items(self, field_schema: Optional[Dict]) -> List[Tuple]:
+        """(function, period) pairs of a field in report by period schema"""
+        if not field_schema:
+            return [(self.default_function, self.default_period)]
+        return [(func, per) for per in field_schema['periods'] for func in field_schema['functions']]
 
     def create_report_by_period(self, data, schema) -> OrderedDict:
-        def report_field_name(field, function, period):
-            return f'{function.__name__}_{field}_prev_{period[0]}_{period[1]}_y'
-
         report = OrderedDict()
         for fld in schema:
-            field_schema = schema[fld]
-            if not field_schema:
-                per = self.default_period
-                func = self.default_function
+            for func, per in self.field_schema_items(schema[fld]):
                 report[report_field_name(fld, func, per)] = apply_f_excl_none(func, data[fld][per[0]:per[1]])
-            else:
-                for per in field_schema['periods']:
-                    for func in field_schema['functions']:
-                        report[report_field_name(fld, func, per)] = apply_f_excl_none(func, data[fld][per[0]:per[1]])
         return report
 
-    def generate_income_statement_reports(self, i_s_data: Dict) -> Tuple[OrderedDict, OrderedDict]:
+    def create_batch_report_by_period(self, tickers: List, schema: Dict = None) -> OrderedDict:
+        """create report by period of multiple tickers at once from the panel
+
+        Stocks of a lazy picker are loaded into a panel of the reported tickers only, see `_report_panel`.
+
+        :param tickers: list of tickers
+        :param schema: report by period schema by statement, `report_by_period_schema` if not specified
+        :return: OrderedDict of report field and its values by ticker, NaN where the report has None
+        """
+        panel = self._report_panel(tickers)
+        return self._batch_report_by_period(panel, panel.rows(tickers), schema)
+
+    def _batch_report_by_period(self, panel: StockPanel, rows: np.ndarray, schema: Dict = None) -> OrderedDict:
+        schema = self.report_by_period_schema if schema is None else schema
+        report = OrderedDict()
+        for statement in schema:
+            values = panel.values(statement)[rows]
+            field_index = panel.field_index(statement)
+            for fld in schema[statement]:
+                for func, per in self.field_schema_items(schema[statement][fld]):
+                    if fld in field_index:
+                        report[report_field_name(fld, func, per)] = nan_reduce(
+                            func, values[:, per[0]:per[1], field_index[fld]])
+                    else:
+                        report[report_field_name(fld, func, per)] = np.full(len(rows), np.nan)
+        return report
+
+    def create_batch_trend_report(self, tickers: List, n_data_points: int = 5) -> OrderedDict:
+        """create the `corr_coef_*` fields of period report of multiple tickers at once from the panel
+
+        Stocks of a lazy picker are loaded into a panel of the reported tickers only, see `_report_panel`.
+
+        :param tickers: list of tickers
+        :param n_data_points: number of latest non-null years to correlate
+        :return: OrderedDict of report field and its values by ticker, NaN where the report has None
+        """
+        panel = self._report_panel(tickers)
+        return self._batch_trend_report(panel, panel.rows(tickers), n_data_points)
+
+    @staticmethod
+    def _batch_trend_report(panel: StockPanel, rows: np.ndarray, n_data_points: int = 5) -> OrderedDict:
+        def field(statement, fld):
+            values = panel.values(statement)[rows]
+            col = panel.field_index(statement).get(fld)
+            return values[:, :, col] if col is not None else np.full(values.shape[:2], np.nan)
+
+        def aligned(*matrices):
+            n_years = min(matrix.shape[1] for matrix in matrices)
+            return [matrix[:, :n_years] for matrix in matrices]
+
+        def ratio(numerator, denominator):
+            return div_arrays(*aligned(numerator, denominator))
+
+        revenue = field('income_statement', 'revenue')
+        net_income = field('income_statement', 'net_income')
+        total_assets = field('balance_sheet', 'total_assets')
+        total_liabilities = field('balance_sheet', 'total_liabilities')
+        op_cash_flow = field('cash_flow_statement', 'cash_flow_from_operating_activities')
+        series = OrderedDict({
+            'corr_coef_revenue_last_5y': revenue,
+            'corr_coef_eps_last_5y': field('income_statement', 'eps_earnings_per_share'),
+            'corr_coef_shares_outstanding_last_5y': field('income_statement', 'shares_outstanding'),
+            'corr_coef_op_expenses_margin_last_5y': ratio(field('income_statement', 'operating_expenses'), revenue),
+            'corr_coef_gross_profit_margin_last_5y': ratio(field('income_statement', 'gross_profit'), revenue),
+            'corr_coef_net_income_margin_last_5y': ratio(net_income, revenue),
+            'corr_coef_pre_tax_net_income_margin_last_5y': ratio(field('income_statement', 'pre_tax_income'), revenue),
+            'corr_coef_current_assets_liabilities_last_5y': ratio(
+                field('balance_sheet', 'total_current_assets'), field('balance_sheet', 'total_current_liabilities')),
+            'corr_coef_total_assets_liabilities_last_5y': ratio(total_assets, total_liabilities),
+            'corr_coef_debt_issuance_last_5y': field('cash_flow_statement', 'debt_issuance_retirement_net_total'),
+            'corr_coef_equity_issued_last_5y': field('cash_flow_statement', 'net_total_equity_issued_repurchased'),
+            'corr_coef_net_income_per_op_cash_flow': ratio(
+                field('cash_flow_statement', 'net_income_loss'), op_cash_flow),
+            'corr_coef_ROA_last_5y': ratio(net_income, total_assets),
+            'corr_coef_ROE_last_5y': ratio(net_income, field('balance_sheet', 'share_holder_equity')),
+            'corr_coef_ROEC_last_5y': ratio(net_income, np.subtract(*aligned(total_assets, total_liabilities))),
+            'corr_coef_solvency_ratio_last_5y': ratio(
+                np.subtract(*aligned(net_income, field('income_statement', 'total_non_operating_income_expense'))),
+                total_liabilities),
+            'corr_coef_cash_flow_margin_last_5y': ratio(op_cash_flow, revenue),
+        })
+        return OrderedDict(
+            (name, batch_flipped_linear_corrcoef(matrix, n_data_points)) for name, matrix in series.items())
+
+    def create_batch_period_reports(self, tickers: List) -> List[Dict[str, OrderedDict]]:
+        """period reports of multiple tickers from one pass over the panel, see `create_batch_report_by_period` and
+        `create_batch_trend_report`
+
+        :param tickers: list of tickers
+        :return: for each ticker, its period report of each statement, and of `other` trends, None where NaN
+        """
+        panel = self._report_panel(tickers)
+        rows = panel.rows(tickers)
+        by_period = self._batch_report_by_period(panel, rows)
+        trends = self._batch_trend_report(panel, rows)
+        sections = OrderedDict((statement, [
+            report_field_name(fld, func, per) for fld, field_schema in schema.items()
+            for func, per in self.field_schema_items(field_schema)
+        ]) for statement, schema in self.report_by_period_schema.items())
+        sections['other'] = []
+        for name, section in TREND_REPORT_SECTIONS.items():
+            sections[section].append(name)
+        columns = {**by_period, **trends}
+        return [{section: OrderedDict(
+            (name, None if np.isnan(columns[name][idx]) else columns[name][idx]) for name in names
+        ) for section, names in sections.items()} for idx in range(len(rows))]
+
+    def generate_income_statement_reports(
+            self, i_s_data: Dict, period_rep: OrderedDict = None) -> Tuple[OrderedDict, OrderedDict]:
         """create report by periods and create metrics report from income statement
 
         :param i_s_data: income statement data
+        :param period_rep: report by periods of `create_batch_period_reports`, computed from the data if not specified
         :return: (report by periods, metrics report)
         """
-        period_rep = self.create_report_by_period(i_s_data, self.report_by_period_schema['income_statement'])
+        if period_rep is None:
+            period_rep = self.create_report_by_period(i_s_data, self.report_by_period_schema['income_statement'])
+            period_rep['corr_coef_revenue_last_5y'] = flipped_linear_corrcoef(i_s_data['revenue'], 5)
+            period_rep['corr_coef_eps_last_5y'] = flipped_linear_corrcoef(i_s_data['eps_earnings_per_share'], 5)
+            period_rep['corr_coef_shares_outstanding_last_5y'] = flipped_linear_corrcoef(
+                i_s_data['shares_outstanding'], 5)
+            period_rep['corr_coef_op_expenses_margin_last_5y'] = flipped_linear_corrcoef(
+                [div(g_p, i_s_data['revenue'][idx]) for idx, g_p in enumerate(i_s_data['operating_expenses'])], 5)
+            period_rep['corr_coef_gross_profit_margin_last_5y'] = flipped_linear_corrcoef(
+                [div(g_p, i_s_data['revenue'][idx]) for idx, g_p in enumerate(i_s_data['gross_profit'])], 5)
+            period_rep['corr_coef_net_income_margin_last_5y'] = flipped_linear_corrcoef(
+                [div(inc, i_s_data['revenue'][idx]) for idx, inc in enumerate(i_s_data['net_income'])], 5)
+            period_rep['corr_coef_pre_tax_net_income_margin_last_5y'] = flipped_linear_corrcoef(
+                [div(inc, i_s_data['revenue'][idx]) for idx, inc in enumerate(i_s_data['pre_tax_income'])], 5)
 
         metrics_rep = OrderedDict()
-        period_rep['corr_coef_revenue_last_5y'] = flipped_linear_corrcoef(i_s_data['revenue'], 5)
-        period_rep['corr_coef_eps_last_5y'] = flipped_linear_corrcoef(i_s_data['eps_earnings_per_share'], 5)
-        period_rep['corr_coef_shares_outstanding_last_5y'] = flipped_linear_corrcoef(
-            i_s_data['shares_outstanding'], 5)
-        period_rep['corr_coef_op_expenses_margin_last_5y'] = flipped_linear_corrcoef(
-            [div(g_p, i_s_data['revenue'][idx]) for idx, g_p in enumerate(i_s_data['operating_expenses'])], 5)
         metrics_rep['average_op_expenses_margin_prev_0_4_y'] = div(
             period_rep['average_operating_expenses_prev_0_4_y'], period_rep['average_revenue_prev_0_4_y']
         )
-        period_rep['corr_coef_gross_profit_margin_last_5y'] = flipped_linear_corrcoef(
-            [div(g_p, i_s_data['revenue'][idx]) for idx, g_p in enumerate(i_s_data['gross_profit'])], 5)
         metrics_rep['average_gross_profit_margin_prev_0_4_y'] = div(
             period_rep['average_gross_profit_prev_0_4_y'], period_rep['average_revenue_prev_0_4_y']
         )
-        period_rep['corr_coef_net_income_margin_last_5y'] = flipped_linear_corrcoef(
-            [div(inc, i_s_data['revenue'][idx]) for idx, inc in enumerate(i_s_data['net_income'])], 5)
         metrics_rep['average_net_income_margin_prev_0_4_y'] = div(
             period_rep['average_net_income_prev_0_4_y'], period_rep['average_revenue_prev_0_4_y']
         )
-        period_rep['corr_coef_pre_tax_net_income_margin_last_5y'] = flipped_linear_corrcoef(
-            [div(inc, i_s_data['revenue'][idx]) for idx, inc in enumerate(i_s_data['pre_tax_income'])], 5)
         metrics_rep['average_pre_tax_net_income_margin_prev_0_4_y'] = div(
             period_rep['average_pre_tax_income_prev_0_4_y'], period_rep['average_revenue_prev_0_4_y']
         )
@@ -304,13 +791,24 @@ class Picker:
         ) else None
         return period_rep, metrics_rep
 
-    def generate_balance_sheet_reports(self, b_s_data: Dict) -> Tuple[OrderedDict, OrderedDict]:
+    def generate_balance_sheet_reports(
+            self, b_s_data: Dict, period_rep: OrderedDict = None) -> Tuple[OrderedDict, OrderedDict]:
         """create report by periods and create metrics report from balance sheet
 
         :param b_s_data: balance sheet data
+        :param period_rep: report by periods of `create_batch_period_reports`, computed from the data if not specified
         :return: (report by periods, metrics report)
         """
-        period_rep = self.create_report_by_period(b_s_data, self.report_by_period_schema['balance_sheet'])
+        if period_rep is None:
+            period_rep = self.create_report_by_period(b_s_data, self.report_by_period_schema['balance_sheet'])
+            period_rep['corr_coef_current_assets_liabilities_last_5y'] = flipped_linear_corrcoef([
+                div(b_s_data['total_current_assets'][idx], equity)
+                for idx, equity in enumerate(b_s_data['total_current_liabilities'])], 5
+            )
+            period_rep['corr_coef_total_assets_liabilities_last_5y'] = flipped_linear_corrcoef([
+                div(b_s_data['total_assets'][idx], equity)
+                for idx, equity in enumerate(b_s_data['total_liabilities'])], 5
+            )
         metrics_rep = OrderedDict({
             'latest_current_assets_liabilities_ratio': div(
                 b_s_data['total_current_assets'][0], b_s_data['total_current_liabilities'][0]
@@ -341,30 +839,25 @@ class Picker:
                 period_rep['average_total_current_assets_prev_0_4_y']
             )
         })
-        period_rep['corr_coef_current_assets_liabilities_last_5y'] = flipped_linear_corrcoef([
-            div(b_s_data['total_current_assets'][idx], equity)
-            for idx, equity in enumerate(b_s_data['total_current_liabilities'])], 5
-        )
-        period_rep['corr_coef_total_assets_liabilities_last_5y'] = flipped_linear_corrcoef([
-            div(b_s_data['total_assets'][idx], equity)
-            for idx, equity in enumerate(b_s_data['total_liabilities'])], 5
-        )
         return period_rep, metrics_rep
 
-    def generate_cash_flow_reports(self, c_f_data: Dict) -> Tuple[OrderedDict, OrderedDict]:
+    def generate_cash_flow_reports(
+            self, c_f_data: Dict, period_rep: OrderedDict = None) -> Tuple[OrderedDict, OrderedDict]:
         """create report by periods and create metrics report from cash flow statement
 
         :param c_f_data: cash flow statement data
+        :param period_rep: report by periods of `create_batch_period_reports`, computed from the data if not specified
         :return: (report by periods, metrics report)
         """
-        period_rep = self.create_report_by_period(c_f_data, self.report_by_period_schema['cash_flow_statement'])
-        period_rep['corr_coef_debt_issuance_last_5y'] = flipped_linear_corrcoef(
-            c_f_data['debt_issuance_retirement_net_total'], 5)
-        period_rep['corr_coef_equity_issued_last_5y'] = flipped_linear_corrcoef(
-            c_f_data['net_total_equity_issued_repurchased'], 5)
-        period_rep['corr_coef_net_income_per_op_cash_flow'] = flipped_linear_corrcoef(
-            [div(net_inc, c_f_data['cash_flow_from_operating_activities'][idx])
-             for idx, net_inc in enumerate(c_f_data['net_income_loss'])], 5)
+        if period_rep is None:
+            period_rep = self.create_report_by_period(c_f_data, self.report_by_period_schema['cash_flow_statement'])
+            period_rep['corr_coef_debt_issuance_last_5y'] = flipped_linear_corrcoef(
+                c_f_data['debt_issuance_retirement_net_total'], 5)
+            period_rep['corr_coef_equity_issued_last_5y'] = flipped_linear_corrcoef(
+                c_f_data['net_total_equity_issued_repurchased'], 5)
+            period_rep['corr_coef_net_income_per_op_cash_flow'] = flipped_linear_corrcoef(
+                [div(net_inc, c_f_data['cash_flow_from_operating_activities'][idx])
+                 for idx, net_inc in enumerate(c_f_data['net_income_loss'])], 5)
 
         metrics_rep = OrderedDict({
             'average_debt_issuance_per_net_income_prev_0_4_y': div(
@@ -393,14 +886,26 @@ class Picker:
         return period_rep, metrics_rep
 
     def generate_price_reports(
-            self, price_data, i_s_data, b_s_data, c_f_data, i_s_period_rep, b_s_period_rep, c_f_period_rep
+            self, price_data, i_s_data, b_s_data, c_f_data, i_s_period_rep, b_s_period_rep, c_f_period_rep,
+            price_period_rep: OrderedDict = None
     ) -> Tuple[OrderedDict, OrderedDict]:
-        price_period_rep = self.create_report_by_period(price_data, self.report_by_period_schema['price'])
+        if price_period_rep is None:
+            price_period_rep = self.create_report_by_period(price_data, self.report_by_period_schema['price'])
+            price_period_rep['corr_coef_ROA_last_5y'] = flipped_linear_corrcoef([
+                div(i_s_data['net_income'][idx], assets) for idx, assets in enumerate(b_s_data['total_assets'])], 5
+            )
+            price_period_rep['corr_coef_ROE_last_5y'] = flipped_linear_corrcoef([
+                div(i_s_data['net_income'][idx], s_e) for idx, s_e in enumerate(b_s_data['share_holder_equity'])], 5
+            )
+            price_period_rep['corr_coef_ROEC_last_5y'] = flipped_linear_corrcoef([
+                div(n_i, sub(b_s_data['total_assets'][idx], b_s_data['total_liabilities'][idx]))
+                for idx, n_i in enumerate(i_s_data['net_income'])], 5
+            )
         price_metrics_rep = OrderedDict()
-        price_metrics_rep['latest_price'] = price_data['year_close'][0] if price_data['year_close'] else None
+        price_metrics_rep['latest_price'] = first_value(price_data['year_close'])
 
         # p/e related
-        price_metrics_rep['latest_eps'] = i_s_data['eps_earnings_per_share'][0]
+        price_metrics_rep['latest_eps'] = first_value(i_s_data['eps_earnings_per_share'])
         price_metrics_rep['latest_pe'] = div(price_metrics_rep['latest_price'], price_metrics_rep['latest_eps'])
         price_metrics_rep['average_eps_prev_0_4_y'] = i_s_period_rep['average_eps_earnings_per_share_prev_0_4_y']
         price_metrics_rep['latest_p_average_e_prev_0_4_y'] = div(
@@ -438,8 +943,9 @@ class Picker:
         )
 
         # p/bv related
-        latest_bv = sub(b_s_data['share_holder_equity'][0], b_s_data['goodwill_and_intangible_assets'][0]) if \
-            b_s_data['goodwill_and_intangible_assets'][0] else b_s_data['share_holder_equity'][0]
+        latest_intangible = first_value(b_s_data['goodwill_and_intangible_assets'])
+        latest_bv = sub(b_s_data['share_holder_equity'][0], latest_intangible) if \
+            latest_intangible else first_value(b_s_data['share_holder_equity'])
         price_metrics_rep['latest_bv_per_share'] = div(latest_bv, i_s_data['shares_outstanding'][0])
         price_metrics_rep['latest_p_bv'] = div(
             price_metrics_rep['latest_price'], price_metrics_rep['latest_bv_per_share'])
@@ -459,23 +965,13 @@ class Picker:
         price_metrics_rep['average_ROA_prev_0_4_y'] = div(
             i_s_period_rep['average_net_income_prev_0_4_y'], b_s_period_rep['average_total_assets_prev_0_4_y']
         )
-        price_period_rep['corr_coef_ROA_last_5y'] = flipped_linear_corrcoef([
-            div(i_s_data['net_income'][idx], assets) for idx, assets in enumerate(b_s_data['total_assets'])], 5
-        )
         price_metrics_rep['average_ROE_prev_0_4_y'] = div(
             i_s_period_rep['average_net_income_prev_0_4_y'], b_s_period_rep['average_share_holder_equity_prev_0_4_y']
         )
-        price_period_rep['corr_coef_ROE_last_5y'] = flipped_linear_corrcoef([
-            div(i_s_data['net_income'][idx], s_e) for idx, s_e in enumerate(b_s_data['share_holder_equity'])], 5
-        )
         price_metrics_rep['average_ROEC_prev_0_4_y'] = div(
             i_s_period_rep['average_net_income_prev_0_4_y'],
             sub(b_s_period_rep['average_total_assets_prev_0_4_y'], b_s_period_rep['average_total_liabilities_prev_0_4_y'])
         )
-        price_period_rep['corr_coef_ROEC_last_5y'] = flipped_linear_corrcoef([
-            div(n_i, sub(b_s_data['total_assets'][idx], b_s_data['total_liabilities'][idx]))
-            for idx, n_i in enumerate(i_s_data['net_income'])], 5
-        )
         price_metrics_rep['latest_dividend_per_share'] = div(
             reverse_sign(c_f_data['total_common_and_preferred_stock_dividends_paid'][0]),
             i_s_data['shares_outstanding'][0]
@@ -485,23 +981,35 @@ class Picker:
         )
         return price_period_rep, price_metrics_rep
 
-    def generate_period_and_metrics_report(self, stock_ticker) -> Tuple[OrderedDict, OrderedDict]:
+    def generate_period_and_metrics_report(
+            self, stock_ticker, period_reps: Dict[str, OrderedDict] = None) -> Tuple[OrderedDict, OrderedDict]:
+        """generate period and metrics report of a ticker
 
+        :param stock_ticker: stock ticker
+        :param period_reps: period reports of the ticker of `create_batch_period_reports`, computed from its data if
+            not specified
+        :return: (period report, metrics report)
+        """
         LOG.debug(f'generating {stock_ticker} period and metrics report')
         stock_data = self.get_stock_data(stock_ticker)
+        period_reps = period_reps or {}
 
         i_s_data = stock_data['income_statement']
-        i_s_period_rep, i_s_metrics_rep = self.generate_income_statement_reports(i_s_data)
+        i_s_period_rep, i_s_metrics_rep = self.generate_income_statement_reports(
+            i_s_data, period_reps.get('income_statement'))
 
         b_s_data = stock_data['balance_sheet']
-        b_s_period_rep, b_s_metrics_rep = self.generate_balance_sheet_reports(b_s_data)
+        b_s_period_rep, b_s_metrics_rep = self.generate_balance_sheet_reports(
+            b_s_data, period_reps.get('balance_sheet'))
 
         c_f_data = stock_data['cash_flow_statement']
-        c_f_period_rep, c_f_metrics_rep = self.generate_cash_flow_reports(c_f_data)
+        c_f_period_rep, c_f_metrics_rep = self.generate_cash_flow_reports(
+            c_f_data, period_reps.get('cash_flow_statement'))
 
         price_data = stock_data['price']
         price_period_rep, price_metrics_rep = self.generate_price_reports(
-            price_data, i_s_data, b_s_data, c_f_data, i_s_period_rep, b_s_period_rep, c_f_period_rep)
+            price_data, i_s_data, b_s_data, c_f_data, i_s_period_rep, b_s_period_rep, c_f_period_rep,
+            period_reps.get('price'))
 
         other_metrics = OrderedDict({
             'average_net_cash_flow_per_market_cap_prev_0_4_y': div(
@@ -521,7 +1029,7 @@ class Picker:
             )
         })
 
-        other_period_metrics = OrderedDict({
+        other_period_metrics = period_reps.get('other') or OrderedDict({
             'corr_coef_solvency_ratio_last_5y': flipped_linear_corrcoef(
                 [div(sub(i_s_data['net_income'][idx], i_s_data['total_non_operating_income_expense'][idx]), t_l)
                  for idx, t_l in enumerate(b_s_data['total_liabilities'])],
@@ -545,16 +1053,37 @@ class Picker:
             **other_period_metrics)
         return period_rep, metrics_rep
 
+    def generate_period_and_metrics_reports(
+            self, tickers: List, report_cache: ReportCache = None) -> List[Tuple[OrderedDict, OrderedDict]]:
+        """generate period and metrics report of multiple tickers, only for new or changed tickers if cached
+
+        The period reports of the generated tickers are computed at once over the panel, see
+        `create_batch_period_reports`.
+        :param tickers: list of tickers
+        :param report_cache: cache of reports, updated with the generated reports
+        :return: list of (period report, metrics report)
+        """
+        if report_cache is None:
+            return [self.generate_period_and_metrics_report(tkr, period_reps)
+                    for tkr, period_reps in zip(tickers, self.create_batch_period_reports(tickers))]
+        schema_digest = self.report_schema_digest()
+        keys = [f'{schema_digest}-{self.stock_data_digest(tkr)}' for tkr in tickers]
+        p_and_m_reps = [report_cache.get(tkr, key) for tkr, key in zip(tickers, keys)]
+        missing = [idx for idx, reps in enumerate(p_and_m_reps) if reps is None]
+        batch_period_reps = self.create_batch_period_reports([tickers[idx] for idx in missing]) if missing else []
+        for idx, period_reps in zip(missing, batch_period_reps):
+            p_and_m_reps[idx] = self.generate_period_and_metrics_report(tickers[idx], period_reps)
+            report_cache.put(tickers[idx], keys[idx], p_and_m_reps[idx])
+        report_cache.save()
+        LOG.info(f'generated {len(missing)}/{len(tickers)} reports, the rest from cache')
+        return p_and_m_reps
+
     @staticmethod
     def default_filter(
             period_report: Dict,
             metrics_report: Dict,
             market_cap: int = 100,
-            filtering_country: Iterable[str] = (
-                'argentina', 'australia', 'bermuda', 'brazil', 'chile', 'china', 'columbia',
-                'hong_kong_sar_china', 'india', 'indonesia', 'israel', 'japan', 'mexico', 'russia', 'south_africa',
-                'hong_kong, _sar_china'
-            ),
+            filtering_country: Iterable[str] = DEFAULT_FILTERING_COUNTRIES,
             positive_avg_earning: bool = True,
             positive_cash_on_hand: bool = True,
             solid_liquidity: bool = True,
@@ -604,26 +1133,12 @@ class Picker:
         :return:
         """
         ticker = metrics_report['ticker']
-        for field in (
-            'eps_growth_prev_0_4_vs_5_9_y',
-            'average_current_assets_liabilities_ratio_prev_0_4_y', 'average_total_assets_liabilities_ratio_prev_0_4_y',
-            'average_cash_total_liabilities_prev_0_4_y', 'average_solvency_ratio_prev_0_4_y',
-            'average_gross_profit_margin_prev_0_4_y', 'average_net_income_margin_prev_0_4_y',
-            'average_pre_tax_net_income_margin_prev_0_4_y',
-            'average_ROA_prev_0_4_y', 'average_ROE_prev_0_4_y', 'average_ROEC_prev_0_4_y',
-            'average_cash_flow_margin_prev_0_4_y', 'average_net_cash_flow_per_market_cap_prev_0_4_y',
-
-        ):
+        for field in OUTLIER_LOWER_BOUND_FIELDS:
             if check_lt(metrics_report[field], group_avg[field] - 0.675 * group_std[field]):
                 LOG.info(f'filtered {ticker}: {field}: {metrics_report[field]} '
                          f'< group avg - std: {group_avg[field] - 0.675 * group_std[field]}')
                 return False
-        for field in (
-            'average_op_expenses_margin_prev_0_4_y', 'average_non_op_per_op_expense_prev_0_4_y',
-            'average_pe_prev_0_4_y', 'average_p_cash_prev_0_4_y', 'average_p_bv_prev_0_4_y',
-            'average_dividend_net_income_ratio_prev_0_4_y', 'average_debt_issuance_per_net_income_prev_0_4_y',
-            'average_equity_issued_per_net_income_prev_0_4_y', 'average_inventory_current_assets_ratio_prev_0_4_y'
-        ):
+        for field in OUTLIER_UPPER_BOUND_FIELDS:
             if check_lt(group_avg[field] + 0.675 * group_std[field], metrics_report[field]):
                 LOG.info(f'filtered {ticker}: {field}: {metrics_report[field]} '
                          f'> group avg + std: {group_avg[field] + 0.675 * group_std[field]}')
@@ -656,13 +1171,13 @@ class Picker:
 
     @staticmethod
     def write_reports_to_csv(output_file_path: Path, fields: List[str], reports: List[Optional[Dict]]):
-        LOG.debug(f'Writing {len(reports)} reports to {output_file_path}')
-        with output_file_path.open('w') as f:
-            writer = csv.DictWriter(f, fieldnames=fields)
-            writer.writeheader()
-            for rep in reports:
-                if rep:
-                    writer.writerow(rep)
+        Picker.write_reports(output_file_path, fields, reports, 'csv')
+
+    @staticmethod
+    def write_reports(output_file_path: Path, fields: List[str], reports: List[Optional[Dict]], fmt: str = 'csv'):
+        """write reports with the report writer of format, see `stock_picker.report_writer`"""
+        LOG.debug(f'Writing {len(reports)} reports to {output_file_path} as {fmt}')
+        get_report_writer(fmt).write(output_file_path, fields, reports)
 
     @staticmethod
     def create_group_average_report(reports: List[Dict]) -> Optional[Dict]:
@@ -694,6 +1209,63 @@ class Picker:
         LOG.info(f'std_report: {std_rep}')
         return std_rep
 
+    def create_group_stats(
+            self, metrics_reports: List[Dict], by: Optional[str] = 'sector', median: bool = False) -> GroupStats:
+        """statistics of the numeric fields of metrics reports for every sector or industry at once
+
+        :param metrics_reports: metrics reports
+        :param by: `sector` or `industry`, or None for the statistics of all reports as a single group `all`
+        :param median: also compute median
+        :return:
+        """
+        columns = reports_to_columns(metrics_reports)
+        fields = [field for field, values in columns.items() if values.dtype == np.float64]
+        codes, groups = self.group_codes([rep['ticker'] for rep in metrics_reports], by)
+        values = np.column_stack([columns[field] for field in fields]) if fields else np.empty((len(codes), 0))
+        return GroupStats(values, codes, groups, fields, median)
+
+    def screen_reports(
+            self,
+            p_and_m_reps: List[Tuple[OrderedDict, OrderedDict]],
+            group_by: str = None,
+            group_stats_out_file_path: Path = None,
+            report_format: str = 'csv',
+            **default_filter_kwargs
+    ) -> List[Tuple[OrderedDict, OrderedDict]]:
+        """keep reports passing the default filter then the outlier filter of the remaining group, with warnings
+
+        The filters rules are evaluated as masks over the whole group at once. The outlier filter compares each report
+        to the statistics of its group, see `create_group_stats`.
+        :param p_and_m_reps: list of (period report, metrics report)
+        :param group_by: compare each report to its `sector` or `industry` in the outlier filter instead of the
+            whole group
+        :param group_stats_out_file_path: output file for the group statistics of the outlier filter
+        :param report_format: format of the group statistics file
+        :param default_filter_kwargs: arguments of `default_filter`
+        :return: list of passing (period report, metrics report)
+        """
+        if not p_and_m_reps:
+            return p_and_m_reps
+        passed, bitmap, rules = screen(default_filter_masks(
+            reports_to_columns([rep[0] for rep in p_and_m_reps]), reports_to_columns([rep[1] for rep in p_and_m_reps]),
+            **default_filter_kwargs
+        ), DEFAULT_FILTER_WARNING_RULES)
+        log_screening([rep[1]['ticker'] for rep in p_and_m_reps], bitmap, rules, 'default filter')
+        p_and_m_reps = [rep for rep, rep_passed in zip(p_and_m_reps, passed) if rep_passed]
+        if not p_and_m_reps:
+            return p_and_m_reps
+        metrics_reports = [rep[1] for rep in p_and_m_reps]
+        group_stats = self.create_group_stats(metrics_reports, group_by)
+        codes, _ = self.group_codes([rep['ticker'] for rep in metrics_reports], group_by)
+        group_avg, group_std = group_stats.by_row(codes, 'mean'), group_stats.by_row(codes, 'std')
+        if group_stats_out_file_path:
+            stats_reports = group_stats.to_reports(group_by or 'group')
+            self.write_reports(group_stats_out_file_path, list(stats_reports[0].keys()), stats_reports, report_format)
+        passed, bitmap, rules = screen(outlier_filter_masks(reports_to_columns(metrics_reports), group_avg, group_std))
+        log_screening([rep['ticker'] for rep in metrics_reports], bitmap, rules, 'outlier filter')
+        return [(rep[0], self.add_warnings_to_metrics_rep(rep[0], rep[1]))
+                for rep, rep_passed in zip(p_and_m_reps, passed) if rep_passed]
+
     def create_reports_from_multiple_tickers(
             self,
             tickers: List,
@@ -701,7 +1273,11 @@ class Picker:
             unfiltered_period_report_out_file_path: Path = None,
             unfiltered_metrics_report_out_file_path: Path = None,
             filtered_period_report_out_file_path: Path = None,
-            filtered_metrics_report_out_file_path: Path = None
+            filtered_metrics_report_out_file_path: Path = None,
+            group_stats_out_file_path: Path = None,
+            group_by: str = None,
+            report_cache: ReportCache = None,
+            report_format: str = 'csv'
     ) -> Optional[List[Tuple[OrderedDict, OrderedDict]]]:
         """create period and metric reports from multiple tickers and an average of the group
         :param tickers: list of tickers
@@ -710,25 +1286,26 @@ class Picker:
         :param unfiltered_metrics_report_out_file_path: output file for unfiltered metrics report
         :param filtered_period_report_out_file_path: output file for filtered period reports
         :param filtered_metrics_report_out_file_path: output file for filtered metrics report
+        :param group_stats_out_file_path: output file for the group statistics of the outlier filter
+        :param group_by: compare each report to its `sector` or `industry` in the outlier filter, see `screen_reports`
+        :param report_cache: reuse cached reports of tickers whose data have not changed
+        :param report_format: format of the output files, e.g. `csv` or `npy`, see `stock_picker.report_writer`
         :return:
         """
-        p_and_m_reps = [self.generate_period_and_metrics_report(tkr) for tkr in tickers]
+        p_and_m_reps = self.generate_period_and_metrics_reports(tickers, report_cache)
         if unfiltered_period_report_out_file_path:
             period_reports = [rep[0] for rep in p_and_m_reps]
             fields_name = list(period_reports[0].keys())
-            self.write_reports_to_csv(unfiltered_period_report_out_file_path, fields_name, period_reports)
+            self.write_reports(unfiltered_period_report_out_file_path, fields_name, period_reports, report_format)
         if unfiltered_metrics_report_out_file_path:
             metrics_reports = [rep[1] for rep in p_and_m_reps]
             fields_name = list(metrics_reports[0].keys())
-            self.write_reports_to_csv(unfiltered_metrics_report_out_file_path, fields_name, metrics_reports)
+            self.write_reports(unfiltered_metrics_report_out_file_path, fields_name, metrics_reports, report_format)
 
         if auto_filter:
-            p_and_m_reps = [rep for rep in p_and_m_reps if self.default_filter(rep[0], rep[1])]
-            if p_and_m_reps:
-                filtered_group_avg = self.create_group_average_report([rep[1] for rep in p_and_m_reps])
-                filtered_group_std = self.create_group_std_report([rep[1] for rep in p_and_m_reps])
-                p_and_m_reps = [(rep[0], self.add_warnings_to_metrics_rep(rep[0], rep[1])) for rep in p_and_m_reps if
-                                self.outlier_filter(rep[1], filtered_group_avg, filtered_group_std)]
+            p_and_m_reps = self.screen_reports(
+                p_and_m_reps, group_by, group_stats_out_file_path=group_stats_out_file_path,
+                report_format=report_format)
         if not p_and_m_reps:
             LOG.info('No report remained after filtering')
             return None
@@ -736,9 +1313,9 @@ class Picker:
         if filtered_period_report_out_file_path:
             period_reports = [rep[0] for rep in p_and_m_reps]
             fields_name = list(period_reports[0].keys())
-            self.write_reports_to_csv(filtered_period_report_out_file_path, fields_name, period_reports)
+            self.write_reports(filtered_period_report_out_file_path, fields_name, period_reports, report_format)
         if filtered_metrics_report_out_file_path:
             metrics_reports = [rep[1] for rep in p_and_m_reps]
             fields_name = list(metrics_reports[0].keys())
-            self.write_reports_to_csv(filtered_metrics_report_out_file_path, fields_name, metrics_reports)
+            self.write_reports(filtered_metrics_report_out_file_path, fields_name, metrics_reports, report_format)
         return p_and_m_reps
@@ -1,20 +1,203 @@
+import argparse
+import functools
 import logging
+import multiprocessing
+import queue
+from pathlib import Path
+from typing import Iterable, Optional
 
 from stock_picker.picker import Picker
+from stock_picker.report_cache import ReportCache
+from stock_picker.report_writer import REPORT_WRITERS, get_report_writer
+from stock_picker.stock_db import StockDatabase
 from stock_picker.utils.generic_utils import ROOT_PATH, logging_config
 
+LOG = logging.getLogger('PickerRunner')
+
 stocks_data_folder = ROOT_PATH / 'data' / 'stocks_data'
+stocks_db_path = ROOT_PATH / 'data' / 'stocks_data.db'
 report_folder = ROOT_PATH / 'data' / 'reports'
+snapshot_path = ROOT_PATH / 'data' / 'stocks_data.panel'
+# snapshot of the stocks loaded from the database, kept apart from the snapshot of the stocks data folder
+db_snapshot_path = ROOT_PATH / 'data' / 'stocks_data.db.panel'
+index_path = ROOT_PATH / 'data' / 'stocks_data.index.json'
+report_cache_folder = ROOT_PATH / 'data' / 'reports_cache'
+
+# picker of the worker processes, inherited when forked or mapped from the snapshot once per worker
+_worker_picker: Optional[Picker] = None
+
+
+def load_worker_picker(picker_snapshot_path: Path):
+    global _worker_picker
+    # statements are mapped from the snapshot, so memory stays flat as workers are added
+    _worker_picker = Picker.from_snapshot(picker_snapshot_path, mmap=True)
+
+
+def set_worker_picker(picker: Picker):
+    global _worker_picker
+    _worker_picker = picker
+
+
+def _put_completed(completed: queue.Queue, group_by: str, group: str, result):
+    """callback of the pool putting the number of reports or the error of a group once it completes"""
+    completed.put((group_by, group, result))
+
+
+def create_group_reports(
+        group_by: str,
+        group: str,
+        output_folder: Path,
+        cache_folder: Optional[Path],
+        report_format: str = 'csv',
+        outlier_group_by: Optional[str] = None
+) -> int:
+    """create the unfiltered and filtered reports, and the outlier statistics, of a sector or industry with the worker
+    picker
+
+    :param group_by: `sector` or `industry`
+    :param group: sector or industry name
+    :param output_folder: folder of the reports
+    :param cache_folder: folder of the report cache of each group
+    :param report_format: format of the reports
+    :param outlier_group_by: compare each stock to its `sector` or `industry` in the outlier filter instead of the
+        whole group
+    :return: number of reports remaining after filtering
+    """
+    picker = _worker_picker
+    tickers = picker.get_sector_tickers(group) if group_by == 'sector' else picker.get_industry_tickers(group)
+    prefix = f'{group_by}_{group}'
+    extension = get_report_writer(report_format).extension
+    reports = picker.create_reports_from_multiple_tickers(
+        tickers,
+        unfiltered_period_report_out_file_path=output_folder / f'{prefix}_period_unfiltered{extension}',
+        unfiltered_metrics_report_out_file_path=output_folder / f'{prefix}_metrics_unfiltered{extension}',
+        filtered_metrics_report_out_file_path=output_folder / f'{prefix}_metrics_filtered{extension}',
+        group_stats_out_file_path=output_folder / f'{prefix}_metrics_group_stats{extension}',
+        group_by=outlier_group_by,
+        report_cache=ReportCache(cache_folder / f'{prefix}.json') if cache_folder else None,
+        report_format=report_format
+    )
+    return len(reports) if reports else 0
+
+
+def create_all_groups_reports(
+        picker: Picker,
+        output_folder: Path,
+        sectors: Iterable[str] = None,
+        industries: Iterable[str] = (),
+        workers: int = None,
+        cache_folder: Path = None,
+        picker_snapshot_path: Path = None,
+        report_format: str = 'csv',
+        outlier_group_by: str = None,
+        group_timeout: float = 3600
+):
+    """create reports of every sector, and industries, with a process pool, reports are written as each group finishes
+
+    Workers share the picker by forking. Where fork is not available, each worker maps the picker snapshot once,
+    or receives a lazy picker, which only holds the stocks index.
+    :param picker: picker with loaded stocks
+    :param output_folder: folder of the reports
+    :param sectors: sectors to report, all sectors if not specified
+    :param industries: industries to report
+    :param workers: number of worker processes, number of CPUs if not specified
+    :param cache_folder: folder of the report cache of each group
+    :param picker_snapshot_path: snapshot of the picker, required if fork is not available and the picker is not lazy
+    :param report_format: format of the reports, e.g. `csv` or `npy`
+    :param outlier_group_by: compare each stock to its `sector` or `industry` in the outlier filter instead of the
+        whole reported group
+    :param group_timeout: seconds to wait for the next group to complete, after which the remaining groups are lost,
+        as the pool silently drops the group of a worker that dies
+    :return:
+    """
+    global _worker_picker
+    output_folder.mkdir(parents=True, exist_ok=True)
+    groups = [('sector', sector) for sector in (picker.sectors if sectors is None else sectors)] + \
+        [('industry', industry) for industry in industries]
+    # multiprocessing pool rather than ProcessPoolExecutor, whose mp_context and initializer need python 3.7
+    context, initializer, initargs = multiprocessing.get_context(), None, ()
+    if 'fork' in multiprocessing.get_all_start_methods():
+        _worker_picker = picker
+        context = multiprocessing.get_context('fork')
+    elif picker.lazy:
+        initializer, initargs = set_worker_picker, (picker,)
+    else:
+        if not picker_snapshot_path:
+            raise ValueError('a picker snapshot is required to share the picker without fork')
+        initializer, initargs = load_worker_picker, (picker_snapshot_path,)
+    succeed = 0
+    # groups are logged as they complete, so a slow group does not hold back the progress of the others
+    completed = queue.Queue()
+    with context.Pool(processes=workers, initializer=initializer, initargs=initargs) as pool:
+        for group_by, group in groups:
+            pool.apply_async(
+                create_group_reports, (group_by, group, output_folder, cache_folder, report_format, outlier_group_by),
+                callback=functools.partial(_put_completed, completed, group_by, group),
+                error_callback=functools.partial(_put_completed, completed, group_by, group)
+            )
+        pending_groups = set(groups)
+        while pending_groups:
+            try:
+                group_by, group, result = completed.get(timeout=group_timeout)
+            except queue.Empty:
+                for group_by, group in groups:
+                    if (group_by, group) in pending_groups:
+                        LOG.error(f'fail to create reports of {group_by} {group}: no group completed within '
+                                  f'{group_timeout}s, its worker may have died')
+                # leaving the pool terminates the workers of the lost groups
+                break
+            pending_groups.discard((group_by, group))
+            if isinstance(result, Exception):
+                LOG.error(f'fail to create reports of {group_by} {group}: {result}', exc_info=result)
+                continue
+            LOG.info(f'created reports of {group_by} {group}: {result} reports after filtering')
+            succeed += 1
+    LOG.info(f'created reports of {succeed}/{len(groups)} groups')
+
+
+def generate_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='Create sector and industry reports from scrapped stocks data')
+    parser.add_argument('-s', '--sectors', nargs='*', help='sectors to report (default: all sectors)')
+    parser.add_argument('-i', '--industries', action='store_true', help='also report every industry')
+    parser.add_argument('-f', '--format', default='csv', choices=list(REPORT_WRITERS), help='format of the reports')
+    parser.add_argument('-d', '--database', action='store_true',
+                        help='load the stocks of the reported sectors from the stock database instead of the files')
+    parser.add_argument('-l', '--lazy', action='store_true',
+                        help='index the stocks data files and load each stock when it is reported')
+    parser.add_argument('-o', '--outlier-by', choices=['sector', 'industry'],
+                        help='compare each stock to its sector or industry in the outlier filter '
+                             '(default: the whole reported group)')
+    parser.add_argument('-w', '--workers', type=int, help='number of worker processes (default: number of CPUs)')
+    parser.add_argument('-t', '--group-timeout', type=float, default=3600,
+                        help='seconds to wait for the next group to complete before giving up on the remaining '
+                             'groups (default: 3600)')
+    return parser
+
 
-logging_config(level=logging.DEBUG, filename=str(ROOT_PATH / '.logs' / 'pick.log'), filemode='w')
-picker = Picker()
-picker.discover_stocks_data_from_folder(stocks_data_folder)
-
-sector = 'oils_energy'
-sector_tickers = picker.get_sector_tickers(sector)
-picker.create_reports_from_multiple_tickers(
-    sector_tickers,
-    unfiltered_period_report_out_file_path=report_folder / f'{sector}_period_unfiltered.csv',
-    unfiltered_metrics_report_out_file_path=report_folder / f'{sector}_metrics_unfiltered.csv',
-    filtered_metrics_report_out_file_path=report_folder / f'{sector}_metrics_filtered.csv'
-)
+if __name__ == '__main__':
+    args = generate_parser().parse_args()
+    logging_config(level=logging.DEBUG, filename=str(ROOT_PATH / '.logs' / 'pick.log'), filemode='w')
+    main_picker = Picker()
+    picker_snapshot_path = db_snapshot_path if args.database else snapshot_path
+    if args.database:
+        with StockDatabase(stocks_db_path) as stocks_db:
+            main_picker.discover_stocks_data_from_database(stocks_db, sectors=args.sectors)
+        # workers without fork load the picker from the snapshot
+        main_picker.save_snapshot(picker_snapshot_path)
+    elif args.lazy:
+        main_picker.index_stocks_data_from_folder(stocks_data_folder, index_path=index_path, use_processes=True)
+    else:
+        main_picker.discover_stocks_data_from_folder(
+            stocks_data_folder, use_processes=True, snapshot_path=picker_snapshot_path)
+    create_all_groups_reports(
+        main_picker,
+        report_folder,
+        sectors=args.sectors,
+        industries=main_picker.industries if args.industries else (),
+        workers=args.workers,
+        cache_folder=report_cache_folder,
+        picker_snapshot_path=picker_snapshot_path,
+        report_format=args.format,
+        outlier_group_by=args.outlier_by,
+        group_timeout=args.group_timeout
+    )
@@ -0,0 +1,53 @@
+import json
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple
+
+LOG = logging.getLogger('ReportCache')
+
+
+class ReportCache:
+    """Persistent cache of the period and metrics reports of tickers
+
+    Each ticker keeps its latest reports with the key they were generated for, a digest of the ticker data and of the
+    report schema, so a report is only regenerated when either changes.
+    """
+    def __init__(self, cache_path: Path):
+        self.cache_path = cache_path
+        self._entries = {}
+        self._modified = False
+        if cache_path.exists():
+            try:
+                with cache_path.open() as f:
+                    self._entries = json.load(f, object_pairs_hook=OrderedDict)
+            except Exception as e:
+                LOG.exception(f'fail to read report cache {cache_path}: {e}')
+        LOG.debug(f'loaded {len(self._entries)} cached reports from {cache_path}')
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, ticker: str, key: str) -> Optional[Tuple[OrderedDict, OrderedDict]]:
+        """(period report, metrics report) of ticker if cached with key, else None"""
+        entry = self._entries.get(ticker)
+        if not entry or entry['key'] != key:
+            return None
+        return OrderedDict(entry['period_report']), OrderedDict(entry['metrics_report'])
+
+    def put(self, ticker: str, key: str, reports: Tuple[OrderedDict, OrderedDict]):
+        self._entries[ticker] = {
+            'key': key, 'period_report': OrderedDict(reports[0]), 'metrics_report': OrderedDict(reports[1])
+        }
+        self._modified = True
+
+    def save(self):
+        if not self._modified:
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.cache_path.parent / f'{self.cache_path.name}.tmp'
+        with temp_path.open('w') as f:
+            json.dump(self._entries, f)
+        temp_path.replace(self.cache_path)
+        self._modified = False
+        LOG.debug(f'saved {len(self._entries)} cached reports to {self.cache_path}')
@@ -0,0 +1,169 @@
+import csv
+import json
+import logging
+import shutil
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from stock_picker.screening import reports_to_columns
+
+try:
+    import pyarrow
+    import pyarrow.feather
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+LOG = logging.getLogger('ReportWriter')
+
+REPORT_WRITERS = {}
+
+
+def register_report_writer(cls):
+    REPORT_WRITERS[cls.format] = cls
+    return cls
+
+
+def get_report_writer(fmt: str) -> 'ReportWriter':
+    """report writer of format, e.g. `csv`, `npy`, and `arrow` or `parquet` if pyarrow is installed"""
+    if fmt not in REPORT_WRITERS:
+        raise ValueError(f'unknown report format `{fmt}`, expected one of {list(REPORT_WRITERS)}')
+    return REPORT_WRITERS[fmt]()
+
+
+def report_columns(fields: List[str], reports: List[Optional[Dict]]) -> OrderedDict:
+    """table of columns of fields of reports, float64 with NaN for numbers and unicode strings for the others
+
+    Values that are not strings, e.g. list of warnings, are json encoded and None of a string column becomes ''
+    """
+    columns = reports_to_columns([OrderedDict((field, rep.get(field)) for field in fields) for rep in reports if rep])
+    for field, values in columns.items():
+        if values.dtype == object:
+            columns[field] = np.array(
+                ['' if val is None else val if isinstance(val, str) else json.dumps(val) for val in values], dtype=str)
+    return columns
+
+
+class ReportWriter:
+    """Write a list of reports to a file and read it back as a table of columns"""
+    format = None
+    extension = None
+
+    def write(self, output_file_path: Path, fields: List[str], reports: List[Optional[Dict]]):
+        raise NotImplementedError
+
+    def read(self, file_path: Path) -> OrderedDict:
+        raise NotImplementedError
+
+
+@register_report_writer
+class CsvReportWriter(ReportWriter):
+    format = 'csv'
+    extension = '.csv'
+
+    def write(self, output_file_path: Path, fields: List[str], reports: List[Optional[Dict]]):
+        with output_file_path.open('w') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            for rep in reports:
+                if rep:
+                    writer.writerow(rep)
+
+    def read(self, file_path: Path) -> OrderedDict:
+        """columns of the csv, all values are strings"""
+        with file_path.open() as f:
+            rows = list(csv.DictReader(f))
+        fields = list(rows[0].keys()) if rows else []
+        return OrderedDict((field, np.array([row[field] for row in rows], dtype=str)) for field in fields)
+
+
+@register_report_writer
+class NpyReportWriter(ReportWriter):
+    """A folder with a `.npy` file per column and `columns.json` listing the fields in order
+
+    Each column can be memory-mapped by readers with `np.load(..., mmap_mode='r')`. The folder is written aside and
+    swapped into place, so a report is never read half written nor keeps the columns of a previous report.
+    """
+    format = 'npy'
+    extension = '.npy.d'
+    columns_file_name = 'columns.json'
+
+    def write(self, output_file_path: Path, fields: List[str], reports: List[Optional[Dict]]):
+        temp_path = output_file_path.with_name(f'{output_file_path.name}.tmp')
+        old_path = output_file_path.with_name(f'{output_file_path.name}.old')
+        # left by a write that crashed
+        for path in (temp_path, old_path):
+            if path.exists():
+                shutil.rmtree(path)
+        temp_path.mkdir(parents=True)
+        columns = report_columns(fields, reports)
+        file_names = OrderedDict()
+        for i, (field, values) in enumerate(columns.items()):
+            file_names[field] = f'{i:04d}.npy'
+            np.save(temp_path / file_names[field], values, allow_pickle=False)
+        with (temp_path / self.columns_file_name).open('w') as f:
+            json.dump({'n_rows': len(next(iter(columns.values()))) if columns else 0, 'columns': file_names}, f)
+        # a folder cannot replace a non empty folder, the previous report is moved aside first
+        if output_file_path.exists():
+            output_file_path.replace(old_path)
+        temp_path.replace(output_file_path)
+        if old_path.exists():
+            shutil.rmtree(old_path)
+
+    def read(self, file_path: Path, mmap: bool = True) -> OrderedDict:
+        with (file_path / self.columns_file_name).open() as f:
+            columns = json.load(f, object_pairs_hook=OrderedDict)['columns']
+        return OrderedDict((field, np.load(file_path / file_name, mmap_mode='r' if mmap else None, allow_pickle=False))
+                           for field, file_name in columns.items())
+
+
+class ArrowReportWriter(ReportWriter):
+    """Report tables with pyarrow, only available if pyarrow is installed"""
+    def __init__(self):
+        if pyarrow is None:
+            raise ImportError(f'pyarrow is required to write `{self.format}` reports')
+
+    def write(self, output_file_path: Path, fields: List[str], reports: List[Optional[Dict]]):
+        columns = report_columns(fields, reports)
+        self.write_table(output_file_path, pyarrow.table({field: values for field, values in columns.items()}))
+
+    def read(self, file_path: Path) -> OrderedDict:
+        table = self.read_table(file_path)
+        return OrderedDict((field, table.column(field).to_numpy()) for field in table.column_names)
+
+    def write_table(self, output_file_path: Path, table):
+        raise NotImplementedError
+
+    def read_table(self, file_path: Path):
+        raise NotImplementedError
+
+
+class ArrowIpcReportWriter(ArrowReportWriter):
+    """Uncompressed Arrow IPC file that can be memory-mapped"""
+    format = 'arrow'
+    extension = '.arrow'
+
+    def write_table(self, output_file_path: Path, table):
+        pyarrow.feather.write_feather(table, str(output_file_path), compression='uncompressed')
+
+    def read_table(self, file_path: Path):
+        return pyarrow.feather.read_table(str(file_path), memory_map=True)
+
+
+class ParquetReportWriter(ArrowReportWriter):
+    format = 'parquet'
+    extension = '.parquet'
+
+    def write_table(self, output_file_path: Path, table):
+        pyarrow.parquet.write_table(table, str(output_file_path))
+
+    def read_table(self, file_path: Path):
+        return pyarrow.parquet.read_table(str(file_path), memory_map=True)
+
+
+if pyarrow is not None:
+    register_report_writer(ArrowIpcReportWriter)
+    register_report_writer(ParquetReportWriter)
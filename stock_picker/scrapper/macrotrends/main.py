@@ -1,10 +1,20 @@
+import argparse
 import json
 import logging
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
 
+from stock_picker.fundamentals_history import FundamentalsHistory
 from stock_picker.scrapper.macrotrends.scrapper import Scrapper
+from stock_picker.scrapper.response_cache import ResponseCache
+from stock_picker.scrapper.scrape_journal import ScrapeJournal
+from stock_picker.stock_db import StockDatabase
+from stock_picker.utils.file_utils import iter_json_gz_items, iter_json_items
 from stock_picker.utils.generic_utils import ROOT_PATH, logging_config
 
 LOG = logging.getLogger('ScrapRunner')
+# scrapped stocks inserted into the stock database per transaction
+DB_BATCH_SIZE = 100
 
 
 def set_up_logging():
@@ -15,58 +25,112 @@ def set_up_logging():
     logging.getLogger('scrapper.macrotrends').addHandler(console)
 
 
+def insert_scrapped_batch(stocks_db: StockDatabase, journal: ScrapeJournal, batch: List[Tuple[str, Dict]]):
+    """insert scrapped stocks in one transaction, then record them done"""
+    stocks_db.bulk_insert(batch)
+    for ticker, _ in batch:
+        journal.record(ticker, ScrapeJournal.DONE)
+    batch.clear()
 
-set_up_logging()
-data_folder = ROOT_PATH / 'data'
-scrapper = Scrapper()
-
-# # create meta file
-# industry_listings = scrapper.scrap_industry_listing_urls()
-# LOG.info(f'scrapped {len(industry_listings)} industry listings')
-# stocks_data = {}
-# failed_industries = {}
-# for industry in industry_listings:
-#     try:
-#         stocks_data.update(scrapper.scrap_stocks_data_from_industry_listing(industry_listings[industry]))
-#     except Exception as e:
-#         LOG.error(f'fail to scrap industry {industry} listing: {e}')
-#         failed_industries[industry] = str(e)
-#         continue
-#     LOG.info(f'scrapped industry {industry}')
-#
-# with (data_folder / 'meta.json').open('w') as f:
-#     json.dump({'industries': scrapper.scrap_industry_listing_urls(), 'stocks': stocks_data}, f)
-#
-# if failed_industries:
-#     with (data_folder / 'failed_industries.json').open('w') as f:
-#         json.dump(failed_industries, f)
-
-with (data_folder / 'meta.json').open() as f:
-    meta_data = json.load(f)
-stocks_data = meta_data['stocks']
-
-stocks_data_folder = (data_folder / 'stocks_data')
-stocks_data_folder.mkdir(parents=True, exist_ok=True)
-count_success = 0
-
-# TODO: Rerun failed ticker
-failed_tickers = {}
-stocks_ticker = list(stocks_data.keys())
-stocks_url = [stocks_data[ticker]['url'] for ticker in stocks_ticker]
-scrapped_stocks_data = scrapper.scrap_multiple_stocks(stocks_url)
-for idx, ticker in enumerate(stocks_ticker):
-    stock_datum = stocks_data[ticker]
-    scrapped_stock_datum = scrapped_stocks_data[idx]
-    if isinstance(scrapped_stock_datum, Exception):
-        LOG.error(f'fail to scrap {ticker}: {scrapped_stock_datum}')
-        failed_tickers[ticker] = str(scrapped_stock_datum)
-    else:
-        stock_datum.update(scrapped_stock_datum)
-        count_success += 1
-        with (stocks_data_folder / f'{ticker}.json').open('w') as f:
-            json.dump(stock_datum, f)
-
-if failed_tickers:
-    with (data_folder / 'failed_tickers.json').open('w') as f:
-        json.dump(failed_tickers, f)
-LOG.info(f'successfully scrapped {count_success}/{len(stocks_ticker)}')
+
+def iter_meta_stocks(meta_file_path: Path) -> Iterator[Tuple[str, Dict]]:
+    """(ticker, meta data) of the stocks of a meta data file, json or gzip json, decoded one stock at a time"""
+    if meta_file_path.name.endswith('.json.gz'):
+        yield from iter_json_gz_items(meta_file_path, ('stocks',))
+        return
+    with meta_file_path.open() as f:
+        yield from iter_json_items(f, ('stocks',))
+
+
+def iter_pending_urls(
+        meta_file_path: Path, journal: ScrapeJournal, pending_stocks: Dict[str, Tuple[str, Dict]]) -> Iterator[str]:
+    """urls of the stocks of a meta data file that are pending in the journal, streamed from the file
+
+    The ticker and meta data of each url are kept in `pending_stocks` until its stock is scrapped, so only the stocks
+    being scrapped are held in memory.
+    """
+    for ticker, stock_meta in iter_meta_stocks(meta_file_path):
+        if journal.pending([ticker]):
+            pending_stocks[stock_meta['url']] = (ticker, stock_meta)
+            yield stock_meta['url']
+
+
+def generate_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='Scrap the stocks data of macrotrends')
+    parser.add_argument('-d', '--database', action='store_true',
+                        help='store stocks data in the stock database instead of a json file per stock')
+    parser.add_argument('-m', '--meta-file', default='meta.json',
+                        help='meta data file in the data folder, gzipped if it ends with .json.gz (default: meta.json)')
+    return parser
+
+
+# parsing processes are spawned and import this module, so the scrape only runs as a script
+if __name__ == '__main__':
+    args = generate_parser().parse_args()
+    set_up_logging()
+    data_folder = ROOT_PATH / 'data'
+    # reruns reuse the pages fetched within a day
+    scrapper = Scrapper(response_cache=ResponseCache(data_folder / 'http_cache'))
+
+    stocks_db = StockDatabase(data_folder / 'stocks_data.db') if args.database else None
+    try:
+        meta_file_path = data_folder / args.meta_file
+        if not meta_file_path.exists():
+            _, failed_industries = scrapper.scrap_all_industry_listings(meta_file_path=meta_file_path)
+            if failed_industries:
+                with (data_folder / 'failed_industries.json').open('w') as f:
+                    json.dump(failed_industries, f)
+
+        stocks_data_folder = (data_folder / 'stocks_data')
+        stocks_data_folder.mkdir(parents=True, exist_ok=True)
+        # keeps restated figures and market caps that each scrape overwrites
+        history = FundamentalsHistory(data_folder / 'fundamentals_history')
+
+        # tickers done earlier in a killed run are skipped, failed tickers are retried until they run out of attempts
+        with ScrapeJournal(data_folder / 'scrape_journal.jsonl', max_attempts=3) as journal:
+            while True:
+                # the stocks are streamed from the meta data file in each pass, its industries and other meta data
+                # are skipped
+                pending_stocks = {}
+                pending_urls = iter_pending_urls(meta_file_path, journal, pending_stocks)
+                scrapped_batch = []
+                n_scrapped = 0
+                for url, scrapped_stock_datum in scrapper.iter_scrap_multiple_stocks(pending_urls):
+                    ticker, stock_meta = pending_stocks.pop(url)
+                    n_scrapped += 1
+                    if isinstance(scrapped_stock_datum, Exception):
+                        LOG.error(f'fail to scrap {ticker}: {scrapped_stock_datum}')
+                        journal.record(ticker, ScrapeJournal.FAILED, str(scrapped_stock_datum))
+                        continue
+                    # written as it arrives and not kept in meta data
+                    stock_datum = {**stock_meta, **scrapped_stock_datum}
+                    history.record(ticker, stock_datum)
+                    if stocks_db is not None:
+                        scrapped_batch.append((ticker, stock_datum))
+                        if len(scrapped_batch) >= DB_BATCH_SIZE:
+                            insert_scrapped_batch(stocks_db, journal, scrapped_batch)
+                        continue
+                    temp_file = stocks_data_folder / f'{ticker}.json.tmp'
+                    with temp_file.open('w') as f:
+                        json.dump(stock_datum, f)
+                    temp_file.replace(stocks_data_folder / f'{ticker}.json')
+                    journal.record(ticker, ScrapeJournal.DONE)
+                if scrapped_batch:
+                    insert_scrapped_batch(stocks_db, journal, scrapped_batch)
+                if not n_scrapped:
+                    break
+                LOG.info(f'scrapped {n_scrapped} pending tickers')
+            failed_tickers = journal.failed()
+            count_success = len(journal.done())
+            # the run is complete, the next run scrapes all tickers again
+            journal.archive()
+
+        if failed_tickers:
+            with (data_folder / 'failed_tickers.json').open('w') as f:
+                json.dump(failed_tickers, f)
+        LOG.info(f'successfully scrapped {count_success} stocks, {len(failed_tickers)} failed')
+    finally:
+        # the session and the parsing processes are released when a run fails midway too
+        scrapper.close()
+        if stocks_db is not None:
+            stocks_db.close()
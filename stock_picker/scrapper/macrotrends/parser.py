@@ -1,12 +1,18 @@
+import html
 import json
 import logging
 import re
-from typing import Dict
+from typing import Dict, Optional, Union
 
 from bs4 import BeautifulSoup
 
 LOG = logging.getLogger('scrapper.macrotrends.Parser')
 
+JSON_DECODER = json.JSONDecoder()
+# text wrapped in opening and closing tags, e.g. `<a href='/revenue'>Revenue</a>`
+TAGGED_TEXT_PATTERN = re.compile(r'^(?:<[^<>/!][^<>]*(?<!/)>)*([^<>]*)(?:</[^<>]+>)*$')
+HREF_PATTERN = re.compile(r'<a\s[^<>]*?href\s*=\s*(["\'])(.*?)\1')
+
 
 class ParserError(Exception):
     def __init__(self, error, parsing_content):
@@ -17,10 +23,25 @@ class ParserError(Exception):
     def __str__(self):
         return f'MacrotrendsParserError: {self.message}'
 
+    def __reduce__(self):
+        # sent back from parsing processes without the parsing content and without logging again
+        return _restore_parser_error, (self.message,)
+
+
+def _restore_parser_error(message: str) -> ParserError:
+    error = ParserError.__new__(ParserError)
+    error.message = message
+    return error
+
 
 class Parser:
-    def __init__(self, main_page_url: str = 'https://www.macrotrends.net'):
+    def __init__(self, main_page_url: str = 'https://www.macrotrends.net', fast: bool = True):
+        """
+        :param main_page_url: macrotrends main page url
+        :param fast: extract the data embedded in pages by scanning the content, soupify only if it fails
+        """
         self.main_page_url = main_page_url
+        self.fast = fast
 
     @staticmethod
     def _soupify(content, parser):
@@ -39,6 +60,39 @@ class Parser:
             raise ParserError(f'regex found no match with pattern {pattern}', string)
         return string[re_match.start():re_match.end()]
 
+    @staticmethod
+    def _fast_json_after(content: Union[str, bytes], marker: str):
+        """decode the json value following marker in content, None if not found or not valid"""
+        if isinstance(content, bytes):
+            try:
+                content = content.decode('utf-8')
+            except UnicodeDecodeError:
+                return None
+        start = content.find(marker)
+        if start < 0:
+            return None
+        start += len(marker)
+        while start < len(content) and content[start] in ' \t':
+            start += 1
+        try:
+            return JSON_DECODER.raw_decode(content, start)[0]
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _fast_tagged_text(tagged_text) -> Optional[str]:
+        """text wrapped in tags without soupifying, None if it is not a plain tagged text"""
+        re_match = TAGGED_TEXT_PATTERN.match(tagged_text) if isinstance(tagged_text, str) else None
+        return html.unescape(re_match.group(1)) if re_match and re_match.group(1) else None
+
+    def _tagged_text(self, tagged_text) -> str:
+        text = self._fast_tagged_text(tagged_text) if self.fast else None
+        return text if text is not None else self._soupify(tagged_text, 'html.parser').string
+
+    def _link_href(self, link) -> str:
+        re_match = HREF_PATTERN.search(link) if self.fast and isinstance(link, str) else None
+        return html.unescape(re_match.group(2)) if re_match else self._soupify(link, 'html.parser').a['href']
+
     @staticmethod
     def beautify_field(field_name: str):
         return re.sub('[^A-Za-z0-9]+', '_', field_name.lower())
@@ -78,15 +132,11 @@ class Parser:
         :param industry_listing_page_content: content of the industry listing page
         :return:
         """
-        soup = self._soupify(industry_listing_page_content, 'html.parser')
-        data_script = soup.find('script', string=re.compile('var data'))
-        if not data_script:
-            raise ParserError('no script containing `var data`', soup)
-        stocks_data_table_string = self._regex_search_must_exist(r'(?<=var data = )(.*)', data_script.string)
-        try:
-            parsed_stocks_data_table = json.loads(stocks_data_table_string)
-        except Exception as e:
-            raise ParserError(f'fail to JSON parse stocks data table: {e}', stocks_data_table_string)
+        parsed_stocks_data_table = None
+        if self.fast:
+            parsed_stocks_data_table = self._fast_json_after(industry_listing_page_content, 'var data = ')
+        if not isinstance(parsed_stocks_data_table, list):
+            parsed_stocks_data_table = self._soup_stocks_data_table(industry_listing_page_content)
         LOG.debug(f'parsed stocks data table')
         stocks_data = {}
         parse_succeed = 0
@@ -104,8 +154,8 @@ class Parser:
                     LOG.exception(f'failed to parse market_val field: {e}')
                     stock_datum['market_cap'] = None
                 try:
-                    stock_datum['backup_url'] = self._soupify(
-                        parsed_stock_datum['link'], 'html.parser').a['href'].replace('/stock-price-history', '')
+                    stock_datum['backup_url'] = self._link_href(
+                        parsed_stock_datum['link']).replace('/stock-price-history', '')
                 except Exception as e:
                     LOG.exception(f'failed to parse backup url: {e}')
                     stock_datum['backup_url'] = None
@@ -117,28 +167,46 @@ class Parser:
         LOG.info(f'successfully parsed {parse_succeed}/{len(stocks_data)} stocks data in this industry listing')
         return stocks_data
 
-    def parse_stock_financial_aspect_page(self, financial_aspect_page_content: str):
-        """parse financial aspect data from page
+    def _soup_stocks_data_table(self, industry_listing_page_content: str):
+        soup = self._soupify(industry_listing_page_content, 'html.parser')
+        data_script = soup.find('script', string=re.compile('var data'))
+        if not data_script:
+            raise ParserError('no script containing `var data`', soup)
+        stocks_data_table_string = self._regex_search_must_exist(r'(?<=var data = )(.*)', data_script.string)
+        try:
+            return json.loads(stocks_data_table_string)
+        except Exception as e:
+            raise ParserError(f'fail to JSON parse stocks data table: {e}', stocks_data_table_string)
 
-        :param financial_aspect_page_content:
-        :return:
-        """
+    def _soup_original_data(self, financial_aspect_page_content: str):
         soup = self._soupify(financial_aspect_page_content, 'html.parser')
         data_script = soup.find('script', string=re.compile('var originalData'))
         if not data_script:
             raise ParserError('no script containing `var originalData` in the page content', soup)
         raw_data_string = self._regex_search_must_exist(r'(?<=originalData = )(.*)', data_script.string)
         try:
-            raw_data = json.loads(raw_data_string.strip()[:-1])  # strip space and remove last semi colon
+            return json.loads(raw_data_string.strip()[:-1])  # strip space and remove last semi colon
         except Exception as e:
             raise ParserError(f'failed to JSON parse stock data: {e}', {raw_data_string})
+
+    def parse_stock_financial_aspect_page(self, financial_aspect_page_content: str):
+        """parse financial aspect data from page
+
+        :param financial_aspect_page_content:
+        :return:
+        """
+        raw_data = None
+        if self.fast:
+            raw_data = self._fast_json_after(financial_aspect_page_content, 'var originalData = ')
+        if not (isinstance(raw_data, list) and raw_data and all(isinstance(row, dict) for row in raw_data)):
+            raw_data = self._soup_original_data(financial_aspect_page_content)
         years = [key for key in raw_data[0].keys() if key not in ['field_name', 'popup_icon']]
         parsed_data = {
             'years': years
         }
         for raw_field_data in raw_data:
             try:
-                field_name = self.beautify_field(self._soupify(raw_field_data['field_name'], 'html.parser').string)
+                field_name = self.beautify_field(self._tagged_text(raw_field_data['field_name']))
             except Exception as e:
                 raise ParserError(f'table field name: {e}', raw_field_data)
             try:
@@ -171,7 +239,8 @@ class Parser:
                 try:
                     cell_data = float(cell_element.string)
                 except ValueError:
-                    cell_data = cell_element.string
+                    # plain string, a NavigableString pickles its whole tree when parsed in another process
+                    cell_data = str(cell_element.string)
                 price_data[price_table_headers[idx]].append(cell_data)
         price_data['years'] = price_data['year']
         price_data.pop('year', None)
@@ -193,7 +262,8 @@ class Parser:
         except Exception as e:
             raise ParserError(f'industry: {e}', profile_table_data_elements)
         try:
-            parsed_data['description'] = profile_table_element.find('td', attrs={'colspan': 4}).span.string
+            description = profile_table_element.find('td', attrs={'colspan': 4}).span.string
+            parsed_data['description'] = None if description is None else str(description)
         except Exception as e:
             raise ParserError(f'description: {e}', profile_table_element)
         LOG.debug(f'parsed price data')
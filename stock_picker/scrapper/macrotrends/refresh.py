@@ -0,0 +1,106 @@
+import argparse
+import json
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+from stock_picker.fundamentals_history import FundamentalsHistory
+from stock_picker.scrapper.macrotrends.main import iter_meta_stocks
+from stock_picker.scrapper.macrotrends.scrapper import Scrapper
+from stock_picker.scrapper.refresh_planner import RefreshPlanner, merge_stock_data, plan_summary
+from stock_picker.utils.generic_utils import ROOT_PATH, logging_config
+
+LOG = logging.getLogger('RefreshRunner')
+
+
+def refresh_planned_stocks(scrapper: Scrapper, planner: RefreshPlanner, plan: Dict[str, List[str]],
+                           planned_stocks: Iterable[Tuple[str, Dict]], history: FundamentalsHistory = None) -> dict:
+    """scrap the planned pages of stocks and merge them into their stock data files
+
+    :param scrapper: macrotrends scrapper
+    :param planner: refresh planner of the stock data files
+    :param plan: pages to refresh of each ticker, see `RefreshPlanner.plan`
+    :param planned_stocks: (ticker, meta data) of the planned stocks, consumed lazily so that only the stocks being
+        scrapped are held in memory
+    :param history: fundamentals history the refreshed stock data are recorded to, e.g. to keep restated figures
+    :return: failed tickers and their error
+    """
+    LOG.info(f'refreshing {len(plan)} stocks: {plan_summary(plan)}')
+    # stocks fed to the scrapper and not scrapped yet
+    pending_stocks, pages_by_url = {}, {}
+
+    def iter_urls():
+        for ticker, stock_meta in planned_stocks:
+            pending_stocks[stock_meta['url']] = (ticker, stock_meta)
+            pages_by_url[stock_meta['url']] = plan[ticker]
+            yield stock_meta['url']
+
+    failed_tickers = {}
+    for url, scrapped_stock_datum in scrapper.iter_scrap_multiple_stocks(iter_urls(), pages_by_url=pages_by_url):
+        ticker, stock_meta = pending_stocks.pop(url)
+        del pages_by_url[url]
+        if isinstance(scrapped_stock_datum, Exception):
+            LOG.error(f'fail to refresh {ticker}: {scrapped_stock_datum}')
+            failed_tickers[ticker] = str(scrapped_stock_datum)
+            continue
+        stock_file = planner.stocks_data_folder / f'{ticker}.json'
+        stock_datum = None
+        if stock_file.exists():
+            with stock_file.open() as f:
+                stock_datum = json.load(f)
+        # profile info such as market cap is kept up to date from the meta data
+        stock_datum = merge_stock_data({**(stock_datum or {}), **stock_meta}, scrapped_stock_datum, plan[ticker])
+        temp_file = stock_file.parent / f'{stock_file.name}.tmp'
+        with temp_file.open('w') as f:
+            json.dump(stock_datum, f)
+        temp_file.replace(stock_file)
+        if history is not None:
+            history.record(ticker, stock_datum)
+    LOG.info(f'refreshed {len(plan) - len(failed_tickers)}/{len(plan)} stocks')
+    return failed_tickers
+
+
+def refresh_stocks_data(scrapper: Scrapper, planner: RefreshPlanner, stocks_data: dict,
+                        history: FundamentalsHistory = None) -> dict:
+    """scrap the stale pages of stocks and merge them into their stock data files
+
+    :param scrapper: macrotrends scrapper
+    :param planner: refresh planner of the stock data files
+    :param stocks_data: stocks meta data by ticker, e.g. `stocks` of meta.json
+    :param history: fundamentals history the refreshed stock data are recorded to, e.g. to keep restated figures
+    :return: failed tickers and their error
+    """
+    plan = planner.plan(stocks_data)
+    return refresh_planned_stocks(scrapper, planner, plan, ((ticker, stocks_data[ticker]) for ticker in plan), history)
+
+
+def refresh_meta_file_stocks(scrapper: Scrapper, planner: RefreshPlanner, meta_file_path: Path,
+                             history: FundamentalsHistory = None) -> dict:
+    """scrap the stale pages of the stocks of a meta data file, streamed from the file, see `refresh_stocks_data`
+
+    The file is read twice, the tickers to plan the refresh, then the meta data of the planned stocks as they are
+    scrapped.
+    """
+    plan = planner.plan(ticker for ticker, _ in iter_meta_stocks(meta_file_path))
+    planned_stocks = ((ticker, stock_meta) for ticker, stock_meta in iter_meta_stocks(meta_file_path) if ticker in plan)
+    return refresh_planned_stocks(scrapper, planner, plan, planned_stocks, history)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Refresh the stale pages of scrapped stocks data')
+    parser.add_argument('-b', '--budget', type=int, help='max number of page requests')
+    parser.add_argument('-m', '--meta-file', default='meta.json',
+                        help='meta data file in the data folder, gzipped if it ends with .json.gz (default: meta.json)')
+    args = parser.parse_args()
+    logging_config(filename=str(ROOT_PATH / 'refresh.log'), filemode='w', level=logging.DEBUG)
+    data_folder = ROOT_PATH / 'data'
+    main_scrapper = Scrapper()
+    try:
+        failed = refresh_meta_file_stocks(
+            main_scrapper, RefreshPlanner(data_folder / 'stocks_data', request_budget=args.budget),
+            data_folder / args.meta_file, history=FundamentalsHistory(data_folder / 'fundamentals_history'))
+    finally:
+        main_scrapper.close()
+    if failed:
+        with (data_folder / 'failed_refresh_tickers.json').open('w') as failed_file:
+            json.dump(failed, failed_file)
@@ -1,15 +1,37 @@
 import asyncio
+import json
 import logging
-from typing import Dict, List, Tuple
+import multiprocessing
+import time
+from multiprocessing.pool import Pool
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
 
-import requests
-from aiohttp import ClientSession
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
 
-from .parser import Parser
+from stock_picker.scrapper.rate_limit import HostRateLimiter, RetryPolicy
+from stock_picker.scrapper.response_cache import CachedResponse, ResponseCache
+from stock_picker.utils.file_utils import write_json_gz_file
+from .parser import Parser, ParserError
 
 LOG = logging.getLogger('scrapper.macrotrends')
 
 
+def parse_context():
+    """start method of the parsing processes, which must not be forked from the threads of the scrapper process"""
+    return multiprocessing.get_context(
+        'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+
+def _resolve_future(future: asyncio.Future, result=None, error: BaseException = None):
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
 class BaseError(Exception):
     def __init__(self, message: str):
         LOG.exception(message)
@@ -25,99 +47,362 @@ class FetchError(BaseError):
 
 
 class Scrapper:
+    """Macrotrends scrapper
+
+    The scrapper owns one client session with a tuned connection pool for all its requests. Use it as an async context
+    manager, or as a context manager or plainly for the synchronous methods, which run in an event loop of the
+    scrapper that is started on first use. `close` releases the session, the event loop and the parsing processes.
+    """
     def __init__(
             self,
             main_page_url: str = 'https://www.macrotrends.net',
             research_page_postfix: str = '/stocks/research',
             financial_aspect_endpoints: Tuple[str] = ('income-statement', 'balance-sheet', 'cash-flow-statement'),
-            price_endpoint: str = 'stock-price-history'
+            price_endpoint: str = 'stock-price-history',
+            response_cache: ResponseCache = None,
+            parse_workers: Optional[int] = None,
+            parse_timeout: float = 60,
+            rate_limiter: HostRateLimiter = None,
+            retry_policy: RetryPolicy = None,
+            connection_limit: int = 100,
+            connection_limit_per_host: int = 50,
+            dns_cache_ttl: int = 300,
+            keepalive_timeout: float = 60,
+            timeout: ClientTimeout = ClientTimeout(total=120, connect=15, sock_read=60)
     ):
+        """
+        :param response_cache: cache of fetched pages, no caching if not specified
+        :param parse_workers: number of processes parsing stock pages, number of CPUs if not specified, 0 to parse in
+            the event loop
+        :param parse_timeout: seconds to wait for a page parsed in the parsing processes, whose task is lost if its
+            worker dies
+        :param rate_limiter: adaptive rate limiter of requests to each host, default limiter if not specified
+        :param retry_policy: retry of failed page requests, default policy if not specified
+        :param connection_limit: max number of open connections
+        :param connection_limit_per_host: max number of open connections to a host
+        :param dns_cache_ttl: seconds resolved hosts are cached
+        :param keepalive_timeout: seconds an idle connection is kept open for reuse
+        :param timeout: timeouts of a request
+        """
         self.main_page_url = main_page_url
         self.research_page_postfix = research_page_postfix
         self.financial_aspect_endpoints = financial_aspect_endpoints
         self.price_endpoint = price_endpoint
+        self.response_cache = response_cache
+        self.parse_workers = parse_workers
+        self.parse_timeout = parse_timeout
+        self._parse_pool = None
+        # tasks of dead parsing processes, which the pool waits for forever when closed
+        self._lost_parse_tasks = False
+        self.rate_limiter = rate_limiter or HostRateLimiter()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.connection_limit = connection_limit
+        self.connection_limit_per_host = connection_limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self._session = None
+        self._loop = None
         self.all_endpoints = financial_aspect_endpoints + (price_endpoint,)
         self.parser = Parser(main_page_url)
         self.beautified_financial_aspects = [self.parser.beautify_field(field) for field in financial_aspect_endpoints]
 
-    @staticmethod
-    def fetch(url):
+    async def __aenter__(self) -> 'Scrapper':
+        return await self.async_start()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.async_close()
+
+    def __enter__(self) -> 'Scrapper':
+        self._start_parse_pool()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    async def async_start(self) -> 'Scrapper':
+        """open the client session of the scrapper in the running event loop and start the parsing processes"""
+        self._start_parse_pool()
+        if self._session is None or self._session.closed:
+            connector = TCPConnector(
+                limit=self.connection_limit,
+                limit_per_host=self.connection_limit_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            self._session = ClientSession(connector=connector, timeout=self.timeout)
+        return self
+
+    async def async_close(self):
+        """close the client session and shut down the parsing processes"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        self._shutdown_parse_pool()
+
+    @property
+    def session(self) -> ClientSession:
+        if self._session is None:
+            raise RuntimeError('scrapper is not started, use it as a context manager')
+        return self._session
+
+    def _run(self, awaitable):
+        """run in the event loop of the synchronous methods, with the session started"""
+        if self._loop is None or self._loop.is_closed():
+            self._loop = asyncio.new_event_loop()
+        self._start_parse_pool()
+
+        async def run():
+            await self.async_start()
+            return await awaitable
+
+        return self._loop.run_until_complete(run())
+
+    def close(self):
+        """close the client session, the event loop of the synchronous methods and the parsing processes"""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.run_until_complete(self.async_close())
+            self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+            self._loop.close()
+        self._loop = None
+        self._shutdown_parse_pool()
+
+    def fetch(self, url) -> str:
         """Raise error if cannot fetch data"""
         try:
-            res = requests.get(url)
+            return self._run(self.async_fetch(None, url))
         except Exception as e:
             raise FetchError(url, e)
-        return res.content
 
-    @staticmethod
-    async def async_fetch(client_session: ClientSession, url: str, raise_for_status: bool = True) -> str:
-        """Asynchronously perform a get request
+    async def async_fetch(self, client_session: ClientSession, url: str, raise_for_status: bool = True) -> str:
+        """Asynchronously perform a get request, use the response cache if set
 
-        :param client_session: aiohttp Client Session
+        Requests are paced by the rate limiter of the url host, and retried with the retry policy.
+        :param client_session: aiohttp Client Session, the scrapper session if None
         :param url: fetching url
         :param raise_for_status: raise Error if resposne status is 400 or highger
         :return: response for content
         """
-        LOG.debug(f'fetching {url}')
-        async with client_session.get(url, raise_for_status=raise_for_status) as resp:
-            return await resp.text()
+        client_session = client_session or self.session
+        cached = self.response_cache.get(url) if self.response_cache else None
+        if cached and self.response_cache.is_fresh(cached):
+            LOG.debug(f'using cached {url}')
+            return cached.text()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return await self._async_fetch_once(client_session, url, cached, raise_for_status)
+            except Exception as e:
+                if not self.retry_policy.should_retry(e, attempt):
+                    raise
+                headers = getattr(e, 'headers', None)
+                delay = self.retry_policy.delay(attempt, headers.get('Retry-After') if headers else None)
+                LOG.warning(f'retrying {url} in {delay:.1f}s after attempt {attempt} failed: {e!r}')
+                await asyncio.sleep(delay)
 
-    def scrap_industry_listing_urls(self) -> Dict:
+    async def _async_fetch_once(
+            self, client_session: ClientSession, url: str, cached: Optional[CachedResponse], raise_for_status: bool
+    ) -> str:
+        async with self.rate_limiter.limiter(url) as limiter:
+            LOG.debug(f'fetching {url}')
+            started_at = time.monotonic()
+            try:
+                resp = await client_session.get(
+                    url, headers=ResponseCache.conditional_headers(cached), raise_for_status=False)
+            except asyncio.CancelledError:
+                # an Exception before python 3.8, a cancelled request did not fail
+                raise
+            except Exception:
+                limiter.record(started_at, None, time.monotonic() - started_at)
+                raise
+            async with resp:
+                limiter.record(started_at, resp.status, time.monotonic() - started_at)
+                if raise_for_status:
+                    resp.raise_for_status()
+                if cached and resp.status == 304:
+                    return self.response_cache.revalidated(cached, resp.headers).text()
+                if not self.response_cache or resp.status != 200:
+                    return await resp.text()
+                body = await resp.read()
+                return self.response_cache.put(url, body, resp.headers, resp.get_encoding()).text()
+
+    @property
+    def parse_pool(self) -> Pool:
+        if self._parse_pool is None:
+            raise RuntimeError('parsing processes are not started, use the scrapper as a context manager')
+        return self._parse_pool
+
+    def _start_parse_pool(self):
+        # multiprocessing pool rather than ProcessPoolExecutor, whose mp_context needs python 3.7
+        if self._parse_pool is None and self.parse_workers != 0:
+            self._parse_pool = parse_context().Pool(processes=self.parse_workers)
+
+    def _shutdown_parse_pool(self):
+        if self._parse_pool is not None:
+            if self._lost_parse_tasks:
+                self._parse_pool.terminate()
+            else:
+                self._parse_pool.close()
+            self._parse_pool.join()
+            self._parse_pool = None
+            self._lost_parse_tasks = False
+
+    async def async_parse(self, parse: Callable, content: str):
+        """parse content in the parsing processes so that the event loop keeps fetching
+
+        The processes are started with `parse_context`, as the scrapper process runs the threads of the event loop. The
+        pool silently drops the task of a worker that dies, so a page not parsed within `parse_timeout` fails.
+        :param parse: parser method
+        :param content: page content
+        :return: parsed data
+        """
+        if self.parse_workers == 0:
+            return parse(content)
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+
+        # called in a result thread of the pool
+        def on_result(result):
+            loop.call_soon_threadsafe(_resolve_future, future, result)
+
+        def on_error(error):
+            loop.call_soon_threadsafe(_resolve_future, future, None, error)
+
+        self.parse_pool.apply_async(parse, (content,), callback=on_result, error_callback=on_error)
+        try:
+            return await asyncio.wait_for(future, self.parse_timeout)
+        except asyncio.TimeoutError:
+            self._lost_parse_tasks = True
+            raise ParserError(f'no result from the parsing processes after {self.parse_timeout}s', content)
+
+    async def async_scrap_industry_listing_urls(self) -> Dict:
         """Find listing of stocks by industry urls urls by scrapping the research page
         :return: Dictionary of industries and their corresponding urls
         """
-        research_page_content = self.fetch(self.main_page_url + self.research_page_postfix)
+        research_page_content = await self.async_fetch(None, self.main_page_url + self.research_page_postfix)
         return self.parser.parse_industry_listing_urls(research_page_content)
 
-    def scrap_stocks_data_from_industry_listing(self, industry_listing_page_url: str) -> Dict:
+    def scrap_industry_listing_urls(self) -> Dict:
+        return self._run(self.async_scrap_industry_listing_urls())
+
+    async def async_scrap_stocks_data_from_industry_listing(self, industry_listing_page_url: str) -> Dict:
         """Find stocks url and profile information by scrapping listing of stock by industry page
 
         :return: Dictionary of stocks ticker and its data
         """
-        industry_listing_page_content = self.fetch(industry_listing_page_url)
+        industry_listing_page_content = await self.async_fetch(None, industry_listing_page_url)
         return self.parser.parse_stocks_data_from_industry_listing_page(industry_listing_page_content)
 
-    def create_stock_data_from_parsed_pages(self, parsed_pages: List[Dict]):
+    def scrap_stocks_data_from_industry_listing(self, industry_listing_page_url: str) -> Dict:
+        return self._run(self.async_scrap_stocks_data_from_industry_listing(industry_listing_page_url))
+
+    async def async_scrap_all_industry_listings(self, limit: int = 10) -> Tuple[Dict, Dict]:
+        """Scrap the stocks of every industry listing found on the research page concurrently
+
+        :param limit: max number of industry listing pages scrapped at the same time
+        :return: meta data {'industries': industry listing urls, 'stocks': stocks data by ticker} and the failed
+            industries with their error
+        """
+        industry_listings = await self.async_scrap_industry_listing_urls()
+        LOG.info(f'scrapped {len(industry_listings)} industry listings')
+        semaphore = asyncio.Semaphore(limit)
+
+        async def scrap(industry: str) -> Dict:
+            async with semaphore:
+                stocks_data = await self.async_scrap_stocks_data_from_industry_listing(industry_listings[industry])
+            LOG.info(f'scrapped industry {industry}')
+            return stocks_data
+
+        results = await asyncio.gather(*[scrap(industry) for industry in industry_listings], return_exceptions=True)
+        # merged in order of the industries so that reruns give the same meta data
+        stocks_data = {}
+        failed_industries = {}
+        for industry, result in zip(industry_listings, results):
+            if isinstance(result, Exception):
+                LOG.error(f'fail to scrap industry {industry} listing: {result}')
+                failed_industries[industry] = str(result)
+                continue
+            stocks_data.update(result)
+        LOG.info(f'scrapped {len(stocks_data)} stocks from '
+                 f'{len(industry_listings) - len(failed_industries)}/{len(industry_listings)} industries')
+        return {'industries': industry_listings, 'stocks': stocks_data}, failed_industries
+
+    def scrap_all_industry_listings(self, limit: int = 10, meta_file_path: Path = None) -> Tuple[Dict, Dict]:
+        """Scrap the stocks of every industry listing and write them as meta data
+
+        :param limit: max number of industry listing pages scrapped at the same time
+        :param meta_file_path: path of the written meta data, `.json` or `.json.gz`, not written if not specified
+        :return: meta data and the failed industries with their error
+        """
+        meta_data, failed_industries = self._run(self.async_scrap_all_industry_listings(limit))
+        if meta_file_path:
+            if meta_file_path.name.endswith('.json.gz'):
+                write_json_gz_file(meta_data, meta_file_path)
+            else:
+                with meta_file_path.open('w') as f:
+                    json.dump(meta_data, f)
+        return meta_data, failed_industries
+
+    @property
+    def stock_pages(self) -> List[str]:
+        """pages of a stock by the field of its data: the beautified financial aspects and `price`"""
+        return self.beautified_financial_aspects + ['price']
+
+    def create_stock_data_from_parsed_pages(self, parsed_pages: List[Dict], pages: Sequence[str] = None):
         """create stock data from parsed financial aspect pages and price page
 
-        :param parsed_pages: scrapped page in order of fin aspects + price
+        :param parsed_pages: scrapped page in order of pages
+        :param pages: stock pages that were scrapped, all stock pages (fin aspects + price) if not specified
         :return:
         """
-        stock_data = {field: parsed_pages[idx] for idx, field in enumerate(self.beautified_financial_aspects)}
-        scrapped_price_data = parsed_pages[-1]
-        for field in ['sector', 'industry', 'description']:
-            stock_data[field] = scrapped_price_data.pop(field)
-        stock_data['price'] = scrapped_price_data['price']
+        stock_data = {}
+        for page, parsed_page in zip(pages or self.stock_pages, parsed_pages):
+            if page != 'price':
+                stock_data[page] = parsed_page
+                continue
+            for field in ['sector', 'industry', 'description']:
+                stock_data[field] = parsed_page.pop(field)
+            stock_data['price'] = parsed_page['price']
         return stock_data
 
-    async def async_scrap_stock_pages(self, client_session: ClientSession, stock_main_page_url: str):
+    async def async_scrap_stock_pages(
+            self, client_session: ClientSession, stock_main_page_url: str, pages: Sequence[str] = None):
         """async fetch and parse stock financial aspect pages and price pages
 
         :param client_session: aiohttp client session
         :param stock_main_page_url: the main page of a stock
+        :param pages: stock pages to scrap, see `stock_pages`, all if not specified
         :return: scrapped page
         """
         async def scrap_fin_asp_page(aspect: str) -> Dict:
             content = await self.async_fetch(client_session, f'{stock_main_page_url}/{aspect}')
             if isinstance(content, Exception):
                 raise FetchError(f'{stock_main_page_url}/{aspect}', content)
-            return self.parser.parse_stock_financial_aspect_page(content)
+            return await self.async_parse(self.parser.parse_stock_financial_aspect_page, content)
 
         async def scrap_price_page() -> Dict:
             content = await self.async_fetch(client_session, f'{stock_main_page_url}/{self.price_endpoint}')
             if isinstance(content, Exception):
                 raise FetchError(f'{stock_main_page_url}/{self.price_endpoint}', content)
-            return self.parser.parse_stock_price_data_and_profile_page(content)
-        tasks = [scrap_fin_asp_page(asp) for asp in self.financial_aspect_endpoints] + [scrap_price_page()]
+            return await self.async_parse(self.parser.parse_stock_price_data_and_profile_page, content)
+        aspect_endpoints = dict(zip(self.beautified_financial_aspects, self.financial_aspect_endpoints))
+        tasks = [scrap_price_page() if page == 'price' else scrap_fin_asp_page(aspect_endpoints[page])
+                 for page in pages or self.stock_pages]
         return await asyncio.gather(*tasks, return_exceptions=True)
 
-    async def async_scrap_stock_data(self, client_session: ClientSession, stock_main_page_url: str) -> Dict:
+    async def async_scrap_stock_data(
+            self, client_session: ClientSession, stock_main_page_url: str, pages: Sequence[str] = None) -> Dict:
+        """async scrap stock data, partial data of only the fields of pages if specified"""
         LOG.debug(f'scrapping {stock_main_page_url}')
-        scrapped_pages = await self.async_scrap_stock_pages(client_session, stock_main_page_url)
+        scrapped_pages = await self.async_scrap_stock_pages(client_session, stock_main_page_url, pages)
         for page in scrapped_pages:
+            # gather of python 3.6 returns the cancellation of the pages instead of raising it
+            if isinstance(page, asyncio.CancelledError):
+                raise page
             if isinstance(page, Exception):
                 raise BaseError(f'fail to scrap {stock_main_page_url}: {page}')
-        stock_data = self.create_stock_data_from_parsed_pages(scrapped_pages)
+        stock_data = self.create_stock_data_from_parsed_pages(scrapped_pages, pages)
         LOG.debug(f'scrapped {stock_main_page_url}')
         return stock_data
 
@@ -130,27 +415,115 @@ class Scrapper:
         async with semaphore:
             return await self.async_scrap_stock_data(*args)
 
-    def scrap_multiple_stocks(self, stock_main_page_urls: List[str], limit: int = 50) -> List[Dict]:
-        """scrap multiple stocks data
+    async def async_iter_scrap_multiple_stocks(
+            self,
+            client_session: ClientSession,
+            stock_main_page_urls: Iterable[str],
+            limit: int = 50,
+            pages_by_url: Mapping[str, Sequence[str]] = None
+    ) -> AsyncIterator[Tuple[str, Union[Dict, Exception]]]:
+        """scrap multiple stocks data with `limit` workers and yield each stock as soon as it is scrapped
 
-        :param stock_main_page_urls: list of stocks main page url
-        :param limit: limit concurrency with semaphore
-        :return:
+        Urls are consumed lazily through a bounded queue, so only about `limit` stocks are pending or held at a time.
+        :param client_session: aiohttp client session, the scrapper session if None
+        :param stock_main_page_urls: stocks main page url
+        :param limit: number of stocks scrapped concurrently
+        :param pages_by_url: pages to scrap of the stocks with partial data, see `stock_pages`
+        :return: (url, stock data or the error that failed it) in order of completion
         """
-        async def run():
-            async with ClientSession() as session:
-                tasks = [self.bound_async_scrap_stock_data(semaphore, session, url) for url in stock_main_page_urls]
-                return await asyncio.gather(*tasks, return_exceptions=True)
+        url_queue = asyncio.Queue(maxsize=limit)
+        result_queue = asyncio.Queue(maxsize=limit)
+        done = object()
+        # set once the consumer stops, so that no task blocks on a queue nobody reads any more
+        closed = False
 
-        semaphore = asyncio.Semaphore(limit)
-        loop = asyncio.get_event_loop()
+        async def feed():
+            error = None
+            try:
+                for url in stock_main_page_urls:
+                    await url_queue.put(url)
+            except asyncio.CancelledError:
+                # an Exception before python 3.8
+                raise
+            except Exception as e:
+                error = e
+            for _ in range(limit):
+                if closed:
+                    return
+                await url_queue.put(done)
+            if error:
+                raise error
+
+        async def work():
+            while True:
+                url = await url_queue.get()
+                if url is done:
+                    break
+                try:
+                    pages = pages_by_url.get(url) if pages_by_url else None
+                    result = await self.async_scrap_stock_data(client_session, url, pages)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    result = e
+                if closed:
+                    return
+                await result_queue.put((url, result))
+            if not closed:
+                await result_queue.put(done)
+
+        feeder = asyncio.ensure_future(feed())
+        workers = [asyncio.ensure_future(work()) for _ in range(limit)]
         try:
-            scrapped_data = loop.run_until_complete(run())
+            n_finished_workers = 0
+            while n_finished_workers < limit:
+                item = await result_queue.get()
+                if item is done:
+                    n_finished_workers += 1
+                    continue
+                yield item
+            # raise error of iterating urls if any
+            await feeder
         finally:
-            loop.run_until_complete(loop.shutdown_asyncgens())
-            loop.close()
-        LOG.info(f'scrapped {len(stock_main_page_urls)} stock data')
-        return scrapped_data
+            closed = True
+            for task in [feeder] + workers:
+                task.cancel()
+            await asyncio.gather(feeder, *workers, return_exceptions=True)
+
+    def iter_scrap_multiple_stocks(
+            self, stock_main_page_urls: Iterable[str], limit: int = 50, pages_by_url: Mapping[str, Sequence[str]] = None
+    ) -> Iterator[Tuple[str, Union[Dict, Exception]]]:
+        """scrap multiple stocks data and yield each stock as soon as it is scrapped, see
+        `async_iter_scrap_multiple_stocks`
+
+        :param stock_main_page_urls: stocks main page url
+        :param limit: number of stocks scrapped concurrently
+        :param pages_by_url: pages to scrap of the stocks with partial data, see `stock_pages`
+        :return: (url, stock data or the error that failed it) in order of completion
+        """
+        scrapped = self.async_iter_scrap_multiple_stocks(None, stock_main_page_urls, limit, pages_by_url)
+        n_scrapped = 0
+        try:
+            while True:
+                try:
+                    item = self._run(scrapped.__anext__())
+                except StopAsyncIteration:
+                    break
+                n_scrapped += 1
+                yield item
+        finally:
+            self._run(scrapped.aclose())
+            LOG.info(f'scrapped {n_scrapped} stock data')
+
+    def scrap_multiple_stocks(self, stock_main_page_urls: List[str], limit: int = 50) -> List[Dict]:
+        """scrap multiple stocks data
+
+        :param stock_main_page_urls: list of stocks main page url
+        :param limit: number of stocks scrapped concurrently
+        :return: stock data or the error that failed it, in order of urls
+        """
+        scrapped_data = dict(self.iter_scrap_multiple_stocks(stock_main_page_urls, limit))
+        return [scrapped_data[url] for url in stock_main_page_urls]
 
     def scrap_stock_data(self, stock_main_page_url: str):
         """Scrap stock data from its url
@@ -159,12 +532,6 @@ class Scrapper:
         :return:
         """
 
-        async def run():
-            async with ClientSession(raise_for_status=True) as session:
-                return await self.async_scrap_stock_data(session, stock_main_page_url)
-
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        scrapped_data = loop.run_until_complete(run())
+        scrapped_data = self._run(self.async_scrap_stock_data(None, stock_main_page_url))
         LOG.info(f'scrapped {stock_main_page_url} stock data')
         return scrapped_data
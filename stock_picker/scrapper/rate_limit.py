@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+from aiohttp import ClientConnectionError, ClientResponseError
+
+LOG = logging.getLogger('scrapper.RateLimit')
+
+
+class AdaptiveLimiter:
+    """Concurrency limit and token bucket of requests to a host
+
+    Both the concurrency and the rate increase additively while responses are fast and successful, and decrease
+    multiplicatively when the host throttles (429), fails (5xx) or does not respond. A slow response decreases the
+    concurrency additively. Only responses to requests started after the last decrease can decrease them again, so a
+    burst of throttled in-flight requests counts once.
+    """
+    def __init__(
+            self,
+            concurrency: float = 10,
+            min_concurrency: float = 1,
+            max_concurrency: float = 50,
+            rate: float = 10,
+            min_rate: float = 0.5,
+            max_rate: float = 50,
+            burst: float = 10,
+            latency_target: float = 5,
+            decrease_factor: float = 0.5
+    ):
+        """
+        :param concurrency: initial number of requests in flight
+        :param min_concurrency: lower bound of concurrency
+        :param max_concurrency: upper bound of concurrency
+        :param rate: initial requests per second
+        :param min_rate: lower bound of rate
+        :param max_rate: upper bound of rate
+        :param burst: capacity of the token bucket
+        :param latency_target: seconds above which a response is slow
+        :param decrease_factor: multiplier of concurrency and rate when throttled
+        """
+        self.concurrency = concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self._tokens = burst
+        self._tokens_updated_at = time.monotonic()
+        self._last_decrease_at = float('-inf')
+        self._active = 0
+        self._condition = None
+        self._condition_loop = None
+
+    def _get_condition(self) -> asyncio.Condition:
+        # scrapper runs may use a new event loop each, the running loop as called from coroutines
+        loop = asyncio.get_event_loop()
+        if self._condition_loop is not loop:
+            self._condition = asyncio.Condition()
+            self._condition_loop = loop
+            self._active = 0
+        return self._condition
+
+    async def _take_token(self):
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._tokens_updated_at) * self.rate)
+            self._tokens_updated_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    async def __aenter__(self):
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self._active < max(int(self.concurrency), 1))
+            self._active += 1
+        try:
+            await self._take_token()
+        except BaseException:
+            await self.__aexit__(None, None, None)
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        condition = self._get_condition()
+        async with condition:
+            self._active -= 1
+            condition.notify_all()
+
+    def record(self, started_at: float, status: Optional[int], latency: float):
+        """adapt to the response of a request
+
+        :param started_at: `time.monotonic()` when the request started
+        :param status: response status, None if no response
+        :param latency: seconds until the response
+        """
+        if status is None or status == 429 or status >= 500:
+            if started_at < self._last_decrease_at:
+                return
+            self.concurrency = max(self.min_concurrency, self.concurrency * self.decrease_factor)
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            self._last_decrease_at = time.monotonic()
+            LOG.info(f'throttled with status {status}, decreased to {self.concurrency:.1f} concurrent requests '
+                     f'and {self.rate:.1f} requests/s')
+        elif latency > self.latency_target:
+            self.concurrency = max(self.min_concurrency, self.concurrency - 1 / self.concurrency)
+        else:
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+            self.rate = min(self.max_rate, self.rate + 1 / self.rate)
+
+
+class HostRateLimiter:
+    """An AdaptiveLimiter per host"""
+    def __init__(self, **limiter_kwargs):
+        """
+        :param limiter_kwargs: arguments of the AdaptiveLimiter of each host
+        """
+        self.limiter_kwargs = limiter_kwargs
+        self._limiters: Dict[str, AdaptiveLimiter] = {}
+
+    def limiter(self, url: str) -> AdaptiveLimiter:
+        host = urlsplit(url).netloc
+        if host not in self._limiters:
+            self._limiters[host] = AdaptiveLimiter(**self.limiter_kwargs)
+        return self._limiters[host]
+
+
+class RetryPolicy:
+    """Retry of failed requests with jittered exponential backoff"""
+    def __init__(
+            self,
+            max_attempts: int = 5,
+            base_delay: float = 1,
+            max_delay: float = 60,
+            retry_statuses: Iterable[int] = (429, 500, 502, 503, 504)
+    ):
+        """
+        :param max_attempts: attempts of a request including the first one
+        :param base_delay: seconds of the delay upper bound after the first attempt, doubled after each attempt
+        :param max_delay: max seconds of a delay
+        :param retry_statuses: response statuses to retry
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = set(retry_statuses)
+
+    def should_retry(self, error: Exception, attempt: int) -> bool:
+        if attempt >= self.max_attempts:
+            return False
+        if isinstance(error, ClientResponseError):
+            return error.status in self.retry_statuses
+        return isinstance(error, (ClientConnectionError, asyncio.TimeoutError))
+
+    def delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """seconds to wait after attempt, at least the `Retry-After` header if any
+
+        :param attempt: number of attempts so far
+        :param retry_after: `Retry-After` header, in seconds or as a http date
+        :return:
+        """
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        if retry_after:
+            try:
+                retry_after_delay = float(retry_after)
+            except ValueError:
+                try:
+                    retry_after_delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                except (TypeError, ValueError):
+                    retry_after_delay = 0
+            delay = max(delay, min(retry_after_delay, self.max_delay))
+        return delay
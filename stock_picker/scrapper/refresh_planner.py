@@ -0,0 +1,142 @@
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+LOG = logging.getLogger('scrapper.RefreshPlanner')
+
+DAY = 24 * 3600
+FINANCIAL_STATEMENT_PAGES = ('income_statement', 'balance_sheet', 'cash_flow_statement')
+PRICE_PAGE = 'price'
+# stock data field of the time each page was last refreshed
+REFRESHED_AT_FIELD = 'refreshed_at'
+
+
+def next_fiscal_year_end(latest_year: str) -> datetime:
+    """end of the fiscal year after the latest reported year, e.g. `2019-12-31`"""
+    latest = datetime.strptime(latest_year, '%Y-%m-%d')
+    try:
+        return latest.replace(year=latest.year + 1)
+    except ValueError:
+        # 29th of February
+        return latest.replace(year=latest.year + 1, day=28)
+
+
+class RefreshPlanner:
+    """Plan which pages of scrapped stocks are likely to have new data
+
+    A price page is stale once it was refreshed more than `price_max_age` ago. A financial statement is stale once its
+    next fiscal year ended more than `filing_grace` ago, and is rechecked every `statement_recheck_interval` until the
+    new year is scrapped. A page was refreshed at the time recorded in the `refreshed_at` field of the stock data,
+    else at the modification time of the stock file. Stocks without a readable file need all their pages.
+    """
+    def __init__(
+            self,
+            stocks_data_folder: Path,
+            statement_pages: Sequence[str] = FINANCIAL_STATEMENT_PAGES,
+            price_max_age: float = 7 * DAY,
+            filing_grace: float = 90 * DAY,
+            statement_recheck_interval: float = 7 * DAY,
+            request_budget: Optional[int] = None
+    ):
+        """
+        :param stocks_data_folder: folder of the `{ticker}.json` stock data files
+        :param statement_pages: pages of financial statements
+        :param price_max_age: seconds a price page stays fresh
+        :param filing_grace: seconds after a fiscal year end until its statements are expected
+        :param statement_recheck_interval: seconds between checks of an expected statement
+        :param request_budget: max number of pages in a plan, no limit if not specified
+        """
+        self.stocks_data_folder = stocks_data_folder
+        self.statement_pages = tuple(statement_pages)
+        self.price_max_age = price_max_age
+        self.filing_grace = filing_grace
+        self.statement_recheck_interval = statement_recheck_interval
+        self.request_budget = request_budget
+
+    @property
+    def all_pages(self) -> List[str]:
+        return list(self.statement_pages) + [PRICE_PAGE]
+
+    def stale_pages(self, ticker: str, now: float = None) -> Optional[List[Tuple[str, float]]]:
+        """stale pages of a stock and for how long they have been stale
+
+        :param ticker: stock ticker
+        :param now: timestamp of the plan, current time if not specified
+        :return: list of (page, seconds stale), None if the stock has no readable data and needs all pages
+        """
+        now = now or time.time()
+        stock_file = self.stocks_data_folder / f'{ticker}.json'
+        try:
+            file_mtime = stock_file.stat().st_mtime
+            with stock_file.open() as f:
+                stock_data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        refreshed_at = stock_data.get(REFRESHED_AT_FIELD, {})
+        stale = []
+        price_age = now - refreshed_at.get(PRICE_PAGE, file_mtime)
+        if price_age >= self.price_max_age:
+            stale.append((PRICE_PAGE, price_age - self.price_max_age))
+        for page in self.statement_pages:
+            try:
+                expected_at = next_fiscal_year_end(max(stock_data[page]['years'])).timestamp() + self.filing_grace
+            except (KeyError, TypeError, ValueError):
+                return None
+            page_refreshed_at = refreshed_at.get(page, file_mtime)
+            if now >= expected_at and (page_refreshed_at < expected_at or
+                                       now - page_refreshed_at >= self.statement_recheck_interval):
+                stale.append((page, now - expected_at))
+        return stale
+
+    def plan(self, tickers: Iterable[str], now: float = None) -> Dict[str, List[str]]:
+        """pages to refresh of each stock within the request budget, the longest stale first
+
+        :param tickers: stock tickers
+        :param now: timestamp of the plan, current time if not specified
+        :return: OrderedDict of ticker and its pages to refresh
+        """
+        now = now or time.time()
+        # (seconds stale, ticker, pages), stocks without data are refreshed first and whole
+        candidates = []
+        for ticker in tickers:
+            stale = self.stale_pages(ticker, now)
+            if stale is None:
+                candidates.append((float('inf'), ticker, self.all_pages))
+            else:
+                candidates.extend((seconds_stale, ticker, [page]) for page, seconds_stale in stale)
+        candidates.sort(key=lambda candidate: -candidate[0])
+        plan = OrderedDict()
+        n_requests = 0
+        for _, ticker, pages in candidates:
+            if self.request_budget is not None and n_requests + len(pages) > self.request_budget:
+                continue
+            plan.setdefault(ticker, []).extend(pages)
+            n_requests += len(pages)
+        LOG.info(f'planned {n_requests} page requests of {len(plan)} stocks out of {len(candidates)} stale candidates')
+        return plan
+
+
+def merge_stock_data(stock_data: Optional[Dict], scrapped_stock_data: Dict, pages: Sequence[str],
+                     refreshed_at: float = None) -> Dict:
+    """stock data updated with the scrapped data of the refreshed pages
+
+    :param stock_data: existing stock data
+    :param scrapped_stock_data: partial stock data of the refreshed pages
+    :param pages: refreshed pages
+    :param refreshed_at: timestamp of the refresh, current time if not specified
+    :return: merged stock data
+    """
+    merged = dict(stock_data or {})
+    merged.update(scrapped_stock_data)
+    merged[REFRESHED_AT_FIELD] = {**merged.get(REFRESHED_AT_FIELD, {}),
+                                  **{page: refreshed_at or time.time() for page in pages}}
+    return merged
+
+
+def plan_summary(plan: Dict[str, List[str]]) -> str:
+    pages = [page for ticker_pages in plan.values() for page in ticker_pages]
+    return ', '.join(f'{page}: {pages.count(page)}' for page in sorted(set(pages)))
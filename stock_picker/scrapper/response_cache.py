@@ -0,0 +1,126 @@
+import gzip
+import hashlib
+import json
+import logging
+import re
+import time
+from pathlib import Path
+from typing import Dict, Mapping, NamedTuple, Optional
+
+LOG = logging.getLogger('scrapper.ResponseCache')
+
+
+class CachedResponse(NamedTuple):
+    url: str
+    body: bytes
+    encoding: Optional[str]
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+
+    def text(self) -> str:
+        return self.body.decode(self.encoding or 'utf-8')
+
+
+class ResponseCache:
+    """On-disk cache of HTTP GET responses addressed by the sha256 of their url
+
+    Each response is stored as a gzipped body and a json metadata file with its validators. A response is fresh for
+    the ttl of the first pattern in `ttl_by_pattern` that matches its url, else for `ttl`. A stale response can be
+    revalidated with `conditional_headers`, and refreshed with `revalidated` when the server replies 304.
+    """
+    def __init__(
+            self,
+            cache_folder: Path,
+            ttl: Optional[float] = 24 * 3600,
+            ttl_by_pattern: Mapping[str, Optional[float]] = None,
+            compresslevel: int = 6
+    ):
+        """
+        :param cache_folder: folder of cached responses
+        :param ttl: seconds a response is fresh, None for never expire
+        :param ttl_by_pattern: regex pattern of url and its ttl
+        :param compresslevel: gzip compression level of bodies
+        """
+        self.cache_folder = cache_folder
+        self.ttl = ttl
+        self.ttl_by_pattern = [(re.compile(pattern), ttl) for pattern, ttl in (ttl_by_pattern or {}).items()]
+        self.compresslevel = compresslevel
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha256(url.encode()).hexdigest()
+
+    def _paths(self, url: str):
+        key = self.key(url)
+        folder = self.cache_folder / key[:2]
+        return folder / f'{key}.json', folder / f'{key}.gz'
+
+    def url_ttl(self, url: str) -> Optional[float]:
+        for pattern, ttl in self.ttl_by_pattern:
+            if pattern.search(url):
+                return ttl
+        return self.ttl
+
+    def is_fresh(self, response: CachedResponse, now: float = None) -> bool:
+        ttl = self.url_ttl(response.url)
+        return ttl is None or (now or time.time()) - response.fetched_at < ttl
+
+    def get(self, url: str) -> Optional[CachedResponse]:
+        """cached response of url regardless of its freshness, None if not cached or unreadable"""
+        meta_path, body_path = self._paths(url)
+        if not meta_path.exists():
+            return None
+        try:
+            with meta_path.open() as f:
+                meta = json.load(f)
+            with gzip.open(body_path, 'rb') as f:
+                body = f.read()
+        except Exception as e:
+            LOG.warning(f'fail to read cached response of {url}: {e}')
+            return None
+        return CachedResponse(url, body, meta['encoding'], meta['etag'], meta['last_modified'], meta['fetched_at'])
+
+    def put(self, url: str, body: bytes, headers: Mapping[str, str], encoding: str = None) -> CachedResponse:
+        """cache a response body with the validators in its headers"""
+        response = CachedResponse(
+            url, body, encoding, headers.get('ETag'), headers.get('Last-Modified'), time.time())
+        meta_path, body_path = self._paths(url)
+        meta_path.parent.mkdir(parents=True, exist_ok=True)
+        # body first, the metadata makes the entry visible
+        temp_body_path = body_path.parent / f'{body_path.name}.tmp'
+        with gzip.open(temp_body_path, 'wb', compresslevel=self.compresslevel) as f:
+            f.write(body)
+        temp_body_path.replace(body_path)
+        self._write_meta(meta_path, response)
+        LOG.debug(f'cached response of {url}')
+        return response
+
+    def revalidated(self, response: CachedResponse, headers: Mapping[str, str]) -> CachedResponse:
+        """refresh a cached response after the server replied 304 Not Modified"""
+        response = response._replace(
+            etag=headers.get('ETag', response.etag),
+            last_modified=headers.get('Last-Modified', response.last_modified),
+            fetched_at=time.time()
+        )
+        self._write_meta(self._paths(response.url)[0], response)
+        LOG.debug(f'revalidated cached response of {response.url}')
+        return response
+
+    @staticmethod
+    def _write_meta(meta_path: Path, response: CachedResponse):
+        temp_meta_path = meta_path.parent / f'{meta_path.name}.tmp'
+        with temp_meta_path.open('w') as f:
+            json.dump({'url': response.url, 'encoding': response.encoding, 'etag': response.etag,
+                       'last_modified': response.last_modified, 'fetched_at': response.fetched_at}, f)
+        temp_meta_path.replace(meta_path)
+
+    @staticmethod
+    def conditional_headers(response: Optional[CachedResponse]) -> Dict[str, str]:
+        """headers to revalidate a stale cached response"""
+        headers = {}
+        if response and response.etag:
+            headers['If-None-Match'] = response.etag
+        if response and response.last_modified:
+            headers['If-Modified-Since'] = response.last_modified
+        return headers
@@ -0,0 +1,114 @@
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+LOG = logging.getLogger('scrapper.ScrapeJournal')
+
+
+class ScrapeJournal:
+    """Append-only json lines log of the scrape status of tickers
+
+    Each scrape attempt of a ticker appends its status, attempt count and timestamp, and is synced to disk, so a run
+    killed midway can resume from the journal: tickers done are skipped and failed tickers are retried until
+    `max_attempts`. Once a run has no pending tickers, `archive` starts a new journal for the next run.
+    """
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __init__(self, journal_path: Path, max_attempts: int = 3):
+        """
+        :param journal_path: json lines file of the journal, created if not exists
+        :param max_attempts: number of attempts of a ticker before giving up on it
+        """
+        self.journal_path = journal_path
+        self.max_attempts = max_attempts
+        self._entries: Dict[str, Dict] = {}
+        if journal_path.exists():
+            self._load()
+        journal_path.parent.mkdir(parents=True, exist_ok=True)
+        self._open()
+
+    def _open(self):
+        self._file = self.journal_path.open('a')
+        if self._file.tell() and not self._ends_with_newline():
+            # end the partially written line of a killed run
+            self._file.write('\n')
+
+    def _ends_with_newline(self) -> bool:
+        with self.journal_path.open('rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    def _load(self):
+        with self.journal_path.open() as f:
+            for line_number, line in enumerate(f, 1):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # last line of a killed run may be partially written
+                    LOG.warning(f'skipped invalid line {line_number} of journal {self.journal_path}')
+                    continue
+                self._entries[entry['ticker']] = entry
+        LOG.info(f'loaded journal of {len(self._entries)} tickers, {len(self.done())} done')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    def archive(self) -> Path:
+        """move the journal of a completed run aside and start an empty one, so the next run scrapes all tickers again
+
+        :return: path of the archived journal, `<name>.<timestamp>.jsonl` next to the journal
+        """
+        self._file.close()
+        timestamp = datetime.now().strftime('%Y%m%dT%H%M%S%f')
+        archive_path = self.journal_path.with_name(f'{self.journal_path.stem}.{timestamp}{self.journal_path.suffix}')
+        self.journal_path.replace(archive_path)
+        self._entries = {}
+        self._open()
+        LOG.info(f'archived journal to {archive_path}')
+        return archive_path
+
+    def entry(self, ticker: str) -> Optional[Dict]:
+        return self._entries.get(ticker)
+
+    def attempts(self, ticker: str) -> int:
+        return self._entries[ticker]['attempts'] if ticker in self._entries else 0
+
+    def record(self, ticker: str, status: str, error: str = None):
+        """append the result of an attempt to scrap ticker
+
+        :param ticker: stock ticker
+        :param status: `ScrapeJournal.DONE` or `ScrapeJournal.FAILED`
+        :param error: error of a failed attempt
+        :return:
+        """
+        entry = {'ticker': ticker, 'status': status, 'attempts': self.attempts(ticker) + 1, 'timestamp': time.time()}
+        if error is not None:
+            entry['error'] = error
+        self._file.write(json.dumps(entry) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._entries[ticker] = entry
+
+    def done(self) -> List[str]:
+        return [tkr for tkr, entry in self._entries.items() if entry['status'] == self.DONE]
+
+    def failed(self) -> Dict[str, str]:
+        """tickers that failed all attempts and their last error"""
+        return {tkr: entry.get('error') for tkr, entry in self._entries.items()
+                if entry['status'] == self.FAILED and entry['attempts'] >= self.max_attempts}
+
+    def pending(self, tickers: Iterable[str]) -> List[str]:
+        """tickers that are not done and have attempts left"""
+        return [tkr for tkr in tickers if tkr not in self._entries or (
+            self._entries[tkr]['status'] != self.DONE and self._entries[tkr]['attempts'] < self.max_attempts)]
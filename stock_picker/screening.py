@@ -0,0 +1,164 @@
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+LOG = logging.getLogger('Screening')
+
+DEFAULT_FILTERING_COUNTRIES = (
+    'argentina', 'australia', 'bermuda', 'brazil', 'chile', 'china', 'columbia',
+    'hong_kong_sar_china', 'india', 'indonesia', 'israel', 'japan', 'mexico', 'russia', 'south_africa',
+    'hong_kong, _sar_china'
+)
+# rules of the default filter that are only reported, they do not reject
+DEFAULT_FILTER_WARNING_RULES = ('negative_cash_on_hand',)
+# metrics below group avg - n std are outliers
+OUTLIER_LOWER_BOUND_FIELDS = (
+    'eps_growth_prev_0_4_vs_5_9_y',
+    'average_current_assets_liabilities_ratio_prev_0_4_y', 'average_total_assets_liabilities_ratio_prev_0_4_y',
+    'average_cash_total_liabilities_prev_0_4_y', 'average_solvency_ratio_prev_0_4_y',
+    'average_gross_profit_margin_prev_0_4_y', 'average_net_income_margin_prev_0_4_y',
+    'average_pre_tax_net_income_margin_prev_0_4_y',
+    'average_ROA_prev_0_4_y', 'average_ROE_prev_0_4_y', 'average_ROEC_prev_0_4_y',
+    'average_cash_flow_margin_prev_0_4_y', 'average_net_cash_flow_per_market_cap_prev_0_4_y',
+)
+# metrics above group avg + n std are outliers
+OUTLIER_UPPER_BOUND_FIELDS = (
+    'average_op_expenses_margin_prev_0_4_y', 'average_non_op_per_op_expense_prev_0_4_y',
+    'average_pe_prev_0_4_y', 'average_p_cash_prev_0_4_y', 'average_p_bv_prev_0_4_y',
+    'average_dividend_net_income_ratio_prev_0_4_y', 'average_debt_issuance_per_net_income_prev_0_4_y',
+    'average_equity_issued_per_net_income_prev_0_4_y', 'average_inventory_current_assets_ratio_prev_0_4_y'
+)
+
+
+def to_float(value) -> np.ndarray:
+    """scalar or array as float64, None becomes NaN"""
+    if value is None:
+        return np.array(np.nan)
+    if isinstance(value, np.ndarray):
+        return value.astype(np.float64, copy=False)
+    return np.array(value, dtype=np.float64)
+
+
+def reports_to_columns(reports: List[Dict]) -> OrderedDict:
+    """convert a list of reports to a table of columns
+
+    :param reports: reports with the same fields
+    :return: OrderedDict of field and its values, float64 with NaN for None if all values are numbers else object
+    """
+    columns = OrderedDict()
+    if not reports:
+        return columns
+    for field in reports[0]:
+        values = [rep[field] for rep in reports]
+        if all(val is None or (isinstance(val, (int, float, np.number)) and not isinstance(val, bool))
+               for val in values):
+            columns[field] = np.array([np.nan if val is None else val for val in values], dtype=np.float64)
+        else:
+            columns[field] = np.array(values, dtype=object)
+    return columns
+
+
+def null_ratio(columns: Dict) -> np.ndarray:
+    """ratio of null, zero or empty values of each row"""
+    null_count = np.zeros(len(next(iter(columns.values()))), dtype=np.int64)
+    for values in columns.values():
+        if values.dtype == object:
+            null_count += np.array([not val or (isinstance(val, float) and np.isnan(val)) for val in values])
+        else:
+            null_count += np.isnan(values) | (values == 0)
+    return null_count / len(columns)
+
+
+def default_filter_masks(
+        period_columns: Dict,
+        metrics_columns: Dict,
+        market_cap: int = 100,
+        filtering_country: Iterable[str] = DEFAULT_FILTERING_COUNTRIES,
+        positive_avg_earning: bool = True,
+        positive_cash_on_hand: bool = True,
+        solid_liquidity: bool = True,
+        null_data_ratio: float = 0.8,
+) -> OrderedDict:
+    """Evaluate the rules of `Picker.default_filter` over tables of reports
+
+    :return: OrderedDict of rule and mask of rows breaking it
+    """
+    masks = OrderedDict()
+    with np.errstate(invalid='ignore'):
+        masks['market_cap'] = metrics_columns['market_cap'] < market_cap
+        if filtering_country:
+            masks['country'] = np.isin(metrics_columns['country'], list(filtering_country))
+        if positive_avg_earning:
+            masks['negative_avg_eps'] = (period_columns['average_eps_earnings_per_share_prev_0_4_y'] < 0) | \
+                (period_columns['average_eps_earnings_per_share_prev_5_9_y'] < 0)
+        if positive_cash_on_hand:
+            masks['negative_cash_on_hand'] = period_columns['average_cash_on_hand_prev_0_4_y'] < 0
+        if solid_liquidity:
+            masks['current_assets_liabilities'] = \
+                (metrics_columns['latest_current_assets_liabilities_ratio'] < 1) | \
+                (metrics_columns['average_current_assets_liabilities_ratio_prev_0_4_y'] < 1)
+            masks['total_assets_liabilities'] = \
+                (metrics_columns['latest_total_assets_liabilities_ratio'] < 1) | \
+                (metrics_columns['average_total_assets_liabilities_ratio_prev_0_4_y'] < 1)
+            masks['negative_book_value'] = (metrics_columns['latest_p_bv'] < 0) | \
+                (metrics_columns['average_p_bv_prev_0_4_y'] < 0)
+    masks['null_data'] = null_ratio(metrics_columns) > null_data_ratio
+    return masks
+
+
+def outlier_filter_masks(metrics_columns: Dict, group_avg: Dict, group_std: Dict, n_std: float = 0.675) -> OrderedDict:
+    """Evaluate the rules of `Picker.outlier_filter` over a table of metrics reports
+
+    :param metrics_columns: table of metrics reports
+    :param group_avg: average of each field, a scalar or a value per row
+    :param group_std: std of each field, a scalar or a value per row
+    :param n_std: number of std from the average
+    :return: OrderedDict of field and mask of rows outside of avg +- n std
+    """
+    masks = OrderedDict()
+    with np.errstate(invalid='ignore'):
+        for field in OUTLIER_LOWER_BOUND_FIELDS:
+            masks[field] = metrics_columns[field] < to_float(group_avg[field]) - n_std * to_float(group_std[field])
+        for field in OUTLIER_UPPER_BOUND_FIELDS:
+            masks[field] = to_float(group_avg[field]) + n_std * to_float(group_std[field]) < metrics_columns[field]
+    return masks
+
+
+def screen(masks: Dict, warning_rules: Sequence[str] = ()) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """Combine rule masks into passing rows and a rejection bitmap
+
+    :param masks: rule and mask of rows breaking it
+    :param warning_rules: rules that are recorded in the bitmap without rejecting rows
+    :return: (mask of passing rows, bitmap of broken rules of each row, rules in bit order)
+    """
+    rules = list(masks.keys())
+    if len(rules) > 64:
+        raise ValueError(f'cannot screen more than 64 rules, got {len(rules)}')
+    n_rows = len(next(iter(masks.values()))) if masks else 0
+    # smallest unsigned int with a bit per rule
+    bitmap_dtype = np.min_scalar_type(1 << max(len(rules) - 1, 0))
+    bitmap = np.zeros(n_rows, dtype=bitmap_dtype)
+    passed = np.ones(n_rows, dtype=bool)
+    for bit, rule in enumerate(rules):
+        mask = np.broadcast_to(masks[rule], n_rows)
+        bitmap |= mask.astype(bitmap_dtype) << bitmap_dtype.type(bit)
+        if rule not in warning_rules:
+            passed &= ~mask
+    return passed, bitmap, rules
+
+
+def broken_rules(bitmap_value, rules: List[str]) -> List[str]:
+    """rules set in a row of a rejection bitmap"""
+    return [rule for bit, rule in enumerate(rules) if int(bitmap_value) >> bit & 1]
+
+
+def log_screening(tickers: List[str], bitmap: np.ndarray, rules: List[str], name: str):
+    """log the number of rows breaking each rule and the broken rules of each ticker"""
+    counts = {rule: int(np.count_nonzero((bitmap >> bitmap.dtype.type(bit)) & 1)) for bit, rule in enumerate(rules)}
+    LOG.info(f'{name}: {np.count_nonzero(bitmap)}/{len(tickers)} broke a rule: '
+             f'{", ".join(f"{rule}: {count}" for rule, count in counts.items() if count)}')
+    for ticker, value in zip(tickers, bitmap):
+        if value:
+            LOG.debug(f'{name}: {ticker} broke {", ".join(broken_rules(value, rules))}')
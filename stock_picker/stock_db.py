@@ -0,0 +1,169 @@
+import json
+import logging
+import sqlite3
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+LOG = logging.getLogger('StockDatabase')
+
+STATEMENTS = ('income_statement', 'balance_sheet', 'cash_flow_statement', 'price')
+# profile fields of stocks kept in their own indexed columns
+INDEXED_FIELDS = ('sector', 'industry', 'country', 'market_cap')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stocks (
+    ticker TEXT PRIMARY KEY,
+    sector TEXT,
+    industry TEXT,
+    country TEXT,
+    market_cap REAL,
+    info TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS stocks_sector ON stocks (sector);
+CREATE INDEX IF NOT EXISTS stocks_industry ON stocks (industry);
+CREATE INDEX IF NOT EXISTS stocks_country ON stocks (country);
+CREATE INDEX IF NOT EXISTS stocks_market_cap ON stocks (market_cap);
+CREATE TABLE IF NOT EXISTS statements (
+    ticker TEXT NOT NULL REFERENCES stocks (ticker) ON DELETE CASCADE,
+    statement TEXT NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (ticker, statement)
+) WITHOUT ROWID;
+"""
+
+
+def encode_statement(statement_data: Dict) -> bytes:
+    return zlib.compress(json.dumps(statement_data, separators=(',', ':')).encode())
+
+
+def decode_statement(blob: bytes) -> Dict:
+    return json.loads(zlib.decompress(blob))
+
+
+class StockDatabase:
+    """Single file SQLite store of scrapped stocks data
+
+    The profile of each stock is a row of `stocks`, with sector, industry, country and market cap in indexed columns
+    and the other fields as JSON. Each statement is a zlib compressed JSON blob of `statements`, so loading a
+    selection of stocks or statements only reads their rows.
+    """
+    def __init__(self, db_path: Path, statements: Sequence[str] = STATEMENTS):
+        """
+        :param db_path: database file, created if it does not exist
+        :param statements: fields of the stock data stored as statement blobs
+        """
+        self.db_path = db_path
+        self.statements = tuple(statements)
+        self._conn = sqlite3.connect(str(db_path))
+        self._conn.execute('PRAGMA journal_mode = WAL')
+        self._conn.execute('PRAGMA synchronous = NORMAL')
+        self._conn.execute('PRAGMA foreign_keys = ON')
+        self._conn.executescript(SCHEMA)
+
+    def __enter__(self) -> 'StockDatabase':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return self._conn.execute('SELECT COUNT(*) FROM stocks').fetchone()[0]
+
+    def __contains__(self, ticker):
+        return self._conn.execute('SELECT 1 FROM stocks WHERE ticker = ?', (ticker,)).fetchone() is not None
+
+    def close(self):
+        self._conn.close()
+
+    def bulk_insert(self, stocks_data: Iterable[Tuple[str, Dict]]) -> int:
+        """insert stocks data in one transaction, replacing the data of existing tickers
+
+        :param stocks_data: (ticker, stock data) pairs, the last data of a ticker is kept if it is repeated
+        :return: number of inserted stocks
+        """
+        stock_rows, statement_rows = [], []
+        for ticker, stock_data in dict(stocks_data).items():
+            info = {field: val for field, val in stock_data.items() if field not in self.statements}
+            stock_rows.append((ticker, *[info.get(field) for field in INDEXED_FIELDS], json.dumps(info)))
+            statement_rows.extend((ticker, statement, encode_statement(stock_data[statement]))
+                                  for statement in self.statements if statement in stock_data)
+        with self._conn:
+            # statements of a replaced stock are deleted with it
+            self._conn.executemany('DELETE FROM stocks WHERE ticker = ?', [(row[0],) for row in stock_rows])
+            self._conn.executemany('INSERT INTO stocks VALUES (?, ?, ?, ?, ?, ?)', stock_rows)
+            self._conn.executemany('INSERT INTO statements VALUES (?, ?, ?)', statement_rows)
+        LOG.debug(f'inserted {len(stock_rows)} stocks into {self.db_path}')
+        return len(stock_rows)
+
+    @staticmethod
+    def _where(
+            sectors: Iterable[str] = None,
+            industries: Iterable[str] = None,
+            countries: Iterable[str] = None,
+            min_market_cap: float = None,
+            max_market_cap: float = None
+    ) -> Tuple[str, List]:
+        clauses, params = [], []
+        for column, values in (('sector', sectors), ('industry', industries), ('country', countries)):
+            if values is not None:
+                values = list(values)
+                clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+        if min_market_cap is not None:
+            clauses.append('market_cap >= ?')
+            params.append(min_market_cap)
+        if max_market_cap is not None:
+            clauses.append('market_cap <= ?')
+            params.append(max_market_cap)
+        return (f"WHERE {' AND '.join(clauses)}" if clauses else ''), params
+
+    def tickers(self, **selection) -> List[str]:
+        """tickers of the selected stocks, see `iter_stocks_data` for the selection"""
+        where, params = self._where(**selection)
+        return [row[0] for row in self._conn.execute(f'SELECT ticker FROM stocks {where} ORDER BY ticker', params)]
+
+    def iter_stocks_data(self, statements: Sequence[str] = None, **selection) -> Iterator[Tuple[str, Dict]]:
+        """iterate the data of the selected stocks, reading only their rows
+
+        :param statements: statements loaded, all statements if not specified
+        :param selection: `sectors`, `industries`, `countries` the stocks are in, `min_market_cap` and
+            `max_market_cap` they are between, all stocks if not specified
+        :return: iterator of (ticker, stock data) by ticker
+        """
+        statements = self.statements if statements is None else tuple(statements)
+        where, params = self._where(**selection)
+        query = (
+            'SELECT stocks.ticker, stocks.info, statements.statement, statements.data '
+            f'FROM (SELECT ticker, info FROM stocks {where}) AS stocks '
+            'LEFT JOIN statements ON statements.ticker = stocks.ticker '
+            f"AND statements.statement IN ({', '.join('?' * len(statements))}) "
+            'ORDER BY stocks.ticker'
+        )
+        ticker, stock_data = None, None
+        for row_ticker, info, statement, blob in self._conn.execute(query, params + list(statements)):
+            if row_ticker != ticker:
+                if ticker is not None:
+                    yield ticker, stock_data
+                ticker, stock_data = row_ticker, json.loads(info)
+            if statement is not None:
+                stock_data[statement] = decode_statement(blob)
+        if ticker is not None:
+            yield ticker, stock_data
+
+    def get(self, ticker: str, statements: Sequence[str] = None) -> Optional[Dict]:
+        """stock data of a ticker, None if it is not in the database
+
+        :param ticker: stock ticker
+        :param statements: statements loaded, all statements if not specified
+        :return:
+        """
+        info_row = self._conn.execute('SELECT info FROM stocks WHERE ticker = ?', (ticker,)).fetchone()
+        if info_row is None:
+            return None
+        stock_data = json.loads(info_row[0])
+        statements = self.statements if statements is None else tuple(statements)
+        for statement, blob in self._conn.execute('SELECT statement, data FROM statements WHERE ticker = ?', (ticker,)):
+            if statement in statements:
+                stock_data[statement] = decode_statement(blob)
+        return stock_data
@@ -1,9 +1,15 @@
 import gzip
+import hashlib
 import json
 import os
 import shutil
 from pathlib import Path
-from typing import Dict, List
+from typing import Any, Dict, Iterator, List, Sequence, TextIO
+
+JSON_DECODER = json.JSONDecoder()
+JSON_WHITESPACE = ' \t\n\r'
+# characters that can follow a json value
+JSON_DELIMITERS = JSON_WHITESPACE + ',:]}'
 
 
 def gzip_file(input_path: Path, output_path: Path = None, keep=True):
@@ -16,15 +22,124 @@ def gzip_file(input_path: Path, output_path: Path = None, keep=True):
 
 
 def read_json_gz_file(input_path: Path, decoder='utf-8'):
-    with gzip.open(input_path, 'rb') as in_f:
-        json_bytes = in_f.read()
-    return json.loads(json_bytes.decode(decoder))
+    with gzip.open(input_path, 'rt', encoding=decoder) as in_f:
+        return json.load(in_f)
+
 
+def write_json_gz_file(data: List[Dict], output_file: Path, compresslevel: int = 6):
+    """encode data straight into the gzip stream of the output file
 
-def write_json_gz_file(data: List[Dict], output_file: Path):
+    :param data: json serializable data
+    :param output_file: path ending with .json.gz
+    :param compresslevel: gzip compression level, from 1 (fastest) to 9 (smallest)
+    """
     if not output_file.name.endswith(".json.gz"):
         raise ValueError('Output file must end with .json.gz')
-    json_file = output_file.parent / output_file.stem
-    with json_file.open('w') as f:
+    temp_file = output_file.parent / f'{output_file.name}.tmp'
+    with gzip.open(temp_file, 'wt', encoding='utf-8', compresslevel=compresslevel) as f:
         json.dump(data, f)
-    gzip_file(json_file, output_file, keep=False)
\ No newline at end of file
+    temp_file.replace(output_file)
+
+
+class _JsonStream:
+    """buffer of a json text stream decoded one value at a time"""
+    def __init__(self, json_file: TextIO, chunk_size: int):
+        self.json_file = json_file
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        # read at least as much as buffered so that decoding a large value is retried a logarithmic number of times
+        chunk = self.json_file.read(max(self.chunk_size, len(self.buffer) - self.pos))
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        self.eof = not chunk
+
+    def peek(self) -> str:
+        """next non whitespace character, empty at the end of the stream"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in JSON_WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer) or self.eof:
+                return self.buffer[self.pos:self.pos + 1]
+            self._fill()
+
+    def expect(self, chars: str) -> str:
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f'expected one of `{chars}` at json stream, got `{char}`')
+        self.pos += 1
+        return char
+
+    def decode(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = JSON_DECODER.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self._fill()
+                continue
+            # a number or literal cut by the end of the buffer, e.g. `1` of `1.5`, is only complete once followed by
+            # a delimiter
+            if (not self.eof and not isinstance(value, (str, list, dict))
+                    and (end == len(self.buffer) or self.buffer[end] not in JSON_DELIMITERS)):
+                self._fill()
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_items(json_file: TextIO, path: Sequence[str] = (), chunk_size: int = 1 << 16) -> Iterator:
+    """decode the items of a json list, or the (key, value) pairs of a json object, one at a time
+
+    :param json_file: json text stream
+    :param path: keys of the nested list or object to iterate, the top level value if empty
+    :param chunk_size: number of characters read at a time
+    :return: iterator of list items or object (key, value) pairs
+    """
+    stream = _JsonStream(json_file, chunk_size)
+    for key in path:
+        stream.expect('{')
+        if stream.peek() == '}':
+            raise KeyError(f'key `{key}` not found in json stream')
+        while True:
+            found = stream.decode() == key
+            stream.expect(':')
+            if found:
+                break
+            # values of other keys are decoded and dropped
+            stream.decode()
+            if stream.expect(',}') == '}':
+                raise KeyError(f'key `{key}` not found in json stream')
+    is_object = stream.expect('[{') == '{'
+    closing = '}' if is_object else ']'
+    if stream.peek() == closing:
+        return
+    while True:
+        if is_object:
+            key = stream.decode()
+            stream.expect(':')
+            yield key, stream.decode()
+        else:
+            yield stream.decode()
+        if stream.expect(',' + closing) == closing:
+            return
+
+
+def iter_json_gz_items(input_path: Path, path: Sequence[str] = (), decoder='utf-8', chunk_size: int = 1 << 16):
+    """decode the items of a list or object in a gzip json file one at a time, see `iter_json_items`"""
+    with gzip.open(input_path, 'rt', encoding=decoder) as in_f:
+        yield from iter_json_items(in_f, path, chunk_size)
+
+
+def folder_manifest_digest(folder_path: Path, pattern: str = '*') -> str:
+    """digest of the names, sizes and modification times of the files matching pattern in a folder"""
+    manifest = hashlib.sha256()
+    for file in sorted(folder_path.glob(pattern)):
+        file_stat = file.stat()
+        manifest.update(f'{file.name}\t{file_stat.st_size}\t{file_stat.st_mtime_ns}\n'.encode())
+    return manifest.hexdigest()
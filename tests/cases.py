@@ -1,3 +1,4 @@
+import asyncio
 import filecmp
 import logging
 from datetime import datetime, timezone
@@ -9,6 +10,16 @@ import json
 from stock_picker.utils.generic_utils import ROOT_PATH
 
 
+def run_coroutine(coroutine):
+    """run a coroutine in a new event loop, as `asyncio.run` of python 3.7"""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+
+
 class TestCaseTimer(unittest.TestCase):
     def setUp(self) -> None:
         self._started_at = datetime.now(timezone.utc)
@@ -0,0 +1,63 @@
+import copy
+import json
+import random
+from typing import Dict
+
+from stock_picker.utils.generic_utils import ROOT_PATH
+
+SCRAPPED_DATA_FOLDER = ROOT_PATH / 'tests' / 'io' / 'out' / 'TestMacrotrendsScrapper'
+STATEMENTS = ('income_statement', 'balance_sheet', 'cash_flow_statement', 'price')
+SECTORS = ('finance', 'oils_energy', 'computer_and_technology', 'medical')
+INDUSTRIES = ('banks', 'oil_and_gas', 'software', 'insurance', 'biotech')
+COUNTRIES = ('usa', 'canada', 'china', 'germany')
+
+
+def load_scrapped_stocks_data() -> Dict:
+    """scrapped stocks data recorded by the scrapper tests"""
+    with (SCRAPPED_DATA_FOLDER / 'test_scrap_multiple_stocks_data_exp.txt').open() as f:
+        stocks_data = json.load(f)
+    with (SCRAPPED_DATA_FOLDER / 'test_scrap_stock_data_exp.txt').open() as f:
+        stocks_data.append(json.load(f))
+    return {f'BRK{idx}': datum for idx, datum in enumerate(stocks_data)}
+
+
+def make_stocks_data(n_stocks: int = 30, seed: int = 0, null_ratio: float = 0.1) -> Dict:
+    """Create stocks data by randomly scaling, shortening and punching holes in the recorded scrapped data
+
+    :param n_stocks: number of stocks
+    :param seed: random seed
+    :param null_ratio: ratio of values replaced by None
+    :return: Dictionary of ticker and stock data
+    """
+    rand = random.Random(seed)
+    templates = list(load_scrapped_stocks_data().values())
+    stocks_data = {}
+    for idx in range(n_stocks):
+        stock_data = copy.deepcopy(templates[idx % len(templates)])
+        # financial statements of a stock share the same years
+        n_fin_years = rand.randint(10, len(stock_data['income_statement']['years']))
+        fin_order = list(range(n_fin_years))
+        rand.shuffle(fin_order)
+        for statement in STATEMENTS:
+            st_data = stock_data[statement]
+            if statement == 'price':
+                order = list(range(rand.randint(10, len(st_data['years']))))
+                rand.shuffle(order)
+            else:
+                order = fin_order
+            for field in st_data:
+                values = [st_data[field][i] for i in order]
+                if field != 'years':
+                    scale = rand.uniform(-0.5, 2)
+                    values = [None if rand.random() < null_ratio else
+                              (val * scale * rand.uniform(0.8, 1.2) if isinstance(val, float) else val)
+                              for val in values]
+                st_data[field] = values
+        stock_data.update({
+            'sector': SECTORS[idx % len(SECTORS)],
+            'industry': rand.choice(INDUSTRIES),
+            'country': rand.choice(COUNTRIES),
+            'market_cap': rand.uniform(10, 10000),
+        })
+        stocks_data[f'TKR{idx}'] = stock_data
+    return stocks_data
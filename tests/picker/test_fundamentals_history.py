@@ -0,0 +1,111 @@
+import copy
+import json
+import tempfile
+from pathlib import Path
+
+from stock_picker.fundamentals_history import FundamentalsHistory, stock_data_to_version, version_to_stock_data
+from tests.cases import TestCaseTimer
+from tests.picker.fixtures import make_stocks_data, STATEMENTS
+
+
+class TestFundamentalsHistory(TestCaseTimer):
+    def setUp(self):
+        super().setUp()
+        self.stock_data = make_stocks_data(1)['TKR0']
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.history = FundamentalsHistory(Path(self.temp_dir.name), checkpoint_interval=3)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+        super().tearDown()
+
+    def exp_stock_data(self, stock_data):
+        return version_to_stock_data(stock_data_to_version(stock_data, STATEMENTS, ('market_cap',)))
+
+    def restated(self, stock_data, field_idx, value):
+        """stock data with the first year of a balance sheet field restated"""
+        stock_data = copy.deepcopy(stock_data)
+        field = [field for field in stock_data['balance_sheet'] if field != 'years'][field_idx]
+        stock_data['balance_sheet'][field][0] = value
+        return stock_data
+
+    def test_record_and_as_of(self):
+        versions = [self.stock_data]
+        for idx in range(1, 6):
+            stock_data = self.restated(versions[-1], idx % 2, float(idx))
+            stock_data['market_cap'] = versions[-1]['market_cap'] * 1.1
+            versions.append(stock_data)
+        for idx, stock_data in enumerate(versions):
+            self.assertTrue(self.history.record('TKR0', stock_data, scraped_at=100. * idx))
+        self.assertFalse(self.history.record('TKR0', copy.deepcopy(versions[-1]), scraped_at=600.))
+        self.assertListEqual(self.history.versions('TKR0'), [100. * idx for idx in range(6)])
+        with self.history.history_path('TKR0').open() as f:
+            entries = [json.loads(line) for line in f]
+        self.assertListEqual([entry['checkpoint'] for entry in entries], [True, False, False, True, False, False])
+        # deltas only keep the restated cell and the market cap
+        self.assertEqual(len(entries[1]['delta']['statements']['balance_sheet']), 1)
+        self.assertListEqual(list(entries[1]['delta']['info']), ['market_cap'])
+
+        self.assertIsNone(self.history.as_of('TKR0', at=-1))
+        self.assertIsNone(self.history.as_of('MISSING'))
+        for idx, stock_data in enumerate(versions):
+            self.assertDictEqual(self.history.as_of('TKR0', at=100. * idx + 50), self.exp_stock_data(stock_data))
+        self.assertDictEqual(self.history.as_of('TKR0'), self.exp_stock_data(versions[-1]))
+        with self.assertRaises(ValueError):
+            self.history.record('TKR0', self.stock_data, scraped_at=10.)
+
+    def test_field_history(self):
+        field = [field for field in self.stock_data['balance_sheet'] if field != 'years'][0]
+        year = self.stock_data['balance_sheet']['years'][0]
+        self.history.record('TKR0', self.stock_data, scraped_at=1.)
+        self.history.record('TKR0', self.restated(self.stock_data, 1, 5.), scraped_at=2.)
+        self.history.record('TKR0', self.restated(self.stock_data, 0, 7.), scraped_at=3.)
+        self.assertListEqual(self.history.field_history('TKR0', 'balance_sheet', year, field),
+                             [(1., self.stock_data['balance_sheet'][field][0]), (3., 7.)])
+
+    def test_removed_cells(self):
+        shortened = copy.deepcopy(self.stock_data)
+        shortened['price'] = {field: values[1:] for field, values in shortened['price'].items()}
+        del shortened['cash_flow_statement']
+        self.history.record('TKR0', self.stock_data, scraped_at=1.)
+        self.history.record('TKR0', shortened, scraped_at=2.)
+        self.assertDictEqual(self.history.as_of('TKR0', at=1.), self.exp_stock_data(self.stock_data))
+        self.assertDictEqual(self.history.as_of('TKR0'), self.exp_stock_data(shortened))
+
+    def test_partial_line(self):
+        self.history.record('TKR0', self.stock_data, scraped_at=1.)
+        with self.history.history_path('TKR0').open('a') as f:
+            f.write('{"scraped_at": 2.0, "checkp')
+        restated = self.restated(self.stock_data, 0, 3.)
+        self.assertTrue(self.history.record('TKR0', restated, scraped_at=3.))
+        self.assertListEqual(self.history.versions('TKR0'), [1., 3.])
+        self.assertDictEqual(self.history.as_of('TKR0'), self.exp_stock_data(restated))
+
+    def test_checkpoint_index(self):
+        versions = [self.stock_data]
+        for idx in range(1, 5):
+            versions.append(self.restated(versions[-1], idx % 2, float(idx)))
+        for idx, stock_data in enumerate(versions):
+            self.history.record('TKR0', stock_data, scraped_at=float(idx))
+        with self.history.checkpoints_path('TKR0').open() as f:
+            checkpoints = [json.loads(line) for line in f]
+        self.assertListEqual([checkpoint['scraped_at'] for checkpoint in checkpoints], [0., 3.])
+        with self.history.history_path('TKR0').open('rb') as f:
+            f.seek(checkpoints[1]['offset'])
+            self.assertEqual(json.loads(f.readline())['scraped_at'], 3.)
+
+        # versions from the nearest checkpoint do not need the entries before it
+        with self.history.history_path('TKR0').open('r+b') as f:
+            f.write(b'#')
+        self.assertDictEqual(self.history.as_of('TKR0', at=4.), self.exp_stock_data(versions[4]))
+        self.assertIsNone(self.history.as_of('TKR0', at=2.))
+
+        # histories without an index are indexed once
+        self.history.checkpoints_path('TKR0').unlink()
+        self.history.history_path('TKR1').write_bytes(self.history.history_path('TKR0').read_bytes()[1:])
+        self.history.history_path('TKR0').unlink()
+        self.assertTrue(self.history.record('TKR1', versions[0], scraped_at=5.))
+        self.assertDictEqual(self.history.as_of('TKR1', at=3.5), self.exp_stock_data(versions[3]))
+        self.assertDictEqual(self.history.as_of('TKR1'), self.exp_stock_data(versions[0]))
+        with self.history.checkpoints_path('TKR1').open() as f:
+            self.assertListEqual([json.loads(line)['scraped_at'] for line in f], [3.])
@@ -0,0 +1,65 @@
+import numpy as np
+
+from stock_picker.group_stats import GroupStats, group_codes
+from stock_picker.picker import Picker
+from tests.cases import TestCaseTimer
+from tests.picker.fixtures import make_stocks_data
+
+
+class TestGroupStats(TestCaseTimer):
+    def test_group_stats(self):
+        rand = np.random.RandomState(0)
+        values = rand.normal(size=(500, 6))
+        values[rand.uniform(size=values.shape) < 0.3] = np.nan
+        values[:, 5] = np.nan
+        codes = rand.randint(-1, 7, size=500)
+        codes[codes == 3] = 4
+        groups = [f'group{code}' for code in range(7)]
+        stats = GroupStats(values, codes, groups, [f'field{col}' for col in range(6)], median=True)
+        for code in range(7):
+            group_values = values[codes == code]
+            count = (~np.isnan(group_values)).sum(axis=0)
+            np.testing.assert_array_equal(stats.count[code], count)
+            for col in range(6):
+                col_values = group_values[:, col][~np.isnan(group_values[:, col])]
+                if not len(col_values):
+                    self.assertTrue(np.isnan([stats.mean[code, col], stats.std[code, col],
+                                              stats.median[code, col]]).all())
+                    continue
+                self.assertAlmostEqual(stats.mean[code, col], np.average(col_values))
+                self.assertAlmostEqual(stats.std[code, col], np.std(col_values))
+                self.assertAlmostEqual(stats.median[code, col], np.median(col_values))
+        self.assertIsNone(stats.report('group3')['field0'])
+        by_row = stats.by_row(codes, 'std')
+        np.testing.assert_array_equal(by_row['field1'][codes == -1], np.nan)
+        np.testing.assert_array_equal(by_row['field1'][codes == 2], stats.std[2, 1])
+        self.assertEqual(len(stats.to_reports()), 7 * 4)
+
+    def test_group_codes(self):
+        codes, groups = group_codes(['a', 'b', 'c', 'd'], {'x': ['c', 'a'], 'y': ['b']})
+        self.assertListEqual(codes.tolist(), [0, 1, 0, -1])
+        self.assertListEqual(groups, ['x', 'y'])
+
+    def test_create_group_stats(self):
+        picker = Picker()
+        for ticker, stock_data in make_stocks_data(40, seed=2).items():
+            picker.add_stock_data(ticker, stock_data)
+        p_and_m_reps = []
+        for ticker in picker.tickers:
+            try:
+                p_and_m_reps.append(picker.generate_period_and_metrics_report(ticker))
+            except TypeError:
+                continue
+        metrics_reports = [rep[1] for rep in p_and_m_reps]
+        stats = picker.create_group_stats(metrics_reports, by='sector')
+        for sector in picker.sectors:
+            sector_reports = [rep for rep in metrics_reports if rep['ticker'] in picker.get_sector_tickers(sector)]
+            exp_avg = Picker.create_group_average_report(sector_reports)
+            avg = stats.report(sector)
+            for field in ('market_cap', 'latest_pe', 'average_ROE_prev_0_4_y',
+                          'average_inventory_current_assets_ratio_prev_0_4_y'):
+                np.testing.assert_allclose(np.nan if avg[field] is None else avg[field],
+                                           np.nan if exp_avg[field] is None else exp_avg[field])
+
+        reports = picker.screen_reports(p_and_m_reps, group_by='sector', solid_liquidity=False, filtering_country=())
+        self.assertTrue(0 < len(reports) < len(p_and_m_reps))
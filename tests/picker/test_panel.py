@@ -0,0 +1,57 @@
+import numpy as np
+
+from stock_picker.picker import Picker
+from tests.cases import TestCaseTimer
+from tests.picker.fixtures import make_stocks_data, STATEMENTS
+
+
+class TestStockPanel(TestCaseTimer):
+    @classmethod
+    def setUpClass(cls):
+        cls.stocks_data = make_stocks_data(12)
+        cls.picker = Picker()
+        for ticker, stock_data in cls.stocks_data.items():
+            cls.picker.add_stock_data(ticker, stock_data)
+
+    def test_statement_arrays_shape(self):
+        panel = self.picker.panel
+        for statement in STATEMENTS:
+            values = panel.values(statement)
+            self.assertEqual(values.dtype, np.float64)
+            self.assertEqual(values.shape[0], len(self.stocks_data))
+            self.assertEqual(values.shape[1], max(len(datum[statement]['years'])
+                                                  for datum in self.stocks_data.values()))
+            self.assertEqual(values.shape[2], len(panel.field_index(statement)))
+
+    def test_get_stock_data_sorted_by_year(self):
+        for ticker, stock_data in self.stocks_data.items():
+            view = self.picker.get_stock_data(ticker)
+            self.assertEqual(view['country'], stock_data['country'])
+            for statement in STATEMENTS:
+                st_data = stock_data[statement]
+                order = sorted(range(len(st_data['years'])), key=lambda i: st_data['years'][i], reverse=True)
+                self.assertSetEqual(set(view[statement].keys()), set(st_data.keys()))
+                for field in ('revenue', 'total_assets', 'net_income_loss', 'average_stock_price'):
+                    if field not in st_data:
+                        continue
+                    exp = [np.nan if st_data[field][i] is None else st_data[field][i] for i in order]
+                    np.testing.assert_array_equal(view[statement][field], exp)
+
+    def test_replace_stock_data(self):
+        picker = Picker()
+        ticker, stock_data = next(iter(self.stocks_data.items()))
+        picker.add_stock_data(ticker, stock_data)
+        picker.add_stock_data('OTHER', make_stocks_data(1, seed=1)['TKR0'])
+        revenue = picker.get_stock_data(ticker)['income_statement']['revenue'].copy()
+        stock_data = dict(stock_data, income_statement=dict(
+            stock_data['income_statement'], revenue=[None] * len(stock_data['income_statement']['years'])))
+        picker.add_stock_data(ticker, stock_data)
+        self.assertEqual(len(picker.panel), 2)
+        self.assertTrue(np.isnan(picker.get_stock_data(ticker)['income_statement']['revenue']).all())
+        self.assertFalse(np.isnan(revenue).all())
+
+    def test_missing_statement(self):
+        stock_data = dict(next(iter(self.stocks_data.values())))
+        stock_data.pop('price')
+        with self.assertRaises(ValueError):
+            Picker().add_stock_data('TKR', stock_data)
@@ -0,0 +1,93 @@
+import numpy as np
+
+from stock_picker.picker import Picker, batch_flipped_linear_corrcoef
+from tests.cases import TestCaseTimer
+from tests.picker.fixtures import make_stocks_data
+
+
+def none_to_nan(values):
+    return np.array([np.nan if val is None else val for val in values], dtype=np.float64)
+
+
+class TestPicker(TestCaseTimer):
+    @classmethod
+    def setUpClass(cls):
+        cls.stocks_data = make_stocks_data(40, null_ratio=0.2)
+        cls.tickers = list(cls.stocks_data.keys())
+        cls.picker = Picker()
+        for ticker, stock_data in cls.stocks_data.items():
+            cls.picker.add_stock_data(ticker, stock_data)
+
+    def test_create_batch_report_by_period(self):
+        batch_report = self.picker.create_batch_report_by_period(self.tickers)
+        for statement, schema in self.picker.report_by_period_schema.items():
+            reports = [self.picker.create_report_by_period(self.picker.get_stock_data(tkr)[statement], schema)
+                       for tkr in self.tickers]
+            for field in reports[0]:
+                np.testing.assert_allclose(batch_report[field], none_to_nan([rep[field] for rep in reports]))
+
+    def test_create_batch_report_by_period_custom_schema(self):
+        schema = {'income_statement': {
+            'revenue': {'periods': [(0, 3), (12, 20)], 'functions': [np.median, np.std, max]},
+            'unknown_field': None
+        }}
+        batch_report = self.picker.create_batch_report_by_period(self.tickers[:5], schema)
+        self.assertListEqual(list(batch_report.keys()), [
+            'median_revenue_prev_0_3_y', 'std_revenue_prev_0_3_y', 'max_revenue_prev_0_3_y',
+            'median_revenue_prev_12_20_y', 'std_revenue_prev_12_20_y', 'max_revenue_prev_12_20_y',
+            'average_unknown_field_prev_0_4_y'
+        ])
+        np.testing.assert_allclose(batch_report['max_revenue_prev_0_3_y'], [
+            max(val for val in self.picker.get_stock_data(tkr)['income_statement']['revenue'][:3] if val == val)
+            for tkr in self.tickers[:5]
+        ])
+        self.assertTrue(np.isnan(batch_report['average_unknown_field_prev_0_4_y']).all())
+
+    def test_batch_flipped_linear_corrcoef(self):
+        rand = np.random.RandomState(0)
+        matrix = rand.normal(size=(200, 15))
+        matrix[rand.uniform(size=matrix.shape) < 0.3] = np.nan
+        matrix[0] = 1.
+        batch_corr = batch_flipped_linear_corrcoef(matrix, 5)
+        for row, corr in zip(matrix, batch_corr):
+            points = [val for val in row if not np.isnan(val)]
+            if len(points) < 5:
+                self.assertTrue(np.isnan(corr))
+            elif np.std(points[:5]) == 0:
+                self.assertTrue(np.isnan(corr))
+            else:
+                self.assertAlmostEqual(corr, np.corrcoef(np.flip(points[:5]), range(5))[0, 1])
+
+    def test_create_batch_trend_report(self):
+        trend_report = self.picker.create_batch_trend_report(self.tickers)
+        compared = 0
+        for idx, ticker in enumerate(self.tickers):
+            try:
+                period_report = self.picker.generate_period_and_metrics_report(ticker)[0]
+            except TypeError:
+                continue
+            compared += 1
+            for field in trend_report:
+                exp = np.nan if period_report[field] is None else period_report[field]
+                np.testing.assert_allclose(trend_report[field][idx], exp, err_msg=f'{ticker} {field}')
+        self.assertGreater(compared, 0)
+        self.assertSetEqual({field for field in period_report if field.startswith('corr_coef')},
+                            set(trend_report.keys()))
+
+    def test_create_batch_period_reports(self):
+        compared = 0
+        for ticker, period_reps in zip(self.tickers, self.picker.create_batch_period_reports(self.tickers)):
+            try:
+                exp_period_report = self.picker.generate_period_and_metrics_report(ticker)[0]
+            except TypeError:
+                continue
+            compared += 1
+            period_report = self.picker.generate_period_and_metrics_report(ticker, period_reps)[0]
+            self.assertListEqual(list(period_report.keys()), list(exp_period_report.keys()))
+            for field, exp in exp_period_report.items():
+                if isinstance(exp, str):
+                    self.assertEqual(period_report[field], exp)
+                    continue
+                np.testing.assert_allclose(none_to_nan([period_report[field]]), none_to_nan([exp]),
+                                           err_msg=f'{ticker} {field}')
+        self.assertGreater(compared, 0)
@@ -0,0 +1,150 @@
+import json
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from stock_picker.picker import Picker
+from tests.cases import TestCaseTimer
+from tests.picker.fixtures import make_stocks_data, STATEMENTS
+
+
+class TestPickerLoading(TestCaseTimer):
+    @classmethod
+    def setUpClass(cls):
+        cls.stocks_data = make_stocks_data(20)
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.stocks_folder = Path(cls.temp_dir.name) / 'stocks_data'
+        cls.stocks_folder.mkdir()
+        for ticker, stock_data in cls.stocks_data.items():
+            with (cls.stocks_folder / f'{ticker}.json').open('w') as f:
+                json.dump(stock_data, f)
+        (cls.stocks_folder / 'BROKEN.json').write_text('{"income_statement": ')
+        (cls.stocks_folder / 'NO_PRICE.json').write_text(json.dumps({'income_statement': {'years': []}}))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.temp_dir.cleanup()
+
+    def assertPickerEqual(self, picker: Picker, exp_picker: Picker):
+        self.assertListEqual(sorted(picker.tickers), sorted(exp_picker.tickers))
+        self.assertDictEqual({sector: sorted(picker.get_sector_tickers(sector)) for sector in picker.sectors},
+                             {sector: sorted(exp_picker.get_sector_tickers(sector)) for sector in exp_picker.sectors})
+        for ticker in exp_picker.tickers:
+            stock_data, exp_stock_data = picker.get_stock_data(ticker), exp_picker.get_stock_data(ticker)
+            self.assertEqual(stock_data['market_cap'], exp_stock_data['market_cap'])
+            for statement in STATEMENTS:
+                self.assertSetEqual(set(stock_data[statement].keys()), set(exp_stock_data[statement].keys()))
+                for field in exp_stock_data[statement]:
+                    np.testing.assert_array_equal(stock_data[statement][field], exp_stock_data[statement][field])
+
+    def test_discover_stocks_data_from_folder(self):
+        exp_picker = Picker()
+        for ticker, stock_data in self.stocks_data.items():
+            exp_picker.add_stock_data(ticker, stock_data)
+        for use_processes in (False, True):
+            picker = Picker()
+            with self.assertLogs('Picker', 'ERROR') as logs:
+                picker.discover_stocks_data_from_folder(self.stocks_folder, workers=2, use_processes=use_processes)
+            self.assertEqual(len(logs.records), 2)
+            self.assertPickerEqual(picker, exp_picker)
+
+    def test_discover_stocks_data_with_snapshot(self):
+        snapshot_path = Path(self.temp_dir.name) / 'stocks_data.panel'
+        exp_picker = Picker()
+        exp_picker.discover_stocks_data_from_folder(self.stocks_folder, snapshot_path=snapshot_path)
+        self.assertTrue(snapshot_path.exists())
+
+        picker = Picker()
+        with self.assertLogs('Picker', 'INFO') as logs:
+            picker.discover_stocks_data_from_folder(self.stocks_folder, snapshot_path=snapshot_path)
+        self.assertIn('loaded snapshot', logs.output[0])
+        self.assertPickerEqual(picker, exp_picker)
+        self.assertEqual(picker.get_stock_data('TKR1')['description'], self.stocks_data['TKR1']['description'])
+
+        new_file = self.stocks_folder / 'NEW.json'
+        with new_file.open('w') as f:
+            json.dump(self.stocks_data['TKR0'], f)
+        try:
+            picker = Picker()
+            picker.discover_stocks_data_from_folder(self.stocks_folder, snapshot_path=snapshot_path)
+            self.assertIn('NEW', picker.tickers)
+        finally:
+            new_file.unlink()
+
+        # a truncated snapshot of a killed run is reloaded from the files
+        Picker().discover_stocks_data_from_folder(self.stocks_folder, snapshot_path=snapshot_path)
+        with snapshot_path.open('r+b') as f:
+            f.truncate(snapshot_path.stat().st_size // 2)
+        try:
+            picker = Picker()
+            with self.assertLogs('Picker', 'ERROR') as logs:
+                picker.discover_stocks_data_from_folder(self.stocks_folder, snapshot_path=snapshot_path)
+            self.assertIn('fail to load snapshot', logs.output[0])
+            self.assertPickerEqual(picker, exp_picker)
+            self.assertListEqual([path.name for path in snapshot_path.parent.glob(f'{snapshot_path.name}*')],
+                                 [snapshot_path.name])
+            Picker().load_snapshot(snapshot_path)
+        finally:
+            snapshot_path.unlink()
+
+    def test_index_stocks_data_from_folder(self):
+        index_path = Path(self.temp_dir.name) / 'stocks_data.index.json'
+        exp_picker = Picker()
+        exp_picker.discover_stocks_data_from_folder(self.stocks_folder)
+        picker = Picker(lazy_cache_size=3)
+        with self.assertLogs('Picker', 'ERROR') as logs:
+            picker.index_stocks_data_from_folder(self.stocks_folder, index_path=index_path, workers=2)
+        self.assertEqual(len(logs.records), 2)
+        try:
+            self.assertTrue(picker.lazy)
+            self.assertEqual(len(picker._lazy_cache), 0)
+            self.assertPickerEqual(picker, exp_picker)
+            self.assertEqual(len(picker._lazy_cache), 3)
+            self.assertEqual(picker.stock_data_digest('TKR1'), exp_picker.stock_data_digest('TKR1'))
+            self.assertEqual(picker.get_stock_data('TKR1')['description'], self.stocks_data['TKR1']['description'])
+
+            tickers = sorted(exp_picker.tickers)
+            report = picker.create_batch_report_by_period(tickers)
+            exp_report = exp_picker.create_batch_report_by_period(tickers)
+            for field in exp_report:
+                np.testing.assert_array_equal(report[field], exp_report[field])
+            trend_report = picker.create_batch_trend_report(tickers)
+            for field, values in exp_picker.create_batch_trend_report(tickers).items():
+                np.testing.assert_array_equal(trend_report[field], values)
+            # reported stocks are not kept past the cache
+            self.assertEqual(len(picker.panel), 0)
+            self.assertEqual(len(picker._lazy_cache), 3)
+            self.assertListEqual(sorted(picker.tickers), sorted(exp_picker.tickers))
+
+            picker = Picker()
+            with self.assertLogs('Picker', 'INFO') as logs:
+                picker.index_stocks_data_from_folder(self.stocks_folder, index_path=index_path)
+            self.assertIn('loaded index', logs.output[0])
+            self.assertPickerEqual(picker, exp_picker)
+        finally:
+            index_path.unlink()
+
+    def test_from_snapshot_mmap(self):
+        snapshot_path = Path(self.temp_dir.name) / 'shared.panel'
+        exp_picker = Picker()
+        exp_picker.discover_stocks_data_from_folder(self.stocks_folder, snapshot_path=snapshot_path)
+        try:
+            picker = Picker.from_snapshot(snapshot_path)
+            values = picker.panel.values('income_statement')
+            self.assertFalse(values.flags.writeable)
+            self.assertIsInstance(values.base, np.memmap)
+            self.assertPickerEqual(picker, exp_picker)
+            tickers = sorted(exp_picker.tickers)
+            self.assertListEqual(picker.generate_period_and_metrics_reports(tickers),
+                                 exp_picker.generate_period_and_metrics_reports(tickers))
+            # saving over the mapped snapshot replaces the file, the mapped arrays keep the old one
+            picker.save_snapshot(snapshot_path)
+            self.assertPickerEqual(picker, exp_picker)
+            self.assertPickerEqual(Picker.from_snapshot(snapshot_path), exp_picker)
+            # added stocks are merged into arrays in memory
+            picker.add_stock_data('NEW', self.stocks_data['TKR0'])
+            self.assertTrue(picker.panel.values('income_statement').flags.writeable)
+            self.assertIn('NEW', picker.tickers)
+        finally:
+            snapshot_path.unlink()
@@ -0,0 +1,79 @@
+import json
+import multiprocessing
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from stock_picker.picker import Picker
+from stock_picker.picker_runner import create_all_groups_reports, create_group_reports
+from tests.cases import TestCaseTimer
+from tests.picker.fixtures import make_stocks_data
+
+
+def exit_worker_of_finance(group_by: str, group: str, *args):
+    # a worker killed while reporting the finance sector, e.g. out of memory
+    if group == 'finance':
+        os._exit(1)
+    return create_group_reports(group_by, group, *args)
+
+
+class TestPickerRunner(TestCaseTimer):
+    def test_create_all_groups_reports(self):
+        picker = Picker()
+        for ticker, stock_data in make_stocks_data(30, null_ratio=0).items():
+            picker.add_stock_data(ticker, stock_data)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            out_folder, cache_folder = Path(tmp_dir) / 'reports', Path(tmp_dir) / 'cache'
+            create_all_groups_reports(picker, out_folder, industries=picker.industries[:1], workers=2,
+                                      cache_folder=cache_folder, outlier_group_by='industry')
+            for sector in picker.sectors:
+                self.assertTrue((out_folder / f'sector_{sector}_metrics_unfiltered.csv').exists())
+                self.assertTrue((cache_folder / f'sector_{sector}.json').exists())
+            stats_paths = list(out_folder.glob('sector_*_metrics_group_stats.csv'))
+            self.assertGreater(len(stats_paths), 0)
+            with stats_paths[0].open() as f:
+                self.assertTrue(f.readline().startswith('industry,statistic,'))
+            self.assertTrue((out_folder / f'industry_{picker.industries[0]}_period_unfiltered.csv').exists())
+
+    def test_create_all_groups_reports_lazy(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            stocks_folder, out_folder = Path(tmp_dir) / 'stocks_data', Path(tmp_dir) / 'reports'
+            stocks_folder.mkdir()
+            for ticker, stock_data in make_stocks_data(12, null_ratio=0).items():
+                with (stocks_folder / f'{ticker}.json').open('w') as f:
+                    json.dump(stock_data, f)
+            picker = Picker()
+            picker.index_stocks_data_from_folder(stocks_folder)
+            # workers receive the lazy picker where fork is not available
+            with mock.patch('multiprocessing.get_all_start_methods', return_value=['spawn']):
+                create_all_groups_reports(picker, out_folder, workers=2)
+            for sector in picker.sectors:
+                self.assertTrue((out_folder / f'sector_{sector}_metrics_unfiltered.csv').exists())
+
+    def test_create_all_groups_reports_from_snapshot(self):
+        picker = Picker()
+        for ticker, stock_data in make_stocks_data(12, null_ratio=0).items():
+            picker.add_stock_data(ticker, stock_data)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            snapshot_path, out_folder = Path(tmp_dir) / 'stocks_data.panel', Path(tmp_dir) / 'reports'
+            picker.save_snapshot(snapshot_path)
+            # workers map the snapshot where fork is not available
+            with mock.patch('multiprocessing.get_all_start_methods', return_value=['spawn']):
+                create_all_groups_reports(picker, out_folder, workers=2, picker_snapshot_path=snapshot_path)
+            for sector in picker.sectors:
+                self.assertTrue((out_folder / f'sector_{sector}_metrics_unfiltered.csv').exists())
+
+    @unittest.skipUnless('fork' in multiprocessing.get_all_start_methods(), 'workers inherit the patched module by fork')
+    def test_create_all_groups_reports_dead_worker(self):
+        picker = Picker()
+        for ticker, stock_data in make_stocks_data(12, null_ratio=0).items():
+            picker.add_stock_data(ticker, stock_data)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            out_folder = Path(tmp_dir) / 'reports'
+            with mock.patch('stock_picker.picker_runner.create_group_reports', exit_worker_of_finance), \
+                    self.assertLogs('PickerRunner', level='ERROR') as cm:
+                create_all_groups_reports(picker, out_folder, workers=2, group_timeout=2)
+            self.assertTrue(any('sector finance' in line for line in cm.output))
+            self.assertFalse((out_folder / 'sector_finance_metrics_unfiltered.csv').exists())
@@ -0,0 +1,63 @@
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from stock_picker.picker import Picker
+from stock_picker.report_cache import ReportCache
+from tests.cases import TestCaseTimer
+from tests.picker.fixtures import make_stocks_data
+
+
+class TestReportCache(TestCaseTimer):
+    def setUp(self):
+        super().setUp()
+        self.stocks_data = make_stocks_data(10, null_ratio=0)
+        self.tickers = list(self.stocks_data.keys())
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_path = Path(self.temp_dir.name) / 'reports_cache.json'
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+        super().tearDown()
+
+    def create_picker(self) -> Picker:
+        picker = Picker()
+        for ticker, stock_data in self.stocks_data.items():
+            picker.add_stock_data(ticker, stock_data)
+        return picker
+
+    def generate_reports(self, picker: Picker):
+        with mock.patch.object(picker, 'generate_period_and_metrics_report',
+                               wraps=picker.generate_period_and_metrics_report) as generate:
+            reports = picker.generate_period_and_metrics_reports(self.tickers, ReportCache(self.cache_path))
+        return reports, [args[0] for args, _ in generate.call_args_list]
+
+    def test_regenerate_changed_tickers_only(self):
+        exp_reports, generated = self.generate_reports(self.create_picker())
+        self.assertListEqual(generated, self.tickers)
+
+        reports, generated = self.generate_reports(self.create_picker())
+        self.assertListEqual(generated, [])
+        for (period_rep, metrics_rep), (exp_period_rep, exp_metrics_rep) in zip(reports, exp_reports):
+            self.assertListEqual(list(metrics_rep.keys()), list(exp_metrics_rep.keys()))
+            np.testing.assert_equal(list(period_rep.values()), list(exp_period_rep.values()))
+
+        # refreshing unchanged pages keeps the reports
+        self.stocks_data['TKR1']['refreshed_at'] = {'income-statement': 1.}
+        _, generated = self.generate_reports(self.create_picker())
+        self.assertListEqual(generated, [])
+
+        self.stocks_data['TKR3']['income_statement']['revenue'][0] += 1
+        self.stocks_data['TKR5']['market_cap'] += 1
+        _, generated = self.generate_reports(self.create_picker())
+        self.assertListEqual(generated, ['TKR3', 'TKR5'])
+
+    def test_regenerate_on_schema_change(self):
+        self.generate_reports(self.create_picker())
+        picker = self.create_picker()
+        picker.report_by_period_schema['income_statement']['revenue']['periods'].append((10, 14))
+        reports, generated = self.generate_reports(picker)
+        self.assertListEqual(generated, self.tickers)
+        self.assertIn('average_revenue_prev_10_14_y', reports[0][0])
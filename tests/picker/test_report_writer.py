@@ -0,0 +1,74 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from stock_picker.picker import Picker
+from stock_picker.report_writer import REPORT_WRITERS, get_report_writer, pyarrow
+from tests.cases import TestCaseTimer
+from tests.picker.fixtures import make_stocks_data
+
+
+class TestReportWriter(TestCaseTimer):
+    @classmethod
+    def setUpClass(cls):
+        picker = Picker()
+        for ticker, stock_data in make_stocks_data(20, null_ratio=0.1).items():
+            picker.add_stock_data(ticker, stock_data)
+        cls.reports = [rep[1] for rep in picker.generate_period_and_metrics_reports(picker.tickers)]
+        cls.reports[0]['warnings'] = ['strong downward trend of eps in last 5yrs']
+        for rep in cls.reports[1:]:
+            rep['warnings'] = []
+        cls.fields = list(cls.reports[0].keys())
+
+    def write_and_read(self, fmt: str):
+        writer = get_report_writer(fmt)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = Path(tmp_dir) / f'metrics{writer.extension}'
+            Picker.write_reports(file_path, self.fields, self.reports, fmt)
+            return {field: np.array(values) for field, values in writer.read(file_path).items()}
+
+    def assert_columns(self, columns):
+        self.assertListEqual(list(columns.keys()), self.fields)
+        self.assertListEqual(columns['ticker'].tolist(), [rep['ticker'] for rep in self.reports])
+        exp_pe = np.array([np.nan if rep['latest_pe'] is None else rep['latest_pe'] for rep in self.reports])
+        self.assertEqual(columns['latest_pe'].dtype, np.float64)
+        np.testing.assert_array_equal(columns['latest_pe'], exp_pe)
+        self.assertEqual(columns['warnings'][0], '["strong downward trend of eps in last 5yrs"]')
+
+    def test_csv(self):
+        columns = self.write_and_read('csv')
+        self.assertListEqual(columns['ticker'].tolist(), [rep['ticker'] for rep in self.reports])
+        self.assertEqual(len(columns['latest_pe']), len(self.reports))
+
+    def test_npy(self):
+        self.assert_columns(self.write_and_read('npy'))
+
+    def test_npy_rewrite(self):
+        writer = get_report_writer('npy')
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = Path(tmp_dir) / f'metrics{writer.extension}'
+            writer.write(file_path, self.fields, self.reports)
+            writer.write(file_path, self.fields[:2], self.reports[:3])
+            columns = writer.read(file_path)
+            self.assertListEqual(list(columns), self.fields[:2])
+            self.assertEqual(len(columns['ticker']), 3)
+            # no columns of the previous report nor folders of the write are left
+            self.assertEqual(len(list(file_path.glob('*.npy'))), 2)
+            self.assertListEqual([path.name for path in Path(tmp_dir).iterdir()], [file_path.name])
+
+    @unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_arrow(self):
+        self.assert_columns(self.write_and_read('arrow'))
+        self.assert_columns(self.write_and_read('parquet'))
+
+    @unittest.skipIf(pyarrow is not None, 'pyarrow is installed')
+    def test_arrow_not_installed(self):
+        self.assertListEqual(list(REPORT_WRITERS), ['csv', 'npy'])
+        with self.assertRaises(ValueError):
+            get_report_writer('parquet')
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            get_report_writer('xlsx')
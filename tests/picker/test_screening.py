@@ -0,0 +1,59 @@
+import numpy as np
+
+from stock_picker.picker import Picker
+from stock_picker.screening import (
+    DEFAULT_FILTER_WARNING_RULES, broken_rules, default_filter_masks, outlier_filter_masks, reports_to_columns, screen
+)
+from tests.cases import TestCaseTimer
+from tests.picker.fixtures import make_stocks_data
+
+
+class TestScreening(TestCaseTimer):
+    @classmethod
+    def setUpClass(cls):
+        cls.picker = Picker()
+        for ticker, stock_data in make_stocks_data(60, seed=3, null_ratio=0.05).items():
+            cls.picker.add_stock_data(ticker, stock_data)
+        cls.p_and_m_reps = []
+        for ticker in cls.picker.tickers:
+            try:
+                cls.p_and_m_reps.append(cls.picker.generate_period_and_metrics_report(ticker))
+            except TypeError:
+                continue
+        cls.period_columns = reports_to_columns([rep[0] for rep in cls.p_and_m_reps])
+        cls.metrics_columns = reports_to_columns([rep[1] for rep in cls.p_and_m_reps])
+
+    def test_reports_to_columns(self):
+        self.assertEqual(self.metrics_columns['country'].dtype, object)
+        self.assertEqual(self.metrics_columns['latest_pe'].dtype, np.float64)
+        self.assertEqual(len(self.metrics_columns['latest_pe']), len(self.p_and_m_reps))
+
+    def test_default_filter_masks(self):
+        n_passed = 0
+        for kwargs in ({}, {'market_cap': 5000, 'filtering_country': ('usa',), 'solid_liquidity': False},
+                       {'null_data_ratio': 0.2, 'solid_liquidity': False}):
+            passed, bitmap, rules = screen(
+                default_filter_masks(self.period_columns, self.metrics_columns, **kwargs), DEFAULT_FILTER_WARNING_RULES)
+            exp_passed = [Picker.default_filter(*rep, **kwargs) for rep in self.p_and_m_reps]
+            self.assertListEqual(passed.tolist(), exp_passed)
+            n_passed += sum(exp_passed)
+            for rep, rep_passed, value in zip(self.p_and_m_reps, passed, bitmap):
+                self.assertEqual(rep_passed, not set(broken_rules(value, rules)) - set(DEFAULT_FILTER_WARNING_RULES))
+            self.assertEqual(bitmap.dtype, np.uint8)
+        self.assertGreater(n_passed, 0)
+
+    def test_outlier_filter_masks(self):
+        metrics_reports = [rep[1] for rep in self.p_and_m_reps]
+        group_avg = {field: val if val is not None else 0
+                     for field, val in Picker.create_group_average_report(metrics_reports).items()}
+        group_std = {field: val if val is not None else 0
+                     for field, val in Picker.create_group_std_report(metrics_reports).items()}
+        passed, bitmap, rules = screen(outlier_filter_masks(self.metrics_columns, group_avg, group_std))
+        exp_passed = [Picker.outlier_filter(rep, group_avg, group_std) for rep in metrics_reports]
+        self.assertListEqual(passed.tolist(), exp_passed)
+        self.assertTrue(0 < sum(exp_passed) < len(exp_passed))
+
+    def test_screen_reports(self):
+        reports = self.picker.screen_reports(self.p_and_m_reps, solid_liquidity=False)
+        self.assertTrue(0 < len(reports) < len(self.p_and_m_reps))
+        self.assertTrue(all('warnings' in rep[1] for rep in reports))
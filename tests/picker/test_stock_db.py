@@ -0,0 +1,70 @@
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from stock_picker.picker import Picker
+from stock_picker.stock_db import StockDatabase
+from tests.cases import TestCaseTimer
+from tests.picker.fixtures import make_stocks_data, STATEMENTS
+
+
+class TestStockDatabase(TestCaseTimer):
+    def setUp(self):
+        super().setUp()
+        self.stocks_data = make_stocks_data(20)
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db = StockDatabase(Path(self.temp_dir.name) / 'stocks_data.db')
+        self.db.bulk_insert(self.stocks_data.items())
+
+    def tearDown(self):
+        self.db.close()
+        self.temp_dir.cleanup()
+        super().tearDown()
+
+    def test_bulk_insert_and_get(self):
+        self.assertEqual(len(self.db), 20)
+        self.assertIn('TKR1', self.db)
+        self.assertDictEqual(self.db.get('TKR1'), self.stocks_data['TKR1'])
+        self.assertIsNone(self.db.get('MISSING'))
+        replaced = dict(self.stocks_data['TKR2'], sector='replaced')
+        del replaced['price']
+        self.db.bulk_insert([('TKR1', replaced)])
+        self.assertEqual(len(self.db), 20)
+        self.assertDictEqual(self.db.get('TKR1'), replaced)
+        # the last data of a ticker repeated in a batch is kept
+        self.assertEqual(self.db.bulk_insert([('TKR1', self.stocks_data['TKR1']), ('NEW', replaced),
+                                              ('TKR1', replaced), ('NEW', self.stocks_data['TKR2'])]), 2)
+        self.assertDictEqual(self.db.get('TKR1'), replaced)
+        self.assertDictEqual(self.db.get('NEW'), self.stocks_data['TKR2'])
+        self.assertDictEqual(self.db.get('TKR3', statements=['price']),
+                             {field: val for field, val in self.stocks_data['TKR3'].items()
+                              if field not in STATEMENTS or field == 'price'})
+
+    def test_selection(self):
+        sector = self.stocks_data['TKR0']['sector']
+        country = self.stocks_data['TKR0']['country']
+        exp_tickers = sorted(ticker for ticker, stock_data in self.stocks_data.items()
+                             if stock_data['sector'] == sector and stock_data['country'] == country)
+        self.assertListEqual(self.db.tickers(sectors=[sector], countries=[country]), exp_tickers)
+        market_caps = sorted(stock_data['market_cap'] for stock_data in self.stocks_data.values())
+        self.assertEqual(len(self.db.tickers(min_market_cap=market_caps[5], max_market_cap=market_caps[14])), 10)
+        self.assertListEqual(self.db.tickers(industries=[]), [])
+        selected = dict(self.db.iter_stocks_data(sectors=[sector], countries=[country]))
+        self.assertDictEqual(selected, {ticker: self.stocks_data[ticker] for ticker in exp_tickers})
+
+    def test_discover_stocks_data_from_database(self):
+        sector = self.stocks_data['TKR0']['sector']
+        picker = Picker()
+        picker.discover_stocks_data_from_database(self.db, sectors=[sector])
+        exp_picker = Picker()
+        for ticker, stock_data in self.stocks_data.items():
+            if stock_data['sector'] == sector:
+                exp_picker.add_stock_data(ticker, stock_data)
+        self.assertListEqual(sorted(picker.tickers), sorted(exp_picker.tickers))
+        self.assertListEqual(picker.sectors, [sector])
+        report = picker.create_batch_report_by_period(picker.tickers)
+        exp_report = exp_picker.create_batch_report_by_period(picker.tickers)
+        self.assertListEqual(list(report), list(exp_report))
+        for field in exp_report:
+            np.testing.assert_array_equal(report[field], exp_report[field])
@@ -0,0 +1,128 @@
+"""Benchmark of `Scrapper.scrap_multiple_stocks` against the local macrotrends stand-in
+
+The stand-in server runs in its own process so that the cpu time measured is the scrapper's, including its parsing
+processes. Page latency is measured around each request attempt, waiting for the rate limiter included.
+
+example:
+    python -m tests.scrapper.benchmark_scrapper --stocks 200 --limits 5 10 25 50 --latency 0.05
+"""
+import argparse
+import logging
+import multiprocessing
+import resource
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from stock_picker.scrapper.macrotrends.scrapper import Scrapper
+from stock_picker.scrapper.rate_limit import HostRateLimiter, RetryPolicy
+from tests.scrapper.standin_server import StandInServer
+
+
+class TimedScrapper(Scrapper):
+    """scrapper recording the latency of every page request attempt"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = []
+
+    async def _async_fetch_once(self, *args, **kwargs) -> str:
+        started_at = time.perf_counter()
+        try:
+            return await super()._async_fetch_once(*args, **kwargs)
+        finally:
+            self.latencies.append(time.perf_counter() - started_at)
+
+
+def run_server(conn, server_kwargs: Dict):
+    server = StandInServer(**server_kwargs)
+    server.start()
+    server.started.wait()
+    conn.send(server.base_url)
+    conn.recv()
+    server.stop()
+    conn.send(server.status_counts)
+
+
+def percentile(values: List[float], q: int) -> float:
+    return float(np.percentile(values, q))
+
+
+def cpu_seconds() -> float:
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+def benchmark(base_url: str, n_stocks: int, limit: int, rate: float, parse_workers: int, max_attempts: int) -> Dict:
+    """scrap n stocks from the stand-in with a concurrency limit
+
+    :return: pages/sec, p50 and p99 page latency in ms, cpu ms per page and number of failed stocks
+    """
+    urls = [f'{base_url}/stocks/charts/T{i}/name' for i in range(n_stocks)]
+    scrapper = TimedScrapper(
+        main_page_url=base_url,
+        parse_workers=parse_workers,
+        rate_limiter=HostRateLimiter(concurrency=limit * 4, max_concurrency=limit * 4, rate=rate, max_rate=rate,
+                                     burst=rate),
+        retry_policy=RetryPolicy(max_attempts=max_attempts, base_delay=0.05, max_delay=1)
+    )
+    cpu_started_at = cpu_seconds()
+    started_at = time.perf_counter()
+    try:
+        scrapped = scrapper.scrap_multiple_stocks(urls, limit=limit)
+        elapsed = time.perf_counter() - started_at
+    finally:
+        # parsing processes count in the cpu time once joined
+        scrapper.close()
+    cpu = cpu_seconds() - cpu_started_at
+    n_failed = sum(isinstance(stock_data, Exception) for stock_data in scrapped)
+    n_pages = (n_stocks - n_failed) * len(scrapper.all_endpoints)
+    return {
+        'limit': limit,
+        'pages/s': n_pages / elapsed,
+        'p50 ms': percentile(scrapper.latencies, 50) * 1000,
+        'p99 ms': percentile(scrapper.latencies, 99) * 1000,
+        'cpu ms/page': cpu / max(n_pages, 1) * 1000,
+        'failed': n_failed
+    }
+
+
+def generate_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='Benchmark scrapping multiple stocks from the macrotrends stand-in')
+    parser.add_argument('-n', '--stocks', type=int, default=200, help='number of stocks scrapped per run')
+    parser.add_argument('-l', '--limits', type=int, nargs='+', default=[5, 10, 25, 50],
+                        help='number of stocks scrapped concurrently of each run')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds before a stand-in response')
+    parser.add_argument('--latency-jitter', type=float, default=0.02, help='max random seconds added to latency')
+    parser.add_argument('--error-rate', type=float, default=0, help='fraction of stand-in responses failing with 503')
+    parser.add_argument('--max-rate', type=float, help='requests per second above which the stand-in throttles')
+    parser.add_argument('--rate', type=float, default=1000, help='requests per second of the scrapper rate limiter')
+    parser.add_argument('--parse-workers', type=int, default=0,
+                        help='number of parsing processes, 0 to parse in the event loop (default 0)')
+    parser.add_argument('--max-attempts', type=int, default=5, help='attempts of a page request')
+    return parser
+
+
+if __name__ == '__main__':
+    args = generate_parser().parse_args()
+    # retries show in the stand-in responses by status rather than in the log
+    logging.getLogger('scrapper').setLevel(logging.ERROR)
+    server_kwargs = {'latency': args.latency, 'latency_jitter': args.latency_jitter, 'error_rate': args.error_rate,
+                     'max_rate': args.max_rate, 'retry_after': 1 if args.max_rate else None}
+    conn, server_conn = multiprocessing.Pipe()
+    server_process = multiprocessing.Process(target=run_server, args=(server_conn, server_kwargs), daemon=True)
+    server_process.start()
+    try:
+        standin_url = conn.recv()
+        results = [benchmark(standin_url, args.stocks, limit, args.rate, args.parse_workers, args.max_attempts)
+                   for limit in args.limits]
+    finally:
+        conn.send('stop')
+        status_counts = conn.recv()
+        server_process.join()
+    columns = list(results[0])
+    print(' '.join(f'{column:>12}' for column in columns))
+    for result in results:
+        print(' '.join(f'{result[column]:>12.1f}' if isinstance(result[column], float) else f'{result[column]:>12}'
+                       for column in columns))
+    print(f'stand-in responses by status: {dict(status_counts)}')
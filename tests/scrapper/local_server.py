@@ -0,0 +1,101 @@
+import asyncio
+import threading
+
+from aiohttp import web
+
+from tests.scrapper.pages import financial_aspect_page, industry_listing_page, price_page, research_page
+
+
+class _Serve:
+    """async context manager of `serve`, as `contextlib.asynccontextmanager` needs python 3.7"""
+    def __init__(self, app: web.Application):
+        self.runner = web.AppRunner(app)
+
+    async def __aenter__(self) -> str:
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        return f'http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}'
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.runner.cleanup()
+
+
+def serve(app: web.Application) -> _Serve:
+    """serve app on a free local port
+
+    :param app: aiohttp application
+    :return: async context manager of the base url of the server
+    """
+    return _Serve(app)
+
+
+class ServerThread(threading.Thread):
+    """serve the application of `create_app` in a background event loop"""
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.started = threading.Event()
+        self.base_url = None
+        self.requests = []
+        self._stopping = None
+
+    def create_app(self) -> web.Application:
+        raise NotImplementedError
+
+    async def main(self):
+        app = self.create_app()
+        self._stopping = asyncio.Event()
+        async with serve(app) as base_url:
+            self.base_url = base_url
+            self.started.set()
+            await self._stopping.wait()
+
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        self.loop.run_until_complete(self.main())
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self._stopping.set)
+        self.join()
+
+
+class LocalServerThread(ServerThread):
+    """serve the research, industry listing and stock pages in a background event loop
+
+    The industries are `banks`, `oil` and `broken`, which has no listing page. The stock `broken` has no price page.
+    """
+
+    async def stock_page(self, request):
+        ticker, page = request.match_info['ticker'], request.match_info['page']
+        self.requests.append((ticker, page))
+        await asyncio.sleep(0.005)
+        if page == 'stock-price-history':
+            if ticker == 'broken':
+                return web.Response(status=404)
+            return web.Response(text=price_page(
+                {'years': [2020], 'Average Stock Price': [1.5]}, 'Finance', 'Insurance', f'{ticker} description'))
+        return web.Response(text=financial_aspect_page(
+            [{'field_name': '<a>Revenue</a>', 'popup_icon': '', '2019-12-31': '1'}]))
+
+    async def research_page(self, request):
+        self.requests.append(('research', 'research'))
+        return web.Response(text=research_page(
+            {industry: f'/stocks/industry/{industry}/' for industry in ('Banks', 'Oil', 'Broken')}))
+
+    async def industry_listing_page(self, request):
+        industry = request.match_info['industry']
+        self.requests.append((industry, 'industry'))
+        if industry == 'Broken':
+            return web.Response(status=404)
+        return web.Response(text=industry_listing_page([
+            {'ticker': f'{industry}_{i}', 'comp_name': 'name', 'country_code': 'USA', 'market_val': '10',
+             'link': f"<a href='/stocks/charts/{industry}_{i}/name/stock-price-history'>{industry}_{i}</a>"}
+            for i in range(3)
+        ]))
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/stocks/charts/{ticker}/name/{page}', self.stock_page)
+        app.router.add_get('/stocks/industry/{industry}/', self.industry_listing_page)
+        app.router.add_get('/stocks/research', self.research_page)
+        return app
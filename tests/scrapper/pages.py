@@ -0,0 +1,41 @@
+"""Minimal macrotrends pages with the structure the parser reads"""
+import json
+from typing import Dict, List
+
+
+def financial_aspect_page(raw_data: List[Dict]) -> str:
+    return f'<html><body><script>\nvar originalData = {json.dumps(raw_data)};\n</script></body></html>'
+
+
+def research_page(industry_hrefs: Dict[str, str]) -> str:
+    cells = ''.join(f'<tr><td style="text-align:left"><a href="{href}">{industry}</a></td></tr>'
+                    for industry, href in industry_hrefs.items())
+    return (
+        '<html><body>'
+        '<table><thead><tr><th><strong>Stocks by Sector</strong></th></tr></thead><tbody></tbody></table>'
+        f'<table><thead><tr><th><strong>Stocks by Industry</strong></th></tr></thead><tbody>{cells}</tbody></table>'
+        '</body></html>'
+    )
+
+
+def industry_listing_page(stocks: List[Dict]) -> str:
+    return f'<html><head><script>\nvar data = {json.dumps(stocks)}\n</script></head><body></body></html>'
+
+
+def price_page(price: Dict[str, List], sector: str, industry: str, description: str) -> str:
+    headers = [header for header in price if header != 'years']
+    header_cells = ''.join(f'<th>{header}</th>' for header in ['Year'] + headers)
+    rows = ''.join(
+        '<tr>' + ''.join(f'<td>{val}</td>' for val in [year] + [price[header][i] for header in headers]) + '</tr>'
+        for i, year in enumerate(price['years'])
+    )
+    return (
+        '<html><body>'
+        f'<table class="historical_data_table"><thead><tr><th colspan="{len(headers) + 1}">Price History</th></tr>'
+        f'<tr>{header_cells}</tr></thead><tbody>{rows}</tbody></table>'
+        '<table class="historical_data_table"><thead><tr><th>Sector</th><th>Industry</th></tr></thead>'
+        f'<tbody><tr><td>{sector}</td><td>{industry}</td></tr>'
+        f'<tr><td colspan="4"><span>{description}</span></td></tr></tbody></table>'
+        '<table class="historical_data_table"></table>'
+        '</body></html>'
+    )
@@ -0,0 +1,145 @@
+"""Local stand-in of macrotrends serving pages rendered from the recorded data of TestMacrotrendsScrapper"""
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+from stock_picker.utils.generic_utils import ROOT_PATH
+from tests.scrapper.local_server import ServerThread
+from tests.scrapper.pages import financial_aspect_page, industry_listing_page, price_page, research_page
+
+RECORDED_FOLDER = ROOT_PATH / 'tests' / 'io' / 'out' / 'TestMacrotrendsScrapper'
+MACROTRENDS_URL = 'https://www.macrotrends.net'
+FINANCIAL_ASPECT_PAGES = {
+    'income-statement': 'income_statement',
+    'balance-sheet': 'balance_sheet',
+    'cash-flow-statement': 'cash_flow_statement'
+}
+
+
+def load_recorded(name: str):
+    with (RECORDED_FOLDER / f'test_{name}_exp.txt').open() as f:
+        return json.load(f)
+
+
+def recorded_financial_aspect_rows(aspect_data: Dict[str, List]) -> List[Dict]:
+    """raw rows of a financial aspect page from its parsed data"""
+    years = aspect_data['years']
+    return [
+        {'field_name': f"<a href='#'>{field}</a>", 'popup_icon': '',
+         **{year: '' if val is None else str(val) for year, val in zip(years, values)}}
+        for field, values in aspect_data.items() if field != 'years'
+    ]
+
+
+def recorded_listing_rows(stocks_data: Dict[str, Dict], base_url: str) -> List[Dict]:
+    """raw rows of an industry listing page from its parsed data, linking to the stock pages at base url"""
+    rows = []
+    for ticker, stock_datum in stocks_data.items():
+        price_page_url = stock_datum['backup_url'].replace(MACROTRENDS_URL, base_url) + '/stock-price-history'
+        rows.append({'ticker': ticker, 'comp_name': stock_datum['company_name'],
+                     'country_code': stock_datum['country'], 'market_val': stock_datum['market_cap'],
+                     'link': f"<a href='{price_page_url}'>{ticker}</a>"})
+    return rows
+
+
+class StandInServer(ServerThread):
+    """serve the research page, the industry listings and the stock pages recorded from macrotrends
+
+    Every industry lists the recorded industry stocks and every stock has the recorded stock pages. Responses are
+    delayed by `latency` plus up to `latency_jitter` seconds, fail with 503 at `error_rate`, and are throttled with 429
+    above `max_rate` requests per second.
+    """
+    def __init__(
+            self,
+            latency: float = 0,
+            latency_jitter: float = 0,
+            error_rate: float = 0,
+            max_rate: Optional[float] = None,
+            retry_after: Optional[float] = None,
+            seed: int = 0
+    ):
+        """
+        :param latency: seconds before a response
+        :param latency_jitter: max random seconds added to latency
+        :param error_rate: fraction of responses failing with 503
+        :param max_rate: requests per second above which responses are 429, no throttling if not specified
+        :param retry_after: `Retry-After` header of 429 responses in seconds, none if not specified
+        :param seed: seed of the random latency and errors
+        """
+        super().__init__()
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.max_rate = max_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._tokens = max_rate
+        self._tokens_updated_at = time.monotonic()
+        industry_urls = load_recorded('scrap_industry_listing_urls')
+        stock_data = load_recorded('scrap_stock_data')
+        self._research_page = research_page(
+            {industry: url.replace(MACROTRENDS_URL, '') for industry, url in industry_urls.items()})
+        self._listing_stocks_data = load_recorded('scrap_stocks_data_from_industry_listing')
+        self._industry_listing_page = None
+        self._stock_pages = {
+            page: financial_aspect_page(recorded_financial_aspect_rows(stock_data[aspect]))
+            for page, aspect in FINANCIAL_ASPECT_PAGES.items()
+        }
+        self._stock_pages['stock-price-history'] = price_page(
+            stock_data['price'], stock_data['sector'], stock_data['industry'], stock_data['description'])
+
+    @property
+    def status_counts(self) -> Counter:
+        return Counter(status for _, status in self.requests)
+
+    def _throttled(self) -> bool:
+        if self.max_rate is None:
+            return False
+        now = time.monotonic()
+        self._tokens = min(self.max_rate, self._tokens + (now - self._tokens_updated_at) * self.max_rate)
+        self._tokens_updated_at = now
+        if self._tokens < 1:
+            return True
+        self._tokens -= 1
+        return False
+
+    async def respond(self, request: web.Request, text: Optional[str]) -> web.Response:
+        if self._throttled():
+            headers = {'Retry-After': str(self.retry_after)} if self.retry_after is not None else None
+            response = web.Response(status=429, headers=headers)
+        else:
+            await asyncio.sleep(self.latency + self._random.uniform(0, self.latency_jitter))
+            if self._random.random() < self.error_rate:
+                response = web.Response(status=503)
+            elif text is None:
+                response = web.Response(status=404)
+            else:
+                response = web.Response(text=text, content_type='text/html')
+        self.requests.append((request.path, response.status))
+        return response
+
+    async def research(self, request):
+        return await self.respond(request, self._research_page)
+
+    async def industry_listing(self, request):
+        # links are absolute, rendered once the server url is known
+        if self._industry_listing_page is None:
+            self._industry_listing_page = industry_listing_page(
+                recorded_listing_rows(self._listing_stocks_data, self.base_url))
+        return await self.respond(request, self._industry_listing_page)
+
+    async def stock_page(self, request):
+        return await self.respond(request, self._stock_pages.get(request.match_info['page']))
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/stocks/research', self.research)
+        app.router.add_get('/stocks/industry/{industry_id}/', self.industry_listing)
+        app.router.add_get('/stocks/industry/{industry_id}/{industry}', self.industry_listing)
+        app.router.add_get('/stocks/charts/{ticker}/{name}/{page}', self.stock_page)
+        return app
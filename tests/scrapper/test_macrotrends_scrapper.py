@@ -9,6 +9,10 @@ class TestMacrotrendsScrapper(TestCaseCompare):
         super().setUpClass()
         cls.scrapper = Scrapper()
 
+    @classmethod
+    def tearDownClass(cls):
+        cls.scrapper.close()
+
     def write_json_obj_to_out_file(self, obj):
         with self.out_file_path.open('w') as f:
             json.dump(obj, f, indent=2, sort_keys=True)
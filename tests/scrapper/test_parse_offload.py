@@ -0,0 +1,59 @@
+import asyncio
+import os
+
+from stock_picker.scrapper.macrotrends.parser import ParserError
+from stock_picker.scrapper.macrotrends.scrapper import Scrapper
+from tests.cases import TestCaseTimer, run_coroutine
+from tests.scrapper.pages import financial_aspect_page, price_page
+
+
+def exit_worker(content: str):
+    # a parsing process killed while parsing, e.g. out of memory
+    os._exit(1)
+
+
+class TestParseOffload(TestCaseTimer):
+    @classmethod
+    def setUpClass(cls):
+        cls.page = financial_aspect_page([
+            {'field_name': "<a href='/revenue'>Revenue</a>", 'popup_icon': '', '2019-12-31': '1.5', '2018-12-31': ''},
+            {'field_name': '<span>EPS - Earnings Per Share</span>', 'popup_icon': '', '2019-12-31': '2',
+             '2018-12-31': '3'},
+        ])
+
+    def test_async_parse(self):
+        inline_scrapper = Scrapper(parse_workers=0)
+
+        async def run(scrp):
+            return await asyncio.gather(*[
+                scrp.async_parse(scrp.parser.parse_stock_financial_aspect_page, self.page) for _ in range(4)])
+
+        with Scrapper(parse_workers=2) as scrapper:
+            parsed = run_coroutine(run(scrapper))
+        self.assertListEqual(parsed, run_coroutine(run(inline_scrapper)))
+        self.assertDictEqual(parsed[0], {
+            'years': ['2019-12-31', '2018-12-31'], 'revenue': [1.5, None], 'eps_earnings_per_share': [2.0, 3.0]})
+
+    def test_async_parse_price_page(self):
+        page = price_page({'years': [2020, 2019], 'Average Stock Price': [1.5, 2], 'Annual % Change': ['-8.90%', '1%']},
+                          'Finance', 'Insurance', 'description')
+        with Scrapper(parse_workers=1) as scrapper:
+            parsed = run_coroutine(scrapper.async_parse(scrapper.parser.parse_stock_price_data_and_profile_page, page))
+        self.assertDictEqual(parsed, {
+            'price': {'average_stock_price': [1.5, 2.0], 'annual_change': ['-8.90%', '1%'], 'years': [2020.0, 2019.0]},
+            'sector': 'finance', 'industry': 'insurance', 'description': 'description'})
+        self.assertIs(type(parsed['description']), str)
+
+    def test_async_parse_error(self):
+        with Scrapper(parse_workers=1) as scrapper:
+            with self.assertRaises(ParserError) as cm:
+                run_coroutine(scrapper.async_parse(scrapper.parser.parse_stock_financial_aspect_page, '<html></html>'))
+        self.assertIn('originalData', str(cm.exception))
+
+    def test_async_parse_dead_worker(self):
+        with Scrapper(parse_workers=1, parse_timeout=2) as scrapper:
+            with self.assertRaises(ParserError):
+                run_coroutine(scrapper.async_parse(exit_worker, self.page))
+            # the pool replaces the dead worker
+            parsed = run_coroutine(scrapper.async_parse(scrapper.parser.parse_stock_financial_aspect_page, self.page))
+        self.assertListEqual(parsed['revenue'], [1.5, None])
@@ -0,0 +1,44 @@
+from stock_picker.scrapper.macrotrends.parser import Parser, ParserError
+from tests.cases import TestCaseTimer
+from tests.scrapper.pages import financial_aspect_page, industry_listing_page
+
+
+class TestParser(TestCaseTimer):
+    @classmethod
+    def setUpClass(cls):
+        cls.fast_parser, cls.soup_parser = Parser(fast=True), Parser(fast=False)
+
+    def test_fast_financial_aspect_page(self):
+        page = financial_aspect_page([
+            {'field_name': "<a href='/revenue'>Revenue</a>", 'popup_icon': '<i></i>', '2019-12-31': '1.5',
+             '2018-12-31': ''},
+            {'field_name': '<span><b>Net Income &amp; Loss</b></span>', 'popup_icon': '', '2019-12-31': '-2',
+             '2018-12-31': '3'},
+            {'field_name': 'Shares Outstanding', 'popup_icon': '', '2019-12-31': '10', '2018-12-31': '11'},
+            {'field_name': "<a title='a > b'>Other Income</a>", 'popup_icon': '', '2019-12-31': '1',
+             '2018-12-31': '0'},
+        ])
+        parsed = self.fast_parser.parse_stock_financial_aspect_page(page)
+        self.assertDictEqual(parsed, self.soup_parser.parse_stock_financial_aspect_page(page))
+        self.assertListEqual(list(parsed.keys()),
+                             ['years', 'revenue', 'net_income_loss', 'shares_outstanding', 'other_income'])
+
+    def test_fallback(self):
+        # not utf-8
+        page = financial_aspect_page([{'field_name': '<a>Revenue</a>', '2019-12-31': '1'}]).encode('utf-16')
+        self.assertDictEqual(self.fast_parser.parse_stock_financial_aspect_page(page),
+                             {'years': ['2019-12-31'], 'revenue': [1.0]})
+        with self.assertRaises(ParserError):
+            self.fast_parser.parse_stock_financial_aspect_page(financial_aspect_page([{'field_name': '<a></a>'}]))
+
+    def test_fast_industry_listing_page(self):
+        page = industry_listing_page([
+            {'ticker': 'BRK.B', 'comp_name': 'berkshire-hathaway', 'country_code': 'USA', 'market_val': '500000',
+             'link': "<a href='/stocks/charts/BRK.B/berkshire-hathaway/stock-price-history?a=1&amp;b=2'>BRK.B</a>"},
+            {'ticker': 'KO', 'comp_name': 'cocacola', 'country_code': 'USA', 'market_val': 'n/a',
+             'link': 'KO'},
+        ])
+        parsed = self.fast_parser.parse_stocks_data_from_industry_listing_page(page.encode())
+        self.assertDictEqual(parsed, self.soup_parser.parse_stocks_data_from_industry_listing_page(page.encode()))
+        self.assertEqual(parsed['BRK.B']['backup_url'], '/stocks/charts/BRK.B/berkshire-hathaway?a=1&b=2')
+        self.assertIsNone(parsed['KO']['backup_url'])
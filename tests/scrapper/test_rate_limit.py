@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+from aiohttp import ClientResponseError, ClientSession, web
+
+from stock_picker.scrapper.macrotrends.scrapper import Scrapper
+from stock_picker.scrapper.rate_limit import AdaptiveLimiter, HostRateLimiter, RetryPolicy
+from tests.cases import TestCaseTimer, run_coroutine
+from tests.scrapper.local_server import serve
+
+
+class TestRateLimit(TestCaseTimer):
+    def test_adaptive_limiter(self):
+        limiter = AdaptiveLimiter(concurrency=8, rate=8)
+        started_at = time.monotonic()
+        limiter.record(started_at, 429, 0.1)
+        self.assertEqual((limiter.concurrency, limiter.rate), (4, 4))
+        # other requests in flight when throttled do not decrease again
+        limiter.record(started_at, 503, 0.1)
+        self.assertEqual((limiter.concurrency, limiter.rate), (4, 4))
+        limiter.record(time.monotonic(), None, 0.1)
+        self.assertEqual((limiter.concurrency, limiter.rate), (2, 2))
+        limiter.record(time.monotonic(), 200, 0.1)
+        self.assertEqual((limiter.concurrency, limiter.rate), (2.5, 2.5))
+        limiter.record(time.monotonic(), 200, limiter.latency_target + 1)
+        self.assertEqual((limiter.concurrency, limiter.rate), (2.1, 2.5))
+
+    def test_retry_policy(self):
+        policy = RetryPolicy(max_attempts=3, base_delay=1, max_delay=10)
+        throttled = ClientResponseError(None, (), status=429)
+        self.assertTrue(policy.should_retry(throttled, 2))
+        self.assertFalse(policy.should_retry(throttled, 3))
+        self.assertFalse(policy.should_retry(ClientResponseError(None, (), status=404), 1))
+        self.assertFalse(policy.should_retry(ValueError(), 1))
+        self.assertTrue(all(0 <= policy.delay(3) <= 4 for _ in range(100)))
+        self.assertTrue(all(policy.delay(20) <= 10 for _ in range(100)))
+        self.assertGreaterEqual(policy.delay(1, '5'), 5)
+        self.assertGreaterEqual(policy.delay(1, 'Wed, 21 Oct 2015 07:28:00 GMT'), 0)
+
+    def test_async_fetch_retry_and_concurrency(self):
+        statuses = {'flaky': [429, 503], 'missing': [404] * 5}
+        in_flight, max_in_flight, hits = [0], [0], []
+
+        async def handler(request):
+            page = request.match_info['page']
+            hits.append(page)
+            in_flight[0] += 1
+            max_in_flight[0] = max(max_in_flight[0], in_flight[0])
+            await asyncio.sleep(0.01)
+            in_flight[0] -= 1
+            if statuses.get(page):
+                return web.Response(status=statuses[page].pop(0), headers={'Retry-After': '0'})
+            return web.Response(text=page)
+
+        async def run():
+            app = web.Application()
+            app.router.add_get('/{page}', handler)
+            scrapper = Scrapper(
+                rate_limiter=HostRateLimiter(concurrency=2, max_concurrency=2, rate=1000, max_rate=1000),
+                retry_policy=RetryPolicy(base_delay=0.01)
+            )
+            async with serve(app) as base_url, ClientSession() as session:
+                pages = await asyncio.gather(*[scrapper.async_fetch(session, f'{base_url}/page_{i}') for i in range(6)])
+                self.assertEqual(await scrapper.async_fetch(session, f'{base_url}/flaky'), 'flaky')
+                with self.assertRaises(ClientResponseError):
+                    await scrapper.async_fetch(session, f'{base_url}/missing')
+                return pages
+
+        self.assertListEqual(run_coroutine(run()), [f'page_{i}' for i in range(6)])
+        self.assertEqual(max_in_flight[0], 2)
+        self.assertEqual(hits.count('flaky'), 3)
+        self.assertEqual(hits.count('missing'), 1)
+
+    def test_cancelled_fetch_does_not_throttle(self):
+        async def handler(request):
+            await asyncio.sleep(1)
+            return web.Response(text='slow')
+
+        async def run():
+            app = web.Application()
+            app.router.add_get('/{page}', handler)
+            scrapper = Scrapper(rate_limiter=HostRateLimiter(concurrency=4, rate=4))
+            async with serve(app) as base_url, ClientSession() as session:
+                url = f'{base_url}/slow'
+                fetch = asyncio.ensure_future(scrapper.async_fetch(session, url))
+                await asyncio.sleep(0.1)
+                fetch.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await fetch
+                limiter = scrapper.rate_limiter.limiter(url)
+                return limiter.concurrency, limiter.rate
+
+        self.assertEqual(run_coroutine(run()), (4, 4))
@@ -0,0 +1,125 @@
+import json
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+from stock_picker.fundamentals_history import FundamentalsHistory
+from stock_picker.scrapper.macrotrends.refresh import refresh_meta_file_stocks, refresh_stocks_data
+from stock_picker.scrapper.macrotrends.scrapper import Scrapper
+from stock_picker.scrapper.rate_limit import RetryPolicy
+from stock_picker.scrapper.refresh_planner import DAY, RefreshPlanner
+from stock_picker.utils.file_utils import write_json_gz_file
+from tests.cases import TestCaseTimer
+from tests.scrapper.local_server import LocalServerThread
+
+STATEMENTS = ('income_statement', 'balance_sheet', 'cash_flow_statement')
+
+
+class TestRefreshPlanner(TestCaseTimer):
+    def setUp(self):
+        super().setUp()
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.folder = Path(self._tmp_dir.name)
+        self.now = datetime(2020, 6, 1).timestamp()
+
+    def tearDown(self):
+        super().tearDown()
+        self._tmp_dir.cleanup()
+
+    def write_stock(self, ticker: str, latest_year: str, refreshed_days_ago: float):
+        refreshed_at = self.now - refreshed_days_ago * DAY
+        stock_data = {st: {'years': [latest_year, '2015-12-31'], 'revenue': [1, 2]} for st in STATEMENTS}
+        stock_data['refreshed_at'] = {page: refreshed_at for page in STATEMENTS + ('price',)}
+        with (self.folder / f'{ticker}.json').open('w') as f:
+            json.dump(stock_data, f)
+
+    def test_plan(self):
+        # new fiscal year expected since 2020-03-30, not checked since
+        self.write_stock('DUE', '2018-12-31', 100)
+        # fiscal year 2019 scrapped, price fresh
+        self.write_stock('FRESH', '2019-12-31', 1)
+        # fiscal year ends in June
+        self.write_stock('JUNE', '2019-06-30', 100)
+        # new fiscal year expected but checked 2 days ago
+        self.write_stock('CHECKED', '2018-12-31', 2)
+        planner = RefreshPlanner(self.folder)
+        plan = planner.plan(['DUE', 'FRESH', 'JUNE', 'CHECKED', 'NEW'], now=self.now)
+        self.assertListEqual(list(plan.keys()), ['NEW', 'DUE', 'JUNE'])
+        self.assertListEqual(plan['NEW'], list(STATEMENTS) + ['price'])
+        self.assertListEqual(sorted(plan['DUE']), sorted(STATEMENTS + ('price',)))
+        self.assertListEqual(plan['JUNE'], ['price'])
+
+        planner.request_budget = 6
+        plan = planner.plan(['DUE', 'FRESH', 'JUNE', 'CHECKED', 'NEW'], now=self.now)
+        # prices stale for 93 days come before statements expected 63 days ago
+        self.assertDictEqual(plan, {'NEW': list(STATEMENTS) + ['price'], 'DUE': ['price'], 'JUNE': ['price']})
+
+    def test_refresh_stocks_data(self):
+        server = LocalServerThread()
+        server.start()
+        server.started.wait()
+        scrapper = Scrapper(main_page_url=server.base_url, parse_workers=0, retry_policy=RetryPolicy(max_attempts=1))
+        try:
+            self.write_stock('OLD', '2018-12-31', 400)
+            stocks_data = {ticker: {'url': f'{server.base_url}/stocks/charts/{ticker}/name', 'market_cap': 10}
+                           for ticker in ('OLD', 'NEW', 'broken')}
+            failed = refresh_stocks_data(scrapper, RefreshPlanner(self.folder), stocks_data)
+        finally:
+            scrapper.close()
+            server.stop()
+        self.assertListEqual(list(failed), ['broken'])
+        self.assertEqual(len(server.requests), 12)
+        for ticker in ('OLD', 'NEW'):
+            with (self.folder / f'{ticker}.json').open() as f:
+                stock_data = json.load(f)
+            self.assertEqual(stock_data['income_statement']['years'], ['2019-12-31'])
+            self.assertEqual(stock_data['description'], f'{ticker} description')
+            self.assertEqual(stock_data['market_cap'], 10)
+            self.assertSetEqual(set(stock_data['refreshed_at']), set(STATEMENTS + ('price',)))
+
+    def test_refresh_meta_file_stocks(self):
+        server = LocalServerThread()
+        server.start()
+        server.started.wait()
+        scrapper = Scrapper(main_page_url=server.base_url, parse_workers=0, retry_policy=RetryPolicy(max_attempts=1))
+        meta_file_path = self.folder / 'meta.json.gz'
+        try:
+            self.write_stock('OLD', '2018-12-31', 400)
+            self.write_stock('FRESH', '2019-12-31', 1)
+            write_json_gz_file({'industries': {}, 'stocks': {
+                ticker: {'url': f'{server.base_url}/stocks/charts/{ticker}/name', 'market_cap': 10}
+                for ticker in ('OLD', 'FRESH', 'NEW')}}, meta_file_path)
+            failed = refresh_meta_file_stocks(scrapper, RefreshPlanner(self.folder, request_budget=5), meta_file_path)
+        finally:
+            scrapper.close()
+            server.stop()
+        self.assertDictEqual(failed, {})
+        # the new stock is refreshed whole first, the budget is left for one stale page of the old stock
+        self.assertSetEqual({ticker for ticker, _ in server.requests}, {'NEW', 'OLD'})
+        self.assertEqual(len(server.requests), 5)
+        with (self.folder / 'OLD.json').open() as f:
+            self.assertEqual(json.load(f)['market_cap'], 10)
+
+    def test_refresh_stocks_data_history(self):
+        stock_data = {st: {'years': ['2019-12-31', '2015-12-31'], 'revenue': [5., 2.]} for st in STATEMENTS}
+        stock_data['refreshed_at'] = {page: self.now for page in STATEMENTS + ('price',)}
+        with (self.folder / 'OLD.json').open('w') as f:
+            json.dump(stock_data, f)
+        history = FundamentalsHistory(self.folder / 'history')
+        history.record('OLD', {**stock_data, 'market_cap': 8}, scraped_at=self.now)
+        server = LocalServerThread()
+        server.start()
+        server.started.wait()
+        scrapper = Scrapper(main_page_url=server.base_url, parse_workers=0, retry_policy=RetryPolicy(max_attempts=1))
+        try:
+            stocks_data = {'OLD': {'url': f'{server.base_url}/stocks/charts/OLD/name', 'market_cap': 10}}
+            refresh_stocks_data(scrapper, RefreshPlanner(self.folder), stocks_data, history=history)
+        finally:
+            scrapper.close()
+            server.stop()
+        refreshed_at = history.versions('OLD')[-1]
+        # the restated revenue and the market cap are recorded, the refreshed file only keeps the latest
+        self.assertListEqual(history.field_history('OLD', 'income_statement', '2019-12-31', 'revenue'),
+                             [(self.now, 5.), (refreshed_at, 1.)])
+        self.assertEqual(history.as_of('OLD', at=self.now)['market_cap'], 8)
+        self.assertEqual(history.as_of('OLD')['market_cap'], 10)
@@ -0,0 +1,55 @@
+import tempfile
+from pathlib import Path
+
+from aiohttp import ClientSession, web
+
+from stock_picker.scrapper.macrotrends.scrapper import Scrapper
+from stock_picker.scrapper.response_cache import ResponseCache
+from tests.cases import TestCaseTimer, run_coroutine
+from tests.scrapper.local_server import serve
+
+
+class TestResponseCache(TestCaseTimer):
+    def setUp(self):
+        super().setUp()
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_folder = Path(self._tmp_dir.name)
+
+    def tearDown(self):
+        super().tearDown()
+        self._tmp_dir.cleanup()
+
+    def test_put_get(self):
+        cache = ResponseCache(self.cache_folder, ttl=60, ttl_by_pattern={'stock-price-history': None})
+        url = 'https://www.macrotrends.net/stocks/charts/BRK.B/berkshire-hathaway/income-statement'
+        self.assertIsNone(cache.get(url))
+        cached = cache.put(url, 'originalData = []'.encode(), {'ETag': '"v1"'}, 'utf-8')
+        self.assertEqual(cache.get(url), cached)
+        self.assertEqual(cache.get(url).text(), 'originalData = []')
+        self.assertTrue(cache.is_fresh(cached))
+        self.assertFalse(cache.is_fresh(cached, now=cached.fetched_at + 61))
+        self.assertTrue(cache.is_fresh(cached._replace(url=f'{url[:-16]}stock-price-history'), now=1e12))
+        self.assertDictEqual(cache.conditional_headers(cached), {'If-None-Match': '"v1"'})
+
+    def test_async_fetch_revalidation(self):
+        hits = []
+
+        async def handler(request):
+            hits.append(request.headers.get('If-None-Match'))
+            if request.headers.get('If-None-Match') == '"v1"':
+                return web.Response(status=304, headers={'ETag': '"v1"'})
+            return web.Response(text='var data = []', headers={'ETag': '"v1"'})
+
+        async def run():
+            app = web.Application()
+            app.router.add_get('/page', handler)
+            async with serve(app) as base_url, ClientSession() as session:
+                url = f'{base_url}/page'
+                scrapper = Scrapper(response_cache=ResponseCache(self.cache_folder, ttl=60))
+                contents = [await scrapper.async_fetch(session, url), await scrapper.async_fetch(session, url)]
+                scrapper.response_cache.ttl = 0
+                contents.append(await scrapper.async_fetch(session, url))
+                return contents
+
+        self.assertListEqual(run_coroutine(run()), ['var data = []'] * 3)
+        self.assertListEqual(hits, [None, '"v1"'])
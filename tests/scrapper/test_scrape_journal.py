@@ -0,0 +1,56 @@
+import tempfile
+from pathlib import Path
+
+from stock_picker.scrapper.scrape_journal import ScrapeJournal
+from tests.cases import TestCaseTimer
+
+
+class TestScrapeJournal(TestCaseTimer):
+    def setUp(self):
+        super().setUp()
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.journal_path = Path(self._tmp_dir.name) / 'journal.jsonl'
+
+    def tearDown(self):
+        super().tearDown()
+        self._tmp_dir.cleanup()
+
+    def test_resume(self):
+        tickers = ['A', 'B', 'C', 'D']
+        with ScrapeJournal(self.journal_path, max_attempts=2) as journal:
+            self.assertListEqual(journal.pending(tickers), tickers)
+            journal.record('A', ScrapeJournal.DONE)
+            journal.record('B', ScrapeJournal.FAILED, 'timeout')
+            journal.record('C', ScrapeJournal.FAILED, 'timeout')
+            journal.record('C', ScrapeJournal.FAILED, 'not found')
+        # killed while writing a line
+        with self.journal_path.open('a') as f:
+            f.write('{"ticker": "D", "sta')
+
+        with ScrapeJournal(self.journal_path, max_attempts=2) as journal:
+            self.assertListEqual(journal.pending(tickers), ['B', 'D'])
+            self.assertEqual(journal.attempts('C'), 2)
+            self.assertDictEqual(journal.failed(), {'C': 'not found'})
+            journal.record('B', ScrapeJournal.DONE)
+
+        with ScrapeJournal(self.journal_path, max_attempts=2) as journal:
+            self.assertListEqual(journal.pending(tickers), ['D'])
+            self.assertListEqual(journal.done(), ['A', 'B'])
+            self.assertEqual(journal.entry('B')['attempts'], 2)
+
+    def test_archive(self):
+        tickers = ['A', 'B']
+        with ScrapeJournal(self.journal_path, max_attempts=1) as journal:
+            journal.record('A', ScrapeJournal.DONE)
+            journal.record('B', ScrapeJournal.FAILED, 'timeout')
+            self.assertListEqual(journal.pending(tickers), [])
+            archive_path = journal.archive()
+            self.assertListEqual(journal.pending(tickers), tickers)
+            journal.record('A', ScrapeJournal.DONE)
+        self.assertTrue(archive_path.name.startswith('journal.'))
+        self.assertEqual(len(archive_path.read_text().splitlines()), 2)
+
+        # the next run scrapes all tickers again
+        with ScrapeJournal(self.journal_path, max_attempts=1) as journal:
+            self.assertListEqual(journal.pending(tickers), ['B'])
+            self.assertEqual(journal.attempts('A'), 1)
@@ -0,0 +1,73 @@
+import json
+import tempfile
+from pathlib import Path
+
+from stock_picker.scrapper.macrotrends.scrapper import Scrapper
+from stock_picker.scrapper.rate_limit import RetryPolicy
+from stock_picker.utils.file_utils import read_json_gz_file
+from tests.cases import TestCaseTimer, run_coroutine
+from tests.scrapper.local_server import LocalServerThread
+
+
+class TestScrapperLifecycle(TestCaseTimer):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalServerThread()
+        cls.server.start()
+        cls.server.started.wait()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def stock_url(self, ticker: str) -> str:
+        return f'{self.server.base_url}/stocks/charts/{ticker}/name'
+
+    def test_sync_facade(self):
+        with Scrapper(main_page_url=self.server.base_url, parse_workers=0, connection_limit_per_host=4) as scrapper:
+            stocks_data = scrapper.scrap_stocks_data_from_industry_listing(
+                f'{self.server.base_url}/stocks/industry/banks/')
+            self.assertListEqual(list(stocks_data), ['banks_0', 'banks_1', 'banks_2'])
+            session = scrapper.session
+            self.assertEqual(session.connector.limit_per_host, 4)
+            # scrap multiple times with the same session and event loop
+            for _ in range(2):
+                scrapped = scrapper.scrap_multiple_stocks([self.stock_url('A'), self.stock_url('B')])
+                self.assertListEqual([stock_data['description'] for stock_data in scrapped],
+                                     ['A description', 'B description'])
+            self.assertEqual(scrapper.scrap_stock_data(self.stock_url('C'))['description'], 'C description')
+            self.assertIs(scrapper.session, session)
+        self.assertTrue(session.closed)
+        with self.assertRaises(RuntimeError):
+            scrapper.session
+
+    def test_async_context_manager(self):
+        async def run():
+            async with Scrapper(main_page_url=self.server.base_url, parse_workers=0) as scrapper:
+                stocks_data = await scrapper.async_scrap_stocks_data_from_industry_listing(
+                    f'{self.server.base_url}/stocks/industry/oil/')
+                scrapped = [item async for item in scrapper.async_iter_scrap_multiple_stocks(
+                    None, [self.stock_url(ticker) for ticker in stocks_data], limit=2)]
+                return scrapped, scrapper.session
+
+        scrapped, session = run_coroutine(run())
+        self.assertSetEqual({url.split('/')[-2] for url, _ in scrapped}, {'oil_0', 'oil_1', 'oil_2'})
+        self.assertTrue(session.closed)
+
+    def test_scrap_all_industry_listings(self):
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                Scrapper(main_page_url=self.server.base_url, parse_workers=0,
+                         retry_policy=RetryPolicy(max_attempts=1)) as scrapper:
+            for meta_file_path in (Path(tmp_dir) / 'meta.json', Path(tmp_dir) / 'meta.json.gz'):
+                meta_data, failed_industries = scrapper.scrap_all_industry_listings(
+                    limit=2, meta_file_path=meta_file_path)
+                self.assertListEqual(list(meta_data['industries']), ['banks', 'oil', 'broken'])
+                self.assertListEqual(list(meta_data['stocks']),
+                                     ['Banks_0', 'Banks_1', 'Banks_2', 'Oil_0', 'Oil_1', 'Oil_2'])
+                self.assertListEqual(list(failed_industries), ['broken'])
+                if meta_file_path.suffix == '.gz':
+                    written = read_json_gz_file(meta_file_path)
+                else:
+                    with meta_file_path.open() as f:
+                        written = json.load(f)
+                self.assertDictEqual(written, meta_data)
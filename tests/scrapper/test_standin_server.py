@@ -0,0 +1,48 @@
+from stock_picker.scrapper.macrotrends.parser import Parser
+from stock_picker.scrapper.macrotrends.scrapper import Scrapper
+from stock_picker.scrapper.rate_limit import HostRateLimiter, RetryPolicy
+from tests.cases import TestCaseTimer
+from tests.scrapper.standin_server import MACROTRENDS_URL, StandInServer, load_recorded
+
+
+class TestStandInServer(TestCaseTimer):
+    def run_server(self, **kwargs) -> StandInServer:
+        server = StandInServer(**kwargs)
+        server.start()
+        server.started.wait()
+        self.addCleanup(server.stop)
+        return server
+
+    def test_recorded_pages(self):
+        server = self.run_server()
+        with Scrapper(main_page_url=server.base_url, parse_workers=0) as scrapper:
+            industry_urls = scrapper.scrap_industry_listing_urls()
+            self.assertDictEqual(industry_urls, {
+                industry: url.replace(MACROTRENDS_URL, server.base_url)
+                for industry, url in load_recorded('scrap_industry_listing_urls').items()
+            })
+            stocks_data = scrapper.scrap_stocks_data_from_industry_listing(f'{server.base_url}/stocks/industry/89/')
+            self.assertDictEqual(stocks_data, {
+                ticker: {field: val.replace(MACROTRENDS_URL, server.base_url) if field.endswith('url') else val
+                         for field, val in stock_datum.items()}
+                for ticker, stock_datum in load_recorded('scrap_stocks_data_from_industry_listing').items()
+            })
+            stock_data = scrapper.scrap_stock_data(f'{server.base_url}/stocks/charts/BRK.B/berkshire-hathaway')
+            exp_stock_data = load_recorded('scrap_stock_data')
+            # the industry was recorded before industries were beautified
+            exp_stock_data['industry'] = Parser.beautify_field(exp_stock_data['industry'])
+            self.assertDictEqual(stock_data, exp_stock_data)
+
+    def test_errors_and_throttling(self):
+        server = self.run_server(error_rate=0.2, max_rate=20, retry_after=0.1)
+        urls = [f'{server.base_url}/stocks/charts/T{i}/name' for i in range(10)]
+        with Scrapper(main_page_url=server.base_url, parse_workers=0,
+                      rate_limiter=HostRateLimiter(concurrency=20, rate=100, min_rate=20, burst=40),
+                      retry_policy=RetryPolicy(max_attempts=20, base_delay=0.01, max_delay=0.5)) as scrapper:
+            scrapped = scrapper.scrap_multiple_stocks(urls, limit=10)
+        self.assertEqual(len(scrapped), 10)
+        self.assertTrue(all(isinstance(stock_data, dict) for stock_data in scrapped))
+        status_counts = server.status_counts
+        self.assertEqual(status_counts[200], 40)
+        self.assertGreater(status_counts[429], 0)
+        self.assertGreater(status_counts[503], 0)
@@ -0,0 +1,49 @@
+from stock_picker.scrapper.macrotrends.scrapper import Scrapper
+from stock_picker.scrapper.rate_limit import HostRateLimiter, RetryPolicy
+from tests.cases import TestCaseTimer
+from tests.scrapper.local_server import LocalServerThread
+
+
+class TestStreamScrapping(TestCaseTimer):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalServerThread()
+        cls.server.start()
+        cls.server.started.wait()
+        cls.scrapper = Scrapper(
+            main_page_url=cls.server.base_url, parse_workers=0,
+            rate_limiter=HostRateLimiter(rate=1000, max_rate=1000), retry_policy=RetryPolicy(max_attempts=1)
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.scrapper.close()
+        cls.server.stop()
+
+    def stock_url(self, ticker: str) -> str:
+        return f'{self.server.base_url}/stocks/charts/{ticker}/name'
+
+    def test_iter_scrap_multiple_stocks(self):
+        urls = [self.stock_url(f'T{i}') for i in range(20)] + [self.stock_url('broken')]
+        scrapped = dict(self.scrapper.iter_scrap_multiple_stocks(iter(urls), limit=4))
+        self.assertSetEqual(set(scrapped), set(urls))
+        self.assertIsInstance(scrapped.pop(self.stock_url('broken')), Exception)
+        for url, stock_data in scrapped.items():
+            self.assertEqual(stock_data['description'], f'{url.split("/")[-2]} description')
+            self.assertDictEqual(stock_data['income_statement'], {'years': ['2019-12-31'], 'revenue': [1.0]})
+
+    def test_iter_scrap_stops_early(self):
+        self.server.requests.clear()
+        urls = (self.stock_url(f'S{i}') for i in range(1000))
+        for i, (url, stock_data) in enumerate(self.scrapper.iter_scrap_multiple_stocks(urls, limit=2)):
+            if i == 2:
+                break
+        # the urls are consumed lazily
+        self.assertLess(len({ticker for ticker, _ in self.server.requests}), 20)
+
+    def test_scrap_multiple_stocks(self):
+        urls = [self.stock_url('broken'), self.stock_url('A'), self.stock_url('B')]
+        scrapped = self.scrapper.scrap_multiple_stocks(urls, limit=2)
+        self.assertIsInstance(scrapped[0], Exception)
+        self.assertListEqual([stock_data['description'] for stock_data in scrapped[1:]],
+                             ['A description', 'B description'])
@@ -0,0 +1,61 @@
+import io
+import json
+import tempfile
+from pathlib import Path
+
+from stock_picker.utils.file_utils import iter_json_gz_items, iter_json_items, read_json_gz_file, write_json_gz_file
+from tests.cases import TestCaseTimer
+
+
+class TestFileUtils(TestCaseTimer):
+    def setUp(self):
+        super().setUp()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.folder = Path(self.temp_dir.name)
+        self.meta = {
+            'industries': {'banks': 'https://www.macrotrends.net/stocks/industry/1/banks'},
+            'stocks': {f'T{i}': {'market_cap': i * 1.5, 'country': 'usa', 'description': 'long ' * i, 'sold': i > 2,
+                                 'backup_url': None} for i in range(50)}
+        }
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+        super().tearDown()
+
+    def test_write_read_json_gz_file(self):
+        output_file = self.folder / 'meta.json.gz'
+        write_json_gz_file(self.meta, output_file, compresslevel=1)
+        self.assertDictEqual(read_json_gz_file(output_file), self.meta)
+        self.assertListEqual([path.name for path in self.folder.iterdir()], ['meta.json.gz'])
+        with self.assertRaises(ValueError):
+            write_json_gz_file(self.meta, self.folder / 'meta.json')
+
+    def test_iter_json_items(self):
+        text = json.dumps(self.meta, indent=1)
+        for chunk_size in (1, 7, 1 << 16):
+            self.assertDictEqual(dict(iter_json_items(io.StringIO(text), chunk_size=chunk_size)), self.meta)
+            self.assertDictEqual(dict(iter_json_items(io.StringIO(text), ('stocks',), chunk_size)),
+                                 self.meta['stocks'])
+        numbers = [1, -2.5e3, 1234567, True, None, 'a', [], {}]
+        self.assertListEqual(list(iter_json_items(io.StringIO(json.dumps(numbers)), chunk_size=2)), numbers)
+        # floats split by the end of a chunk at every position
+        floats = [1.5, -0.25, 1e-07, 123.456e10, -7.0]
+        text = json.dumps(floats)
+        for chunk_size in range(1, len(text) + 1):
+            self.assertListEqual(list(iter_json_items(io.StringIO(text), chunk_size=chunk_size)), floats)
+        self.assertListEqual(list(iter_json_items(io.StringIO('[1.5, 2]'), chunk_size=1)), [1.5, 2])
+        self.assertListEqual(list(iter_json_items(io.StringIO(' [ ] '))), [])
+        self.assertListEqual(list(iter_json_items(io.StringIO('{"a": {"b": [1, 2]}}'), ('a', 'b'))), [1, 2])
+        with self.assertRaises(KeyError):
+            list(iter_json_items(io.StringIO('{"a": 1, "b": 2}'), ('c',)))
+        with self.assertRaises(ValueError):
+            list(iter_json_items(io.StringIO('1')))
+        with self.assertRaises(ValueError):
+            list(iter_json_items(io.StringIO('[1, 2')))
+
+    def test_iter_json_gz_items(self):
+        output_file = self.folder / 'meta.json.gz'
+        write_json_gz_file(self.meta, output_file)
+        stocks = iter_json_gz_items(output_file, ('stocks',), chunk_size=64)
+        self.assertTupleEqual(next(stocks), ('T0', self.meta['stocks']['T0']))
+        self.assertEqual(len(list(stocks)), 49)